@@ -20,10 +20,7 @@ import {
   createMaintenance,
   deleteDeviceNote,
   deleteMaintenance,
-  getDeviceComponents,
-  getDeviceDetail,
-  getDeviceMaintenance,
-  getDeviceNotes,
+  getDeviceBundle,
   listOpenGlpiTickets,
   updateDeviceNote
 } from "@/services/deviceDetailService";
@@ -87,16 +84,12 @@ export function DeviceDetailClient({
     setLoading(true);
     setError(null);
     try {
-      const [d, c, n, m] = await Promise.all([
-        getDeviceDetail(deviceId),
-        getDeviceComponents(deviceId),
-        getDeviceNotes(deviceId),
-        getDeviceMaintenance(deviceId)
-      ]);
+      // Uma única requisição para detalhe + componentes + notas + manutenções.
+      const { components: c, notes: n, maintenance: m, ...d } = await getDeviceBundle(deviceId);
       setDevice(d);
-      setComponents(c);
-      setNotes(n);
-      setMaintenance(m);
+      setComponents(c ?? []);
+      setNotes(n ?? []);
+      setMaintenance(m ?? []);
     } catch (e: any) {
       setError(e?.message ?? "Falha ao carregar dados");
     } finally {
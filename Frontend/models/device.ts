@@ -69,3 +69,10 @@ export type DeviceMaintenance = {
   next_due: string | null;
   created_at: string;
 };
+
+// GET /api/devices/{id}/bundle — detalhe + sub-recursos em uma requisição
+export type DeviceBundle = DeviceDetail & {
+  components?: DeviceComponent[] | null;
+  maintenance?: DeviceMaintenance[] | null;
+  notes?: DeviceNote[] | null;
+};
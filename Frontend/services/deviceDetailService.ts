@@ -1,4 +1,5 @@
 import type {
+  DeviceBundle,
   DeviceComponent,
   DeviceDetail,
   DeviceMaintenance,
@@ -54,6 +55,13 @@ export async function getDeviceDetail(deviceId: string): Promise<DeviceDetail> {
   return res.json();
 }
 
+export async function getDeviceBundle(deviceId: string): Promise<DeviceBundle> {
+  const url = `${getBaseUrl()}/api/devices/${encodeURIComponent(deviceId)}/bundle?include=components,maintenance,notes`;
+  const res = await fetch(url, { cache: "no-store", headers: authHeaders() });
+  if (!res.ok) throw new Error(`Falha ao carregar device: ${res.status}`);
+  return res.json();
+}
+
 export async function getDeviceComponents(deviceId: string): Promise<DeviceComponent[]> {
   const url = `${getBaseUrl()}/api/devices/${encodeURIComponent(deviceId)}/components`;
   const res = await fetch(url, { cache: "no-store", headers: authHeaders() });
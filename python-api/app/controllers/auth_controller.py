@@ -1,41 +1,70 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
-from app.core.auth import create_access_token, get_current_user, ldap_authenticate
+from app.core.auth import create_access_token, get_current_user, ldap_authenticate_async, user_token_payload
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.passwords import PasswordHashBusy
 from app.schemas.schemas import LoginRequest, LoginResponse, UserOut
-from app.services.user_service import authenticate_local, ensure_default_admin, to_user_dict, upsert_ldap_user
+from app.services.user_service import (
+    authenticate_local,
+    get_principal,
+    login_retry_after,
+    record_login_failure,
+    record_login_success,
+    revoke_tokens,
+    to_user_dict,
+    upsert_ldap_user,
+)
 
 
 router = APIRouter(tags=["auth"])
 
 
 @router.post("/api/auth/login", response_model=LoginResponse)
-async def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    # garante seed do admin/admin
-    ensure_default_admin(db)
-
+async def login(payload: LoginRequest, request: Request, db: Session = Depends(get_db)):
+    # O admin/admin é criado no startup (app.main), não a cada login.
     username = (payload.username or "").strip()
     password = payload.password or ""
+    ip = request.client.host if request.client else "unknown"
+
+    retry_after = login_retry_after(username, ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Muitas tentativas de login; tente novamente mais tarde",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
 
     # 1) Login local (sempre disponível)
     try:
-        local_user = authenticate_local(db, username, password)
+        local_user = await authenticate_local(db, username, password)
         user_dict = to_user_dict(local_user)
-        token = create_access_token({"sub": user_dict["username"]})
+        token = create_access_token(user_token_payload(user_dict, local_user.token_version))
+        record_login_success(username)
         return LoginResponse(
             access_token=token,
             user=UserOut(**user_dict),
         )
+    except PasswordHashBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado com outros logins; tente novamente",
+            headers={"Retry-After": "1"},
+        )
     except Exception:
         pass
 
     # 2) (Opcional) LDAP/AD no futuro
     if settings.LOGIN_ALLOW_LDAP:
-        info = ldap_authenticate(username, password)
+        try:
+            info = await ldap_authenticate_async(username, password)
+        except HTTPException as e:
+            if e.status_code == 401:
+                record_login_failure(username, ip)
+            raise
         db_user = upsert_ldap_user(
             db,
             username=str(info.get("username")),
@@ -44,15 +73,29 @@ async def login(payload: LoginRequest, db: Session = Depends(get_db)):
             groups=list(info.get("groups") or []),
         )
         user_dict = to_user_dict(db_user)
-        token = create_access_token({"sub": user_dict["username"]})
+        token = create_access_token(user_token_payload(user_dict, db_user.token_version))
+        record_login_success(username)
         return LoginResponse(access_token=token, user=UserOut(**user_dict))
 
     # Sem LDAP e sem usuário local
+    record_login_failure(username, ip)
     raise HTTPException(status_code=401, detail="Usuário ou senha inválidos")
 
 
+@router.post("/api/auth/logout")
+async def logout(user=Depends(get_current_user), db: Session = Depends(get_db)):
+    # Revoga todos os tokens do usuário (vale para os demais workers após a próxima conferência).
+    if user.get("auth_disabled"):
+        return {"status": "ok"}
+    revoke_tokens(db, str(user.get("sub")))
+    return {"status": "ok"}
+
+
 @router.get("/api/auth/me", response_model=UserOut)
-async def me(user=Depends(get_current_user)):
+async def me(user=Depends(get_current_user), db: Session = Depends(get_db)):
+    if settings.AUTH_STATELESS_TOKENS and not user.get("auth_disabled"):
+        # O token não carrega os grupos; o perfil completo vem do cache de principals.
+        user = get_principal(db, str(user.get("sub"))) or user
     return UserOut(
         username=str(user.get("sub")),
         display_name=user.get("display_name"),
@@ -1,17 +1,71 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_user
 from app.core.database import get_db
-from app.schemas.schemas import DashboardMetrics
-from app.services.dashboard_service import get_dashboard_metrics
+from app.core.http_cache import conditional_response, make_etag, time_bucket
+from app.schemas.schemas import DashboardHistoryPoint, DashboardMetrics, MaintenanceTrends
+from app.services.dashboard_service import default_trends_range, get_dashboard_metrics, get_maintenance_trends
+from app.services.dashboard_snapshot_service import get_history
+from app.services.version_service import SCOPE_COMPUTERS, SCOPE_MAINTENANCE, get_versions
 
 
 router = APIRouter(tags=["dashboard"])
 
 
 @router.get("/api/dashboard/metrics", response_model=DashboardMetrics)
-async def dashboard_metrics(db: Session = Depends(get_db), _user=Depends(get_current_user)):
+async def dashboard_metrics(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    _user=Depends(get_current_user),
+):
+    versions = get_versions(db, SCOPE_COMPUTERS, SCOPE_MAINTENANCE)
+    etag = make_etag("dashboard", versions, time_bucket())
+    cached = conditional_response(request, response, etag)
+    if cached:
+        return cached
     return get_dashboard_metrics(db)
+
+
+@router.get("/api/dashboard/history", response_model=List[DashboardHistoryPoint])
+async def dashboard_history(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+    _user=Depends(get_current_user),
+):
+    # Uma linha por dia (gravada por tools/roll_dashboard_snapshot.py).
+    return get_history(db, from_date=from_date, to_date=to_date)
+
+
+@router.get("/api/dashboard/trends", response_model=MaintenanceTrends)
+async def dashboard_trends(
+    granularity: str = Query("month", pattern="^(month|week)$"),
+    group_by: str = Query("type", pattern="^(type|entity|technician)$"),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+    _user=Depends(get_current_user),
+):
+    default_from, default_to = default_trends_range(granularity)
+    from_date = from_date or default_from
+    to_date = to_date or default_to
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="Período inválido: 'from' maior que 'to'")
+
+    versions = get_versions(db, SCOPE_COMPUTERS, SCOPE_MAINTENANCE)
+    cache_key = (granularity, group_by, from_date, to_date, tuple(versions.values()))
+    return get_maintenance_trends(
+        db,
+        granularity=granularity,
+        group_by=group_by,
+        from_date=from_date,
+        to_date=to_date,
+        cache_key=cache_key,
+    )
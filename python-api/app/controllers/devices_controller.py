@@ -2,10 +2,14 @@ from __future__ import annotations
 
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_user, require_permission
+from app.core.http_cache import conditional_response, make_etag, time_bucket
 
 # Auth temporariamente desabilitada para rotas de escrita (notas/manutenções).
 # Para reativar no futuro, reintroduza `Depends(get_current_user)` nas rotas POST/PUT/DELETE.
@@ -13,15 +17,33 @@ from app.core.database import get_db
 from app.models import Computer
 from app.schemas.schemas import (
     ComponentOut,
+    DeviceBundle,
     DeviceDetail,
+    DeviceFacets,
     DevicesPage,
     NoteCreate,
     NoteOut,
     NoteUpdate,
     MaintenanceOut,
 )
-from app.services.device_service import get_device_components, get_device_detail, list_devices
+from app.services.device_service import (
+    BUNDLE_INCLUDES,
+    get_device_bundle,
+    get_device_components,
+    get_device_detail,
+    get_device_facets,
+    list_devices,
+    parse_bundle_include,
+)
+from app.services.export_service import MEDIA_TYPES, stream_device_export
 from app.services.maintenance_service import get_device_maintenance_history
+from app.services.version_service import (
+    SCOPE_COMPONENTS,
+    SCOPE_COMPUTERS,
+    SCOPE_MAINTENANCE,
+    SCOPE_NOTES,
+    get_versions,
+)
 from app.services.note_service import (
     create_device_note,
     delete_device_note,
@@ -35,6 +57,8 @@ router = APIRouter(tags=["devices"])
 
 @router.get("/api/devices", response_model=DevicesPage)
 async def list_devices_endpoint(
+    request: Request,
+    response: Response,
     tab: str = Query("all", pattern="^(all|preventiva|corretiva)$"),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
@@ -42,19 +66,118 @@ async def list_devices_endpoint(
     db: Session = Depends(get_db),
     _user=Depends(get_current_user),
 ):
+    versions = get_versions(db, SCOPE_COMPUTERS, SCOPE_MAINTENANCE)
+    etag = make_etag("devices", tab, page, page_size, q or "", versions, time_bucket())
+    cached = conditional_response(request, response, etag)
+    if cached:
+        return cached
     return list_devices(db=db, tab=tab, page=page, page_size=page_size, q=q)
 
 
+@router.get("/api/devices/facets", response_model=DeviceFacets)
+async def get_device_facets_endpoint(
+    request: Request,
+    response: Response,
+    tab: str = Query("all", pattern="^(all|preventiva|corretiva)$"),
+    q: Optional[str] = None,
+    db: Session = Depends(get_db),
+    _user=Depends(get_current_user),
+):
+    """Contagens por entidade/localização/status para o filtro atual (`q`/`tab`)."""
+    q = (q or "").strip() or None
+    versions = get_versions(db, SCOPE_COMPUTERS, SCOPE_MAINTENANCE)
+    bucket = time_bucket()
+    etag = make_etag("facets", tab, q or "", versions, bucket)
+    cached = conditional_response(request, response, etag)
+    if cached:
+        return cached
+    cache_key = (tab, q, tuple(versions.values()), bucket)
+    return get_device_facets(db, tab=tab, q=q, cache_key=cache_key)
+
+
+@router.get("/api/devices/export")
+async def export_devices_endpoint(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|xlsx|ndjson)$"),
+    tab: str = Query("all", pattern="^(all|preventiva|corretiva)$"),
+    q: Optional[str] = None,
+    _user=Depends(require_permission("generate_report")),
+):
+    """Inventário completo (com componentes em colunas) em streaming.
+
+    Não usa `get_db`: o gerador abre a própria sessão e lê com cursor no servidor.
+    """
+    q = (q or "").strip() or None
+    filename = f"dispositivos_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return StreamingResponse(
+        stream_device_export(fmt, tab=tab, q=q),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get("/api/devices/{device_id}", response_model=DeviceDetail)
-async def get_device_detail_endpoint(device_id: int, db: Session = Depends(get_db), _user=Depends(get_current_user)):
+async def get_device_detail_endpoint(
+    device_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    _user=Depends(get_current_user),
+):
+    etag = make_etag("device", device_id, get_versions(db, SCOPE_COMPUTERS))
+    cached = conditional_response(request, response, etag)
+    if cached:
+        return cached
     detail = get_device_detail(db, device_id)
     if not detail:
         raise HTTPException(status_code=404, detail="Dispositivo não encontrado")
     return detail
 
 
+@router.get("/api/devices/{device_id}/bundle", response_model=DeviceBundle)
+async def get_device_bundle_endpoint(
+    device_id: int,
+    request: Request,
+    response: Response,
+    include: Optional[str] = Query(None, description="Lista separada por vírgula: components,maintenance,notes"),
+    db: Session = Depends(get_db),
+    _user=Depends(get_current_user),
+):
+    """Detalhe + componentes + manutenções + notas em uma única requisição."""
+    wanted = parse_bundle_include(include)
+    if wanted is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"include inválido; valores aceitos: {','.join(BUNDLE_INCLUDES)}",
+        )
+    scopes = [SCOPE_COMPUTERS]
+    if "components" in wanted:
+        scopes.append(SCOPE_COMPONENTS)
+    if "maintenance" in wanted:
+        scopes.append(SCOPE_MAINTENANCE)
+    if "notes" in wanted:
+        scopes.append(SCOPE_NOTES)
+    etag = make_etag("bundle", device_id, sorted(wanted), get_versions(db, *scopes))
+    cached = conditional_response(request, response, etag)
+    if cached:
+        return cached
+    bundle = get_device_bundle(db, device_id, wanted)
+    if not bundle:
+        raise HTTPException(status_code=404, detail="Dispositivo não encontrado")
+    return bundle
+
+
 @router.get("/api/devices/{device_id}/components", response_model=List[ComponentOut])
-async def get_device_components_endpoint(device_id: int, db: Session = Depends(get_db), _user=Depends(get_current_user)):
+async def get_device_components_endpoint(
+    device_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    _user=Depends(get_current_user),
+):
+    etag = make_etag("components", device_id, get_versions(db, SCOPE_COMPUTERS, SCOPE_COMPONENTS))
+    cached = conditional_response(request, response, etag)
+    if cached:
+        return cached
     computer = db.query(Computer).filter(Computer.id == device_id).first()
     if not computer:
         raise HTTPException(status_code=404, detail="Dispositivo não encontrado")
@@ -11,9 +11,22 @@ from app.integrations.glpi_client import GlpiClient
 # Auth temporariamente desabilitada para rotas de escrita (manutenção).
 # Para reativar no futuro, reintroduza `Depends(get_current_user)` nas rotas POST/PUT/DELETE.
 from app.core.database import get_db
-from app.schemas.schemas import MaintenanceCreate, MaintenanceOut, MaintenanceUpdate
-from app.services.glpi_outbox_service import enqueue_followup, try_send_followup
-from app.services.maintenance_service import create_maintenance, delete_maintenance, update_maintenance
+from app.schemas.schemas import (
+    MaintenanceBulkCreate,
+    MaintenanceBulkResult,
+    MaintenanceCreate,
+    MaintenanceOut,
+    MaintenanceUpdate,
+)
+from app.services.followup_dispatcher import dispatch_followup
+from app.services.glpi_outbox_service import enqueue_followup
+from app.services.maintenance_service import (
+    BulkTooLarge,
+    create_maintenance,
+    create_maintenance_bulk,
+    delete_maintenance,
+    update_maintenance,
+)
 
 
 router = APIRouter(tags=["maintenance"])
@@ -69,8 +82,8 @@ async def create_maintenance_endpoint(
             maintenance_id=int(created.id),
         )
 
-        # Tenta enviar imediatamente; se falhar, permanece como pending e pode ser reenviado depois.
-        await try_send_followup(db, outbox.id)
+        # Envio em segundo plano (não espera o GLPI); se falhar, permanece como pending no outbox.
+        dispatch_followup(outbox.id)
     except Exception:
         # Não falha o registro local caso o GLPI esteja indisponível.
         pass
@@ -78,6 +91,49 @@ async def create_maintenance_endpoint(
     return created
 
 
+@router.post("/api/maintenance/bulk", response_model=MaintenanceBulkResult)
+async def create_maintenance_bulk_endpoint(
+    payload: MaintenanceBulkCreate,
+    db: Session = Depends(get_db),
+    user=Depends(require_permission("add_maintenance")),
+):
+    # Campanhas (laboratório/setor inteiro): uma transação e um único acompanhamento no chamado.
+    technician = (user.get("display_name") or user.get("sub") or "").strip() or None
+    if technician:
+        payload = payload.model_copy(update={"technician": technician})
+
+    try:
+        items, computers = create_maintenance_bulk(db, payload)
+    except BulkTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    created = sum(1 for i in items if i.status == "created")
+    result = MaintenanceBulkResult(created=created, not_found=len(items) - created, items=items)
+    if not computers:
+        return result
+
+    try:
+        msg_type = "preditiva" if payload.maintenance_type == "Preventiva" else "corretiva"
+        lines = [
+            f"- {_sanitize_followup_text(name)}" + (f" ({_sanitize_followup_text(patrimonio)})" if patrimonio else "")
+            for _id, name, patrimonio, *_rest in computers
+        ]
+        content = f"Manutenção {msg_type} feita em {len(computers)} computador(es):\n" + "\n".join(lines)
+        if msg_type == "corretiva":
+            desc = (payload.description or "").strip()
+            if desc:
+                content += f"\n\nObservação registrada:\n{_sanitize_followup_text(desc)}"
+
+        outbox = enqueue_followup(db, ticket_id=int(payload.glpi_ticket_id), content=content)
+        result.followup_outbox_id = int(outbox.id)
+        dispatch_followup(outbox.id)
+    except Exception:
+        # Não falha o registro local caso o GLPI esteja indisponível.
+        pass
+
+    return result
+
+
 @router.put("/api/maintenance/{maintenance_id}", response_model=MaintenanceOut)
 async def update_maintenance_endpoint(
     maintenance_id: int,
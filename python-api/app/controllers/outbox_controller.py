@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core.auth import require_admin
+from app.core.database import get_db
+from app.schemas.schemas import (
+    OutboxDeadPage,
+    OutboxItemOut,
+    OutboxRequeueRequest,
+    OutboxRequeueResult,
+    OutboxStats,
+)
+from app.services.glpi_outbox_service import list_dead_letters, outbox_stats, requeue_dead_letters
+
+
+router = APIRouter(tags=["outbox"])
+
+
+@router.get("/api/glpi/outbox/stats", response_model=OutboxStats)
+async def outbox_queue_stats(
+    db: Session = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    return OutboxStats(**outbox_stats(db))
+
+
+@router.get("/api/glpi/outbox/dead", response_model=OutboxDeadPage)
+async def outbox_dead_letters(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    items, total = list_dead_letters(db, limit=limit, offset=offset)
+    return OutboxDeadPage(items=[OutboxItemOut.model_validate(i) for i in items], total=total)
+
+
+@router.post("/api/glpi/outbox/dead/requeue", response_model=OutboxRequeueResult)
+async def outbox_requeue(
+    payload: OutboxRequeueRequest,
+    db: Session = Depends(get_db),
+    _admin=Depends(require_admin),
+):
+    return OutboxRequeueResult(requeued=requeue_dead_letters(db, ids=payload.ids))
@@ -1,15 +1,40 @@
 from __future__ import annotations
 
+import os
 from datetime import date
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.core.auth import require_permission
 from app.core.database import get_db
-from app.schemas.report_schemas import MaintenanceReportResponse
-from app.services.report_service import get_maintenance_report
+from app.schemas.report_schemas import (
+    MaintenanceAggregates,
+    MaintenanceReportPage,
+    MaintenanceReportResponse,
+    ReportCacheStats,
+    ReportJobCreate,
+    ReportJobOut,
+)
+from app.services.dashboard_service import default_trends_range
+from app.services.report_aggregate_service import get_maintenance_aggregates
+from app.services.report_cache_service import (
+    cache_report_stream,
+    get_cached_report,
+    report_cache_key,
+    report_cache_stats,
+    report_stamp,
+)
+from app.services.report_job_service import STATUS_DONE, enqueue_report_job, get_report_job, job_progress
+from app.services.report_service import (
+    MEDIA_TYPES,
+    count_maintenance_report,
+    get_maintenance_report_page,
+    stream_maintenance_report,
+)
+from app.services.version_service import SCOPE_COMPUTERS, SCOPE_MAINTENANCE, get_versions
 
 
 router = APIRouter(tags=["reports"])
@@ -20,13 +45,149 @@ async def maintenance_report(
     from_date: Optional[date] = Query(None, alias="from"),
     to_date: Optional[date] = Query(None, alias="to"),
     maintenance_type: Optional[str] = Query(None),
+    fmt: str = Query("json", alias="format", pattern="^(json|ndjson|csv)$"),
     db: Session = Depends(get_db),
     _user=Depends(require_permission("generate_report")),
 ):
     # maintenance_type: Preventiva | Corretiva | (vazio/qualquer outro => ambas)
-    return get_maintenance_report(
+    # Sempre em streaming (cursor no servidor); `json` mantém o formato {items, total}.
+    filters = dict(from_date=from_date, to_date=to_date, maintenance_type=maintenance_type)
+
+    # Resultado em cache (por processo). A chave leva o carimbo do período (versões
+    # por mês/tipo), então só escritas que caem no período, em qualquer worker, viram MISS.
+    key = report_cache_key(fmt, stamp=report_stamp(db, **filters), **filters)
+    cached = get_cached_report(key)
+    if cached is not None:
+        body, headers = cached
+        return Response(content=body, media_type=MEDIA_TYPES[fmt], headers={**headers, "X-Cache": "HIT"})
+
+    headers = {}
+    if fmt != "json":
+        # Em NDJSON/CSV não há onde pôr o total no corpo: COUNT separado (só índice).
+        headers["X-Total-Count"] = str(count_maintenance_report(db, **filters))
+    if fmt == "csv":
+        headers["Content-Disposition"] = 'attachment; filename="relatorio_manutencoes.csv"'
+
+    return StreamingResponse(
+        cache_report_stream(key, stream_maintenance_report(fmt, **filters), dict(headers)),
+        media_type=MEDIA_TYPES[fmt],
+        headers={**headers, "X-Cache": "MISS"},
+    )
+
+
+@router.get("/api/reports/cache/stats", response_model=ReportCacheStats)
+async def report_cache_statistics(
+    _user=Depends(require_permission("generate_report")),
+):
+    # Contadores do processo que atendeu a requisição (cada worker tem o seu cache).
+    return report_cache_stats()
+
+
+@router.get("/api/reports/maintenance/page", response_model=MaintenanceReportPage)
+async def maintenance_report_page(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    maintenance_type: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    _user=Depends(require_permission("generate_report")),
+):
+    # Paginação por cursor: use `next_cursor` da resposta anterior.
+    try:
+        return get_maintenance_report_page(
+            db,
+            from_date=from_date,
+            to_date=to_date,
+            maintenance_type=maintenance_type,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/api/reports/aggregates", response_model=MaintenanceAggregates)
+async def maintenance_aggregates(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    _user=Depends(require_permission("generate_report")),
+):
+    # Padrão: últimos 12 meses. `limit` vale para a lista de intervalos entre corretivas.
+    default_from, default_to = default_trends_range("month")
+    from_date = from_date or default_from
+    to_date = to_date or default_to
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="Período inválido: 'from' maior que 'to'")
+
+    versions = get_versions(db, SCOPE_COMPUTERS, SCOPE_MAINTENANCE)
+    cache_key = (from_date, to_date, limit, tuple(versions.values()))
+    return get_maintenance_aggregates(db, from_date=from_date, to_date=to_date, limit=limit, cache_key=cache_key)
+
+
+def _job_out(job) -> ReportJobOut:
+    return ReportJobOut(
+        id=job.id,
+        status=job.status,
+        format=job.format,
+        params=dict(job.params or {}),
+        progress=job_progress(job),
+        rows_total=job.rows_total,
+        rows_done=int(job.rows_done or 0),
+        file_size=job.file_size,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        download_url=f"/api/reports/jobs/{job.id}/download" if job.status == STATUS_DONE else None,
+    )
+
+
+@router.post("/api/reports/jobs", response_model=ReportJobOut, status_code=202)
+async def create_report_job(
+    payload: ReportJobCreate,
+    db: Session = Depends(get_db),
+    user=Depends(require_permission("generate_report")),
+):
+    """Enfileira o relatório; pedidos idênticos reaproveitam o mesmo job."""
+    job = enqueue_report_job(
         db,
-        from_date=from_date,
-        to_date=to_date,
-        maintenance_type=maintenance_type,
+        from_date=payload.from_date,
+        to_date=payload.to_date,
+        maintenance_type=payload.maintenance_type,
+        fmt=payload.format,
+        requested_by=str(user.get("sub") or "") or None,
+    )
+    return _job_out(job)
+
+
+@router.get("/api/reports/jobs/{job_id}", response_model=ReportJobOut)
+async def get_report_job_status(
+    job_id: int,
+    db: Session = Depends(get_db),
+    _user=Depends(require_permission("generate_report")),
+):
+    job = get_report_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Relatório não encontrado")
+    return _job_out(job)
+
+
+@router.get("/api/reports/jobs/{job_id}/download")
+async def download_report_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    _user=Depends(require_permission("generate_report")),
+):
+    job = get_report_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Relatório não encontrado")
+    if job.status != STATUS_DONE or not job.file_path or not os.path.isfile(job.file_path):
+        raise HTTPException(status_code=409, detail=f"Relatório indisponível (status: {job.status})")
+    return FileResponse(
+        job.file_path,
+        media_type=MEDIA_TYPES.get(job.format, "application/octet-stream"),
+        filename=f"relatorio_manutencoes_{job.id}.{job.format}",
     )
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime, timedelta, timezone
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Optional
 
 import jwt
 from fastapi import Depends, HTTPException
@@ -10,7 +11,8 @@ from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.database import get_db
-from app.models import User
+from app.integrations import ldap_directory
+from app.services.user_service import get_principal, token_is_current
 
 
 def _jwt_now() -> datetime:
@@ -34,6 +36,18 @@ def create_access_token(payload: Dict[str, Any]) -> str:
     return jwt.encode(to_encode, secret, algorithm=settings.JWT_ALGORITHM)
 
 
+def user_token_payload(user: Dict[str, Any], token_version: int) -> Dict[str, Any]:
+    """Claims do login: com AUTH_STATELESS_TOKENS a autorização sai só daqui."""
+    return {
+        "sub": user["username"],
+        "display_name": user.get("display_name"),
+        "email": user.get("email"),
+        "role": user.get("role"),
+        "permissions": dict(user.get("permissions") or {}),
+        "token_version": int(token_version or 0),
+    }
+
+
 def decode_access_token(token: str) -> Dict[str, Any]:
     try:
         return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
@@ -63,37 +77,30 @@ def get_current_user(
     if not username:
         raise HTTPException(status_code=401, detail="Token inválido")
 
-    user = db.query(User).filter(User.username == username).first()
+    if not token_is_current(db, username, payload.get("token_version") or 0):
+        raise HTTPException(status_code=401, detail="Sessão encerrada; faça login novamente")
+
+    if settings.AUTH_STATELESS_TOKENS and "role" in payload:
+        return {
+            "sub": username,
+            "display_name": payload.get("display_name"),
+            "email": payload.get("email"),
+            "groups": [],
+            "role": payload.get("role"),
+            "permissions": dict(payload.get("permissions") or {}),
+            "token_version": int(payload.get("token_version") or 0),
+        }
+
+    # Cache por worker (app.services.user_service.get_principal): sem SELECT em users
+    # na maioria das requisições.
+    user = get_principal(db, username)
     if not user:
         raise HTTPException(status_code=401, detail="Usuário não encontrado")
-
-    return {
-        "sub": user.username,
-        "display_name": user.display_name,
-        "email": user.email,
-        "groups": list(user.groups or []),
-        "role": user.role,
-        "permissions": {
-            "add_note": bool(user.can_add_note),
-            "add_maintenance": bool(user.can_add_maintenance),
-            "generate_report": bool(user.can_generate_report),
-            "manage_permissions": bool(user.can_manage_permissions),
-        },
-    }
-
-
-def _normalize_group_dns(member_of: Any) -> List[str]:
-    if not member_of:
-        return []
-    if isinstance(member_of, str):
-        return [member_of]
-    if isinstance(member_of, (list, tuple)):
-        return [str(x) for x in member_of]
-    return [str(member_of)]
+    return user
 
 
 def ldap_authenticate(username: str, password: str) -> Dict[str, Any]:
-    """Autentica no AD via bind.
+    """Autentica no AD via bind (bloqueante; na API use ldap_authenticate_async).
 
     - NÃO grava nada no LDAP/AD.
     - Retorna dados básicos do usuário e grupos (DNs) se base_dn estiver configurado.
@@ -101,54 +108,18 @@ def ldap_authenticate(username: str, password: str) -> Dict[str, Any]:
     if not settings.LDAP_SERVER:
         raise HTTPException(status_code=503, detail="LDAP_SERVER não configurado")
 
-    from ldap3 import ALL, Connection, Server
-
-    bind_user = username.strip()
-    if "\\" not in bind_user and "@" not in bind_user and settings.LDAP_DOMAIN:
-        bind_user = f"{bind_user}@{settings.LDAP_DOMAIN}"
-
-    server = Server(
-        settings.LDAP_SERVER,
-        get_info=ALL,
-        use_ssl=bool(settings.LDAP_USE_SSL),
-        connect_timeout=int(settings.LDAP_CONNECT_TIMEOUT_SECONDS),
-    )
-
     try:
-        conn = Connection(server, user=bind_user, password=password, auto_bind=True)
-    except Exception:
+        user_info = ldap_directory.authenticate(username, password)
+    except ldap_directory.LdapUnavailable:
+        raise HTTPException(status_code=503, detail="Servidor LDAP indisponível")
+    if user_info is None:
         raise HTTPException(status_code=401, detail="Usuário ou senha inválidos")
+    return user_info
 
-    user_info: Dict[str, Any] = {
-        "username": username.strip(),
-        "display_name": None,
-        "email": None,
-        "groups": [],
-    }
-
-    base_dn = (settings.LDAP_BASE_DN or "").strip()
-    sam = username.split("\\")[-1].split("@")[0]
-    if base_dn:
-        try:
-            conn.search(
-                search_base=base_dn,
-                search_filter=f"(&(objectClass=user)(sAMAccountName={sam}))",
-                attributes=["displayName", "mail", "memberOf"],
-            )
-            if conn.entries:
-                entry = conn.entries[0]
-                user_info["display_name"] = str(getattr(entry, "displayName", "") or "") or None
-                user_info["email"] = str(getattr(entry, "mail", "") or "") or None
-                user_info["groups"] = _normalize_group_dns(getattr(entry, "memberOf", None))
-        except Exception:
-            pass
 
-    try:
-        conn.unbind()
-    except Exception:
-        pass
-
-    return user_info
+async def ldap_authenticate_async(username: str, password: str) -> Dict[str, Any]:
+    # Bind e busca rodam nas threads do pool LDAP, sem travar o event loop.
+    return await asyncio.wrap_future(ldap_directory.executor().submit(ldap_authenticate, username, password))
 
 
 def require_permission(permission: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
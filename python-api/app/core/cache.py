@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Cache em memória (por processo) com TTL e limite de entradas.
+
+    Para invalidar entre workers, inclua na chave as versões de `data_versions`:
+    uma escrita muda a versão e a chave antiga simplesmente deixa de ser usada.
+    `clear()` existe para invalidação explícita dentro do mesmo processo.
+    """
+
+    def __init__(self, *, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            ts, value = entry
+            if time.monotonic() - ts > self.ttl_seconds:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class ByteLRUCache:
+    """LRU em memória (por processo) limitado pelo total de bytes dos valores.
+
+    Valores são `bytes` (corpo já codificado). Cada entrada tem TTL, e entradas
+    maiores que `max_entry_bytes` não são guardadas. `invalidate(predicate)`
+    remove só as chaves para as quais o predicado retorna True.
+    """
+
+    def __init__(self, *, max_bytes: int, max_entry_bytes: int, ttl_seconds: float):
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_entry_bytes = min(self.max_bytes, max(1, int(max_entry_bytes)))
+        self.ttl_seconds = float(ttl_seconds)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Incrementa a cada invalidação: quem começou a preencher antes não grava.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _drop(self, key: Hashable) -> None:
+        _ts, body, _meta = self._data.pop(key)
+        self._bytes -= len(body)
+
+    def get(self, key: Hashable) -> Optional[tuple]:
+        """Retorna (body, meta) ou None."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            ts, body, meta = entry
+            if time.monotonic() - ts > self.ttl_seconds:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return body, meta
+
+    def set(self, key: Hashable, body: bytes, meta: Any = None, *, generation: Optional[int] = None) -> bool:
+        size = len(body)
+        with self._lock:
+            if size > self.max_entry_bytes:
+                return False
+            if generation is not None and generation != self.generation:
+                return False
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic(), body, meta)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._data:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            self.generation += 1
+            keys = [k for k in self._data if predicate(k)]
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -22,26 +22,96 @@ class Settings(BaseSettings):
     GLPI_TICKETS_CACHE_TTL_SECONDS: int = 30
     # Se o GLPI estiver fora, permite servir último cache por um tempo (evita dropdown vazio)
     GLPI_TICKETS_CACHE_STALE_MAX_SECONDS: int = 10 * 60
+    # Rotas/parâmetros aceitos pelo GLPI são aprendidos por processo; a versão é
+    # reconferida neste intervalo e, se mudar, tudo é redescoberto.
+    GLPI_CAPABILITIES_TTL_SECONDS: int = 3600
 
     # GLPI - Outbox (evita perder follow-up quando GLPI estiver indisponível)
     GLPI_OUTBOX_WORKER_ENABLED: bool = False
     GLPI_OUTBOX_PROCESS_INTERVAL_SECONDS: int = 60
     GLPI_OUTBOX_PROCESS_BATCH_SIZE: int = 25
+    # Envio em segundo plano logo após registrar a manutenção (fila em memória + workers)
+    GLPI_FOLLOWUP_DISPATCH_WORKERS: int = 2
+    GLPI_FOLLOWUP_DISPATCH_QUEUE_SIZE: int = 1000
+    # O processamento do outbox ignora itens mais novos que isso (ainda com o dispatcher)
+    GLPI_OUTBOX_MIN_AGE_SECONDS: int = 30
+    # Envios simultâneos por lote e duração da reserva (lease) de cada item
+    GLPI_OUTBOX_CONCURRENCY: int = 5
+    GLPI_OUTBOX_LEASE_SECONDS: int = 120
+    # Followups criados por POST (mensagens do mesmo chamado já vêm combinadas)
+    GLPI_OUTBOX_BULK_SIZE: int = 20
+    # Retentativas: backoff exponencial com jitter; após N falhas o item vira `dead`
+    GLPI_OUTBOX_MAX_ATTEMPTS: int = 8
+    GLPI_OUTBOX_RETRY_BASE_SECONDS: int = 60
+    GLPI_OUTBOX_RETRY_MAX_SECONDS: int = 6 * 3600
+    # Daemon (tools/process_glpi_outbox.py --daemon): polling rápido com trabalho, lento ocioso.
+    GLPI_OUTBOX_DAEMON_MIN_INTERVAL_SECONDS: int = 1
+    GLPI_OUTBOX_DAEMON_MAX_INTERVAL_SECONDS: int = 30
+    GLPI_OUTBOX_METRICS_LOG_SECONDS: int = 60
+    # Retenção dos itens `sent`: archive (move para glpi_followup_outbox_archive) | delete
+    GLPI_OUTBOX_RETENTION_DAYS: int = 30
+    GLPI_OUTBOX_RETENTION_MODE: str = "archive"
+    GLPI_OUTBOX_RETENTION_BATCH_SIZE: int = 500
+    GLPI_OUTBOX_RETENTION_PAUSE_SECONDS: float = 0.2
+
+    # Relatórios em background (tools/report_worker.py)
+    REPORT_JOBS_DIR: str = str(Path(__file__).resolve().parents[2] / "report_artifacts")
+    REPORT_JOBS_WORKERS: int = 2
+    REPORT_JOBS_POLL_SECONDS: int = 5
+    REPORT_JOBS_MAX_AGE_HOURS: int = 24
+    REPORT_JOBS_MAX_TOTAL_MB: int = 1024
+    # Job em "running" sem atualização por esse tempo volta para a fila (worker caiu)
+    REPORT_JOBS_STALE_MINUTES: int = 30
 
     # App
     CORS_ORIGINS: str = "http://localhost:3000"
     MAINTENANCE_INTERVAL_DAYS: int = 365
 
+    # HTTP cache (ETag/304). Respostas que dependem da hora atual (status Em Dia/Atrasada)
+    # mudam de ETag a cada janela.
+    HTTP_CACHE_TIME_BUCKET_SECONDS: int = 60
+
+    # Contagens por faceta em /api/devices/facets (também invalidado por data_versions)
+    DEVICE_FACETS_CACHE_TTL_SECONDS: int = 60
+
+    # Métricas do dashboard em memória (invalidado por manutenções e sync)
+    DASHBOARD_CACHE_TTL_SECONDS: int = 15
+    # /api/dashboard/trends por conjunto de parâmetros (também invalidado por data_versions)
+    DASHBOARD_TRENDS_CACHE_TTL_SECONDS: int = 300
+    # /api/reports/aggregates por conjunto de parâmetros (também invalidado por data_versions)
+    REPORT_AGGREGATES_CACHE_TTL_SECONDS: int = 300
+    # Resultado de /api/reports/maintenance em memória, limitado por bytes (LRU);
+    # invalidado pelas escritas de manutenção que caem no período do relatório.
+    REPORT_CACHE_MAX_MB: int = 64
+    REPORT_CACHE_MAX_ENTRY_MB: int = 16
+    REPORT_CACHE_TTL_SECONDS: int = 600
+
     # Auth (LDAP/AD + JWT)
     AUTH_ENABLED: bool = True
     JWT_SECRET: str = "change-me"  # troque via .env
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRES_MINUTES: int = 12 * 60
 
+    # Cache (por worker) do usuário resolvido em get_current_user.
+    # A versão de `users` em data_versions é conferida no máximo a cada CHECK segundos.
+    USER_PRINCIPAL_CACHE_TTL_SECONDS: int = 300
+    USER_PRINCIPAL_CACHE_MAX_ENTRIES: int = 1024
+    USER_PRINCIPAL_VERSION_CHECK_SECONDS: int = 5
+    # Autorização só pelo token (papel/permissões/token_version no JWT), sem consultar users.
+    # Mudança de permissões revoga os tokens do usuário (novo login).
+    AUTH_STATELESS_TOKENS: bool = False
+
     # Login
     # Mantém login local sempre disponível.
     # Se no futuro quiser permitir login via LDAP/AD, habilite esta flag e configure LDAP_*.
     LOGIN_ALLOW_LDAP: bool = False
+    # PBKDF2 em pool de threads limitado; acima de MAX_PENDING o login responde 503.
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16
+    # Falhas de login por usuário e por IP dentro da janela (por worker); acima disso, 429.
+    LOGIN_MAX_FAILURES_PER_USER: int = 5
+    LOGIN_MAX_FAILURES_PER_IP: int = 30
+    LOGIN_FAILURE_WINDOW_SECONDS: int = 300
 
     # LDAP (Active Directory)
     LDAP_SERVER: str = ""  # ex: ldap://dc01.seudominio.local ou ldaps://dc01.seudominio.local
@@ -49,6 +119,14 @@ class Settings(BaseSettings):
     LDAP_DOMAIN: str = ""  # ex: seudominio.local (para usar username@domain no bind)
     LDAP_USE_SSL: bool = False
     LDAP_CONNECT_TIMEOUT_SECONDS: int = 10
+    # Conta de serviço (opcional) para buscar atributos/grupos com conexões em pool;
+    # sem ela a busca usa o bind do próprio usuário. LDAP_SERVER aceita vários endereços (vírgula).
+    LDAP_BIND_USER: str = ""
+    LDAP_BIND_PASSWORD: str = ""
+    LDAP_POOL_SIZE: int = 4
+    LDAP_WORKERS: int = 4
+    LDAP_USER_CACHE_TTL_SECONDS: int = 600
+    LDAP_USER_CACHE_MAX_ENTRIES: int = 1024
 
     class Config:
         # python-api/.env (mantém compatibilidade com configuração atual)
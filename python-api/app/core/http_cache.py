@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+
+# Respostas dependem do usuário autenticado: só o navegador pode guardar, e
+# sempre revalida via If-None-Match (barato: 1 SELECT por PK em data_versions).
+CACHE_CONTROL = "private, no-cache"
+
+
+def time_bucket() -> int:
+    """Janela de tempo para respostas que dependem de `now` (status Em Dia/Atrasada)."""
+    size = max(1, int(getattr(settings, "HTTP_CACHE_TIME_BUCKET_SECONDS", 60) or 60))
+    return int(time.time() // size)
+
+
+def make_etag(*parts: Any) -> str:
+    raw = "|".join(str(p) for p in parts)
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest() + '"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _set_headers(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.headers["Vary"] = "Authorization"
+
+
+def conditional_response(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Retorna um 304 se o cliente já tem essa versão.
+
+    Caso contrário, grava ETag/Cache-Control em `response` e retorna None para o
+    endpoint seguir com a consulta normal.
+    """
+    if _matches(request.headers.get("if-none-match"), etag):
+        not_modified = Response(status_code=304)
+        _set_headers(not_modified, etag)
+        return not_modified
+    _set_headers(response, etag)
+    return None
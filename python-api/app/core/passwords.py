@@ -1,15 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import base64
 import hashlib
 import hmac
 import os
-from typing import Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from app.core.config import settings
 
 
 _DEFAULT_ITERATIONS = 210_000
 
 
+class PasswordHashBusy(RuntimeError):
+    """Pool de hash com a fila cheia (PASSWORD_HASH_MAX_PENDING)."""
+
+
 def _pbkdf2_sha256(password: str, salt: bytes, iterations: int) -> bytes:
     return hashlib.pbkdf2_hmac(
         "sha256",
@@ -61,3 +70,58 @@ def verify_password(password: str, stored_hash: str) -> bool:
         return hmac.compare_digest(actual, expected)
     except Exception:
         return False
+
+
+# PBKDF2 roda fora do event loop. hashlib.pbkdf2_hmac libera o GIL, então threads
+# bastam; o pool é pequeno e a fila limitada para o hash não tomar a CPU da API.
+_executor: Optional[ThreadPoolExecutor] = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, int(getattr(settings, "PASSWORD_HASH_WORKERS", 2) or 2)),
+                thread_name_prefix="password-hash",
+            )
+        return _executor
+
+
+def _release(_future: Any) -> None:
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+async def _run_hash(fn: Callable[..., Any], *args: Any) -> Any:
+    global _pending
+    limit = max(1, int(getattr(settings, "PASSWORD_HASH_MAX_PENDING", 16) or 16))
+    with _lock:
+        if _pending >= limit:
+            raise PasswordHashBusy("pool de hash de senha ocupado")
+        _pending += 1
+    try:
+        future = _pool().submit(fn, *args)
+    except Exception:
+        _release(None)
+        raise
+    # A vaga só é liberada quando o hash termina de fato (mesmo se o request cair antes).
+    future.add_done_callback(_release)
+    return await asyncio.wrap_future(future)
+
+
+async def verify_password_async(password: str, stored_hash: str) -> bool:
+    if not password or not stored_hash:
+        return False
+    return await _run_hash(verify_password, password, stored_hash)
+
+
+def shutdown_hash_pool() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
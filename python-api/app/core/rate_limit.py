@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Hashable
+
+
+class SlidingWindowCounter:
+    """Conta eventos por chave numa janela deslizante (em memória, por processo).
+
+    `retry_after(key)` devolve quantos segundos faltam para a chave voltar a ficar
+    abaixo do limite (0 = liberada). O número de chaves é limitado (LRU) para que
+    nomes de usuário inventados não façam a memória crescer sem fim.
+    """
+
+    def __init__(self, *, limit: int, window_seconds: float, max_keys: int = 10_000):
+        self.limit = max(1, int(limit))
+        self.window_seconds = float(window_seconds)
+        self.max_keys = max(1, int(max_keys))
+        self._events: "OrderedDict[Hashable, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _trim(self, key: Hashable, now: float) -> Deque[float]:
+        events = self._events.get(key)
+        if events is None:
+            return deque()
+        while events and now - events[0] >= self.window_seconds:
+            events.popleft()
+        if not events:
+            del self._events[key]
+        return events
+
+    def retry_after(self, key: Hashable) -> float:
+        now = time.monotonic()
+        with self._lock:
+            events = self._trim(key, now)
+            if len(events) < self.limit:
+                return 0.0
+            return max(0.0, self.window_seconds - (now - events[0]))
+
+    def hit(self, key: Hashable) -> None:
+        now = time.monotonic()
+        with self._lock:
+            events = self._trim(key, now)
+            if not events:
+                self._events[key] = events
+            events.append(now)
+            self._events.move_to_end(key)
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+
+    def reset(self, key: Hashable) -> None:
+        with self._lock:
+            self._events.pop(key, None)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import re
+import time
+from typing import Dict, Optional
+
+
+# Rotas de criação de followup, na ordem de tentativa.
+FOLLOWUP_ROUTES = ("itilfollowup", "ticket_itilfollowup", "ticket_ticketfollowup")
+
+_ACCEPT_RANGE_RE = re.compile(r"^\s*(\w+)\s+(\d+)\s*$")
+
+# Rota/método que a instalação não tem: só isso vira capacidade negativa direto.
+ROUTE_REJECTED_STATUSES = frozenset({404, 405})
+# Pedido recusado sem criar nada. 400/422 também vêm de erro de um item (chamado
+# fechado ou inexistente), então sozinhos não provam falta de suporte.
+# 401/429/5xx são falhas passageiras e nunca entram aqui.
+REQUEST_REJECTED_STATUSES = ROUTE_REJECTED_STATUSES | {400, 422}
+
+
+class BulkFollowupUnsupported(RuntimeError):
+    """O GLPI recusou `input` em lista na criação de followups (nada foi criado).
+
+    `confirmed` = já se sabe que a instalação não aceita lote (rota recusada ou
+    aprendido antes); False = 400/422, que pode ter sido culpa de um item.
+    """
+
+    def __init__(self, message: str, *, confirmed: bool = True) -> None:
+        super().__init__(message)
+        self.confirmed = confirmed
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    response = getattr(exc, "response", None)
+    return response.status_code if response is not None else None
+
+
+def is_route_rejection(exc: BaseException) -> bool:
+    return _status_code(exc) in ROUTE_REJECTED_STATUSES
+
+
+def is_request_rejection(exc: BaseException) -> bool:
+    return _status_code(exc) in REQUEST_REJECTED_STATUSES
+
+
+class GlpiCapabilities:
+    """O que a instalação do GLPI aceita, aprendido uma vez por processo.
+
+    Cada campo começa desconhecido (None) e é preenchido na primeira chamada que
+    descobre a resposta; depois os métodos do GlpiClient vão direto na variante
+    que funciona. Se a versão do GLPI mudar (checada a cada `ttl_seconds` no
+    initSession), tudo é esquecido e reaprendido.
+    """
+
+    def __init__(self) -> None:
+        self.version: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.followup_route: Optional[str] = None
+        self.followup_bulk: Optional[bool] = None
+        self.ticket_sort: Optional[bool] = None
+        # Maior range por itemtype (header Accept-Range das respostas de lista)
+        self.max_range: Dict[str, int] = {}
+
+    def reset(self) -> None:
+        self.followup_route = None
+        self.followup_bulk = None
+        self.ticket_sort = None
+        self.max_range = {}
+
+    def needs_check(self, ttl_seconds: float) -> bool:
+        return self.checked_at is None or time.monotonic() - self.checked_at > ttl_seconds
+
+    def set_version(self, version: Optional[str]) -> None:
+        if version and self.version and version != self.version:
+            self.reset()
+        if version:
+            self.version = version
+        self.checked_at = time.monotonic()
+
+    def learn_accept_range(self, header: Optional[str]) -> None:
+        # Ex.: "Accept-Range: Ticket 1000"
+        match = _ACCEPT_RANGE_RE.match(header or "")
+        if match:
+            self.max_range[match.group(1)] = int(match.group(2))
+
+    def clamp_range(self, itemtype: str, limit: int) -> int:
+        max_range = self.max_range.get(itemtype)
+        return min(limit, max_range) if max_range else limit
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "version": self.version,
+            "followup_route": self.followup_route,
+            "followup_bulk": self.followup_bulk,
+            "ticket_sort": self.ticket_sort,
+            "max_range": dict(self.max_range),
+        }
+
+
+_by_base_url: Dict[str, GlpiCapabilities] = {}
+
+
+def get_capabilities(base_url: str) -> GlpiCapabilities:
+    caps = _by_base_url.get(base_url)
+    if caps is None:
+        caps = _by_base_url[base_url] = GlpiCapabilities()
+    return caps
@@ -1,10 +1,18 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import httpx
 
 from app.core.config import settings
+from app.integrations.glpi_capabilities import (
+    FOLLOWUP_ROUTES,
+    BulkFollowupUnsupported,
+    GlpiCapabilities,
+    get_capabilities,
+    is_request_rejection,
+    is_route_rejection,
+)
 
 
 class GlpiClient:
@@ -13,6 +21,7 @@ class GlpiClient:
         self.app_token = settings.GLPI_APP_TOKEN
         self.user_token = settings.GLPI_USER_TOKEN
         self.session_token: Optional[str] = None
+        self.capabilities: GlpiCapabilities = get_capabilities(self.base_url)
 
     async def _get(self, path: str, *, params: Optional[Dict[str, Any]] = None) -> Any:
         """Requisição GET ao GLPI."""
@@ -28,6 +37,7 @@ class GlpiClient:
         async with httpx.AsyncClient() as client:
             response = await client.get(f"{self.base_url}{path}", headers=headers, params=params)
             response.raise_for_status()
+            self.capabilities.learn_accept_range(response.headers.get("Accept-Range"))
             return response.json()
 
     async def _post(self, path: str, *, json: Optional[Dict[str, Any]] = None) -> Any:
@@ -59,8 +69,23 @@ class GlpiClient:
         """Inicializa sessão com GLPI API"""
         data = await self._get("/initSession")
         self.session_token = data.get("session_token")
+        await self._check_version()
         return self.session_token
 
+    async def _check_version(self) -> None:
+        """Lê a versão do GLPI (no máximo uma vez por GLPI_CAPABILITIES_TTL_SECONDS)."""
+        ttl = float(getattr(settings, "GLPI_CAPABILITIES_TTL_SECONDS", 3600) or 3600)
+        if not self.session_token or not self.capabilities.needs_check(ttl):
+            return
+        version = None
+        try:
+            data = await self._get("/getGlpiConfig")
+            cfg = data.get("cfg_glpi") if isinstance(data, dict) else None
+            version = (cfg or {}).get("version")
+        except Exception:
+            pass
+        self.capabilities.set_version(str(version) if version else None)
+
     async def kill_session(self):
         """Encerra sessão com GLPI API"""
         if not self.session_token:
@@ -88,7 +113,7 @@ class GlpiClient:
         A API do GLPI não tem um filtro universal simples via /Ticket; por isso buscamos
         um range inicial e filtramos em memória.
         """
-        limit = max(1, min(int(limit), 500))
+        limit = self.capabilities.clamp_range("Ticket", max(1, min(int(limit), 500)))
 
         base_params: Dict[str, Any] = {
             "range": f"0-{limit - 1}",
@@ -96,53 +121,129 @@ class GlpiClient:
         }
 
         # GLPI normalmente suporta sort/order; isso permite pegar os tickets mais recentes.
-        # Se a instalação não suportar, faz fallback para o comportamento anterior.
-        try:
-            data = await self._get(
-                "/Ticket",
-                params={
-                    **base_params,
-                    "sort": "id",
-                    "order": "DESC",
-                },
-            )
-        except Exception:
+        # Se a instalação não suportar, faz fallback para o comportamento anterior
+        # e lembra disso (não tenta de novo com sort neste processo). Aqui o pedido não
+        # tem dado de item, então 400/404/405/422 só podem ser o sort; 401/429/5xx
+        # sobem sem marcar nada.
+        caps = self.capabilities
+        if caps.ticket_sort is False:
             data = await self._get("/Ticket", params=base_params)
+        else:
+            try:
+                data = await self._get(
+                    "/Ticket",
+                    params={
+                        **base_params,
+                        "sort": "id",
+                        "order": "DESC",
+                    },
+                )
+                caps.ticket_sort = True
+            except httpx.HTTPStatusError as e:
+                if not is_request_rejection(e):
+                    raise
+                data = await self._get("/Ticket", params=base_params)
+                caps.ticket_sort = False
 
         return data if isinstance(data, list) else []
 
+    async def _post_followup(self, route: str, ticket_id: int, content: str) -> None:
+        if route == "itilfollowup":
+            payload = {"input": {"itemtype": "Ticket", "items_id": ticket_id, "content": content}}
+            await self._post("/ITILFollowup", json=payload)
+        elif route == "ticket_itilfollowup":
+            await self._post(f"/Ticket/{ticket_id}/ITILFollowup", json={"input": {"content": content}})
+        else:
+            await self._post(f"/Ticket/{ticket_id}/TicketFollowup", json={"input": {"content": content}})
+
     async def add_ticket_followup(self, ticket_id: int, content: str) -> None:
-        """Adiciona um followup/comentário em um ticket (best-effort)."""
+        """Adiciona um followup/comentário em um ticket (best-effort).
+
+        A rota que funciona nesta instalação (ITILFollowup direto, aninhado no
+        ticket ou TicketFollowup legado) é descoberta na primeira chamada e
+        reutilizada; só volta a testar as outras se a rota conhecida não existir
+        (404/405). 400/422 na rota conhecida é erro do item (ex.: chamado fechado)
+        e sobe sem trocar de rota, assim como 401/429/5xx. Se nenhuma rota aceitar,
+        o último erro sobe.
+        """
         ticket_id = int(ticket_id)
         content = (content or "").strip()
         if ticket_id <= 0 or not content:
             return
 
-        # Prefer: criar ITILFollowup diretamente (formato mais comum nas versões atuais)
-        payload_a = {
-            "input": {
-                "itemtype": "Ticket",
-                "items_id": ticket_id,
-                "content": content,
-            }
-        }
+        caps = self.capabilities
+        known = caps.followup_route
+        if known:
+            try:
+                await self._post_followup(known, ticket_id, content)
+                return
+            except httpx.HTTPStatusError as e:
+                if not is_route_rejection(e):
+                    raise
+                caps.followup_route = None
 
-        try:
-            await self._post("/ITILFollowup", json=payload_a)
+        last_error: Optional[httpx.HTTPStatusError] = None
+        for route in FOLLOWUP_ROUTES:
+            if route == known:
+                continue
+            try:
+                await self._post_followup(route, ticket_id, content)
+            except httpx.HTTPStatusError as e:
+                if not is_request_rejection(e):
+                    raise
+                # Prefere o 400/422 (motivo do item) ao 404 das rotas que não existem.
+                if last_error is None or not is_route_rejection(e):
+                    last_error = e
+                continue
+            caps.followup_route = route
             return
-        except httpx.HTTPStatusError:
-            pass
+        if last_error is not None:
+            raise last_error
 
-        # Fallback: endpoint aninhado no ticket (algumas instalações usam essa rota)
-        payload_b = {"input": {"content": content}}
+    async def add_ticket_followups(self, items: Sequence[Tuple[int, str]]) -> List[Optional[str]]:
+        """Cria vários followups num único POST (`input` como lista).
+
+        Retorna um erro por item, na mesma ordem (None = criado). O GLPI responde
+        com uma entrada por item (`{"id": ..., "message": ...}`), inclusive em
+        sucesso parcial (207). Se o POST for recusado sem criar nada levanta
+        BulkFollowupUnsupported: com 404/405 o lote fica marcado como não suportado;
+        com 400/422 (que pode ser um item ruim) nada é aprendido e `confirmed` é
+        False. Outros erros HTTP sobem como estão.
+        """
+        if not items:
+            return []
+        caps = self.capabilities
+        if caps.followup_bulk is False or caps.followup_route not in (None, "itilfollowup"):
+            raise BulkFollowupUnsupported("GLPI sem criação de followups em lote")
+        payload = {
+            "input": [
+                {"itemtype": "Ticket", "items_id": int(ticket_id), "content": (content or "").strip()}
+                for ticket_id, content in items
+            ]
+        }
         try:
-            await self._post(f"/Ticket/{ticket_id}/ITILFollowup", json=payload_b)
-        except httpx.HTTPStatusError:
-            # Último fallback: alguns GLPIs expõem /TicketFollowup
-            try:
-                await self._post(f"/Ticket/{ticket_id}/TicketFollowup", json=payload_b)
-            except httpx.HTTPStatusError:
-                return
+            data = await self._post("/ITILFollowup", json=payload)
+        except httpx.HTTPStatusError as e:
+            if is_route_rejection(e):
+                caps.followup_bulk = False
+                raise BulkFollowupUnsupported(str(e)) from e
+            if is_request_rejection(e):
+                raise BulkFollowupUnsupported(str(e), confirmed=False) from e
+            raise
+        caps.followup_bulk = True
+        if isinstance(data, dict) and len(items) == 1:
+            data = [data]
+        if not isinstance(data, list) or len(data) != len(items):
+            raise ValueError("Resposta inesperada do GLPI para criação em lote")
+
+        errors: List[Optional[str]] = []
+        for entry in data:
+            if isinstance(entry, dict) and entry.get("id"):
+                errors.append(None)
+            else:
+                message = entry.get("message") if isinstance(entry, dict) else None
+                errors.append(str(message or entry or "falha ao criar followup"))
+        return errors
 
     async def get_computer(self, computer_id: int) -> Dict[str, Any]:
         """Busca detalhes de um computador"""
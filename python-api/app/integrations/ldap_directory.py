@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class LdapUnavailable(RuntimeError):
+    """Servidor LDAP inacessível ou conta de serviço recusada."""
+
+
+_lock = threading.Lock()
+_server: Any = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+# Conexões da conta de serviço (LDAP_BIND_USER) já autenticadas, reaproveitadas nas buscas.
+_pool: "queue.LifoQueue[Any]" = queue.LifoQueue()
+_pool_open = 0
+
+# sAMAccountName (minúsculo) -> {dn, display_name, email, groups}
+_user_cache = TTLCache(
+    ttl_seconds=int(getattr(settings, "LDAP_USER_CACHE_TTL_SECONDS", 600) or 600),
+    max_entries=int(getattr(settings, "LDAP_USER_CACHE_MAX_ENTRIES", 1024) or 1024),
+)
+
+_USER_ATTRIBUTES = ["displayName", "mail", "memberOf"]
+
+
+def normalize_group_dns(member_of: Any) -> List[str]:
+    if not member_of:
+        return []
+    if isinstance(member_of, str):
+        return [member_of]
+    if isinstance(member_of, (list, tuple)):
+        return [str(x) for x in member_of]
+    return [str(member_of)]
+
+
+def bind_name(username: str) -> str:
+    bind_user = username.strip()
+    if "\\" not in bind_user and "@" not in bind_user and settings.LDAP_DOMAIN:
+        bind_user = f"{bind_user}@{settings.LDAP_DOMAIN}"
+    return bind_user
+
+
+def account_name(username: str) -> str:
+    return username.strip().split("\\")[-1].split("@")[0]
+
+
+def executor() -> ThreadPoolExecutor:
+    """Threads para bind/busca (ldap3 é bloqueante); o event loop só aguarda."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, int(getattr(settings, "LDAP_WORKERS", 4) or 4)),
+                thread_name_prefix="ldap",
+            )
+        return _executor
+
+
+def get_server() -> Any:
+    """Server (ou ServerPool, se LDAP_SERVER tiver vários endereços) criado uma vez por processo.
+
+    get_info=NONE: os atributos são pedidos pelo nome, então o schema do AD nunca
+    precisa ser baixado (antes era lido a cada login com get_info=ALL).
+    """
+    global _server
+    with _lock:
+        if _server is None:
+            from ldap3 import FIRST, NONE, Server, ServerPool
+
+            servers = [
+                Server(
+                    url,
+                    get_info=NONE,
+                    use_ssl=bool(settings.LDAP_USE_SSL),
+                    connect_timeout=int(settings.LDAP_CONNECT_TIMEOUT_SECONDS),
+                )
+                for url in (u.strip() for u in settings.LDAP_SERVER.split(","))
+                if url
+            ]
+            _server = servers[0] if len(servers) == 1 else ServerPool(servers, FIRST, active=1, exhaust=60)
+        return _server
+
+
+def _has_service_account() -> bool:
+    return bool(getattr(settings, "LDAP_BIND_USER", "") and getattr(settings, "LDAP_BIND_PASSWORD", ""))
+
+
+def _open_service_connection() -> Any:
+    from ldap3 import Connection
+    from ldap3.core.exceptions import LDAPException
+
+    conn = Connection(
+        get_server(),
+        user=settings.LDAP_BIND_USER,
+        password=settings.LDAP_BIND_PASSWORD,
+        read_only=True,
+        receive_timeout=int(settings.LDAP_CONNECT_TIMEOUT_SECONDS),
+    )
+    try:
+        if conn.bind():
+            return conn
+    except LDAPException as e:
+        raise LdapUnavailable(str(e)) from e
+    raise LdapUnavailable("bind da conta de serviço LDAP recusado")
+
+
+def _discard(conn: Any) -> None:
+    global _pool_open
+    with _lock:
+        _pool_open -= 1
+    try:
+        conn.unbind()
+    except Exception:
+        pass
+
+
+@contextmanager
+def _service_connection() -> Iterator[Any]:
+    """Empresta uma conexão do pool (até LDAP_POOL_SIZE abertas).
+
+    Conexão que falhar durante o uso é descartada em vez de voltar ao pool.
+    """
+    global _pool_open
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        with _lock:
+            can_open = _pool_open < max(1, int(getattr(settings, "LDAP_POOL_SIZE", 4) or 4))
+            if can_open:
+                _pool_open += 1
+        if can_open:
+            try:
+                conn = _open_service_connection()
+            except Exception:
+                with _lock:
+                    _pool_open -= 1
+                raise
+        else:
+            try:
+                conn = _pool.get(timeout=int(settings.LDAP_CONNECT_TIMEOUT_SECONDS))
+            except queue.Empty:
+                raise LdapUnavailable("pool de conexões LDAP esgotado")
+
+    healthy = False
+    try:
+        yield conn
+        healthy = True
+    finally:
+        if healthy:
+            _pool.put(conn)
+        else:
+            _discard(conn)
+
+
+def _search_user(conn: Any, sam: str) -> Optional[Dict[str, Any]]:
+    from ldap3.utils.conv import escape_filter_chars
+
+    base_dn = (settings.LDAP_BASE_DN or "").strip()
+    conn.search(
+        search_base=base_dn,
+        search_filter=f"(&(objectClass=user)(sAMAccountName={escape_filter_chars(sam)}))",
+        attributes=_USER_ATTRIBUTES,
+        size_limit=1,
+    )
+    if not conn.entries:
+        return None
+    entry = conn.entries[0]
+    return {
+        "dn": entry.entry_dn,
+        "display_name": str(getattr(entry, "displayName", "") or "") or None,
+        "email": str(getattr(entry, "mail", "") or "") or None,
+        # Attribute do ldap3: os DNs ficam em .values (str() juntaria tudo numa string só).
+        "groups": normalize_group_dns(getattr(getattr(entry, "memberOf", None), "values", None)),
+    }
+
+
+def lookup_user(sam: str, *, conn: Any = None) -> Optional[Dict[str, Any]]:
+    """Atributos e grupos do usuário (cache com TTL).
+
+    Com conta de serviço configurada a busca usa o pool; sem ela, usa a conexão
+    já autenticada do próprio usuário (`conn`).
+    """
+    if not (settings.LDAP_BASE_DN or "").strip():
+        return None
+    key = sam.lower()
+    cached = _user_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if _has_service_account():
+        info = None
+        # Uma nova tentativa cobre a conexão do pool que o servidor fechou por inatividade.
+        for attempt in range(2):
+            try:
+                with _service_connection() as pooled:
+                    info = _search_user(pooled, sam)
+                break
+            except LdapUnavailable:
+                raise
+            except Exception:
+                if attempt:
+                    raise
+    elif conn is not None:
+        info = _search_user(conn, sam)
+    else:
+        return None
+
+    if info is not None:
+        _user_cache.set(key, info)
+    return info
+
+
+def authenticate(username: str, password: str) -> Optional[Dict[str, Any]]:
+    """Valida a senha com bind do próprio usuário; None se usuário/senha inválidos.
+
+    NÃO grava nada no LDAP/AD. Bloqueante: chame via executor().
+    """
+    # Bind com senha vazia vira bind anônimo e "passa" no AD sem validar nada.
+    if not username.strip() or not password:
+        return None
+
+    from ldap3 import Connection
+    from ldap3.core.exceptions import LDAPException
+
+    conn = Connection(
+        get_server(),
+        user=bind_name(username),
+        password=password,
+        read_only=True,
+        receive_timeout=int(settings.LDAP_CONNECT_TIMEOUT_SECONDS),
+    )
+    try:
+        try:
+            if not conn.bind():
+                return None
+        except LDAPException as e:
+            raise LdapUnavailable(str(e)) from e
+
+        info: Optional[Dict[str, Any]] = None
+        try:
+            info = lookup_user(account_name(username), conn=conn)
+        except Exception:
+            # Senha já validada; sem atributos/grupos o login segue como antes.
+            logger.warning("Busca LDAP de %s falhou", username, exc_info=True)
+    finally:
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+
+    info = info or {}
+    return {
+        "username": username.strip(),
+        "display_name": info.get("display_name"),
+        "email": info.get("email"),
+        "groups": list(info.get("groups") or []),
+    }
+
+
+def close_pool() -> None:
+    global _executor
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            break
+        _discard(conn)
+    with _lock:
+        pool_executor, _executor = _executor, None
+    if pool_executor is not None:
+        pool_executor.shutdown(wait=False)
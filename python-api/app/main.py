@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+from typing import Optional
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -11,16 +13,23 @@ from app.controllers.devices_controller import router as devices_router
 from app.controllers.health_controller import router as health_router
 from app.controllers.glpi_tickets_controller import router as glpi_tickets_router
 from app.controllers.maintenance_controller import router as maintenance_router
+from app.controllers.outbox_controller import router as outbox_router
 from app.controllers.reports_controller import router as reports_router
 from app.controllers.sync_controller import router as sync_router
 from app.controllers.users_controller import router as users_router
 from app.core.config import settings
 from app.core.database import Base, SessionLocal, engine
+from app.core.passwords import shutdown_hash_pool
+from app.integrations.ldap_directory import close_pool as close_ldap_pool
+from app.services.dashboard_snapshot_service import ensure_snapshot
+from app.services.followup_dispatcher import start_dispatcher, stop_dispatcher
 from app.services.glpi_outbox_service import process_pending
 from app.services.user_service import ensure_default_admin
+from app.services.version_service import ensure_data_versions
 
 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 
 Base.metadata.create_all(bind=engine)
@@ -50,6 +59,7 @@ app.include_router(dashboard_router)
 app.include_router(devices_router)
 app.include_router(glpi_tickets_router)
 app.include_router(maintenance_router)
+app.include_router(outbox_router)
 app.include_router(reports_router)
 app.include_router(health_router)
 
@@ -59,17 +69,37 @@ def _startup_seed_admin() -> None:
     db = SessionLocal()
     try:
         ensure_default_admin(db)
+        ensure_data_versions(db)
+        ensure_snapshot(db)
     finally:
         db.close()
 
 
+@app.on_event("shutdown")
+def _shutdown_hash_pool() -> None:
+    shutdown_hash_pool()
+    close_ldap_pool()
+
+
+@app.on_event("startup")
+async def _startup_followup_dispatcher() -> None:
+    start_dispatcher()
+
+
+@app.on_event("shutdown")
+async def _shutdown_followup_dispatcher() -> None:
+    await stop_dispatcher()
+
+
+_outbox_task: Optional[asyncio.Task] = None
+
+
 @app.on_event("startup")
 async def _startup_outbox_worker() -> None:
+    global _outbox_task
     if not bool(getattr(settings, "GLPI_OUTBOX_WORKER_ENABLED", False)):
         return
 
-    import asyncio
-
     interval = int(getattr(settings, "GLPI_OUTBOX_PROCESS_INTERVAL_SECONDS", 60) or 60)
     batch = int(getattr(settings, "GLPI_OUTBOX_PROCESS_BATCH_SIZE", 25) or 25)
 
@@ -79,9 +109,22 @@ async def _startup_outbox_worker() -> None:
             try:
                 await process_pending(db, limit=batch)
             except Exception:
-                pass
+                logger.exception("Falha ao processar a outbox do GLPI")
             finally:
                 db.close()
             await asyncio.sleep(max(5, interval))
 
-    asyncio.create_task(_loop())
+    _outbox_task = asyncio.create_task(_loop())
+
+
+@app.on_event("shutdown")
+async def _shutdown_outbox_worker() -> None:
+    global _outbox_task
+    if _outbox_task is None:
+        return
+    _outbox_task.cancel()
+    try:
+        await _outbox_task
+    except asyncio.CancelledError:
+        pass
+    _outbox_task = None
@@ -1,4 +1,17 @@
-from app.models.entities import Computer, ComputerComponent, MaintenanceHistory, ComputerNote, GlpiFollowupOutbox, User
+from app.models.entities import (
+    Computer,
+    ComputerComponent,
+    ComputerNote,
+    DashboardSnapshot,
+    DashboardSnapshotHistory,
+    DataVersion,
+    GlpiFollowupOutbox,
+    GlpiFollowupOutboxArchive,
+    MaintenanceDailyRollup,
+    MaintenanceHistory,
+    ReportJob,
+    User,
+)
 
 __all__ = [
     "Computer",
@@ -6,5 +19,11 @@ __all__ = [
     "MaintenanceHistory",
     "ComputerNote",
     "GlpiFollowupOutbox",
+    "GlpiFollowupOutboxArchive",
     "User",
+    "DataVersion",
+    "DashboardSnapshot",
+    "DashboardSnapshotHistory",
+    "MaintenanceDailyRollup",
+    "ReportJob",
 ]
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, JSON, String, Text
+from sqlalchemy import BigInteger, Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, JSON, String, Text
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -41,7 +41,13 @@ class Computer(Base):
         cascade="all, delete-orphan",
     )
 
-    __table_args__ = (Index("idx_computer_name_entity", "name", "entity"),)
+    __table_args__ = (
+        Index("idx_computer_name_entity", "name", "entity"),
+        # Cobre o GROUP BY de /api/devices/facets sem ler a linha inteira.
+        Index("idx_computer_facets", "entity", "location", "status", "next_maintenance"),
+        # Cobre as contagens do dashboard (Em Dia/Atrasada/Pendente, preventiva feita).
+        Index("idx_computer_maint_dates", "next_maintenance", "last_maintenance"),
+    )
 
 
 class ComputerComponent(Base):
@@ -88,7 +94,18 @@ class MaintenanceHistory(Base):
 
     computer = relationship("Computer", back_populates="maintenance_history")
 
-    __table_args__ = (Index("idx_maintenance_type_date", "maintenance_type", "performed_at"),)
+    __table_args__ = (
+        Index("idx_maintenance_type_date", "maintenance_type", "performed_at"),
+        # Range por período sem filtro de tipo (tendências e produtividade por técnico).
+        Index("idx_maintenance_performed_type_tech", "performed_at", "maintenance_type", "technician"),
+        # LAG(performed_at) por computador nas corretivas (intervalo entre corretivas).
+        Index("idx_maintenance_computer_type_date", "computer_id", "maintenance_type", "performed_at"),
+        # Paginação por cursor (performed_at DESC, id DESC) filtrando por tipo; computer_id cobre o join.
+        Index("idx_maintenance_type_date_id", "maintenance_type", "performed_at", "id", "computer_id"),
+        # Mesma paginação sem filtro de tipo (ambas): em idx_maintenance_performed_type_tech
+        # o id fica depois de tipo/técnico e o MySQL ordenaria o resto do período a cada página.
+        Index("idx_maintenance_date_id", "performed_at", "id", "computer_id"),
+    )
 
 
 class ComputerNote(Base):
@@ -129,6 +146,11 @@ class User(Base):
     can_generate_report = Column(Boolean, nullable=False, default=False)
     can_manage_permissions = Column(Boolean, nullable=False, default=False)
 
+    # Incrementada a cada mudança de papel/permissões/dados do LDAP (cache de principals).
+    version = Column(BigInteger, nullable=False, default=0)
+    # Tokens com token_version menor que este valor são recusados (logout/revogação).
+    token_version = Column(Integer, nullable=False, default=0)
+
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -145,14 +167,138 @@ class GlpiFollowupOutbox(Base):
     ticket_id = Column(Integer, nullable=False, index=True)
     content = Column(Text, nullable=False)
 
-    # pending | sent
+    # pending | sent | dead
     status = Column(String(20), nullable=False, default="pending", index=True)
     attempts = Column(Integer, nullable=False, default=0)
     last_error = Column(Text, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     sent_at = Column(DateTime, nullable=True)
+    # Próxima tentativa (backoff exponencial após falha)
+    next_attempt_at = Column(DateTime, nullable=True)
+
+    # Reserva (lease) do item por um worker durante o envio.
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
 
     __table_args__ = (
         Index("idx_outbox_status_created", "status", "created_at"),
+        Index("idx_outbox_status_next", "status", "next_attempt_at"),
+        Index("idx_outbox_status_sent", "status", "sent_at"),
+    )
+
+
+class GlpiFollowupOutboxArchive(Base):
+    """Acompanhamentos já enviados, movidos da outbox pelo job de retenção."""
+
+    __tablename__ = "glpi_followup_outbox_archive"
+
+    # Mesmo id da outbox (sem autoincrement) para rastrear a origem.
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    maintenance_id = Column(Integer, nullable=True, index=True)
+    ticket_id = Column(Integer, nullable=False, index=True)
+    content = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class DataVersion(Base):
+    """Contador de versão por escopo (computers, maintenance, ...).
+
+    Incrementado na mesma transação das escritas; usado para ETag/304 sem
+    precisar recalcular os payloads.
+    """
+
+    __tablename__ = "data_versions"
+
+    scope = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class DashboardSnapshot(Base):
+    """Contadores do dashboard mantidos incrementalmente (linha única, id=1).
+
+    Os status Em Dia/Atrasada valem para `rolled_at`; o job de rollover (e a leitura)
+    move para Atrasada quem venceu entre `rolled_at` e agora.
+    """
+
+    __tablename__ = "dashboard_snapshot"
+
+    id = Column(Integer, primary_key=True)
+    total_computers = Column(Integer, nullable=False, default=0)
+    preventive_done_computers = Column(Integer, nullable=False, default=0)
+    status_ok_computers = Column(Integer, nullable=False, default=0)
+    status_late_computers = Column(Integer, nullable=False, default=0)
+    status_pending_computers = Column(Integer, nullable=False, default=0)
+    corrective_done_total = Column(Integer, nullable=False, default=0)
+    corrective_done_computers = Column(Integer, nullable=False, default=0)
+    rolled_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DashboardSnapshotHistory(Base):
+    """Uma linha por dia com os contadores do dashboard (série temporal)."""
+
+    __tablename__ = "dashboard_snapshot_history"
+
+    snapshot_date = Column(Date, primary_key=True)
+    total_computers = Column(Integer, nullable=False, default=0)
+    preventive_done_computers = Column(Integer, nullable=False, default=0)
+    status_ok_computers = Column(Integer, nullable=False, default=0)
+    status_late_computers = Column(Integer, nullable=False, default=0)
+    status_pending_computers = Column(Integer, nullable=False, default=0)
+    corrective_done_total = Column(Integer, nullable=False, default=0)
+    corrective_done_computers = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class MaintenanceDailyRollup(Base):
+    """Contagem de manutenções por dia/tipo/entidade/técnico (mantida pelas escritas).
+
+    entity/technician usam "" no lugar de NULL para caber na chave primária.
+    """
+
+    __tablename__ = "maintenance_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    maintenance_type = Column(String(20), primary_key=True)
+    entity = Column(String(255), primary_key=True, default="")
+    technician = Column(String(255), primary_key=True, default="")
+    maintenance_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ReportJob(Base):
+    """Relatório pesado gerado em background (tools/report_worker.py)."""
+
+    __tablename__ = "report_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # sha1 dos parâmetros normalizados + versões dos dados (dedup)
+    params_hash = Column(String(64), nullable=False, index=True)
+    report_type = Column(String(50), nullable=False, default="maintenance")
+    params = Column(JSON, nullable=False)
+    format = Column(String(10), nullable=False)
+
+    # pending | running | done | failed | expired (buscas por status usam idx_report_jobs_status_created)
+    status = Column(String(20), nullable=False, default="pending")
+    rows_total = Column(Integer, nullable=True)
+    rows_done = Column(Integer, nullable=False, default=0)
+    file_path = Column(String(500), nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    error = Column(Text, nullable=True)
+    requested_by = Column(String(255), nullable=True)
+    worker = Column(String(100), nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_report_jobs_status_created", "status", "created_at"),
     )
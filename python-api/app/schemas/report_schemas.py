@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
 
 from pydantic import BaseModel, Field
@@ -18,3 +18,87 @@ class MaintenanceReportRow(BaseModel):
 class MaintenanceReportResponse(BaseModel):
     items: List[MaintenanceReportRow]
     total: int
+
+
+class MaintenanceReportPage(BaseModel):
+    items: List[MaintenanceReportRow]
+    limit: int
+    # Passe em `cursor` para a próxima página; None = acabou.
+    next_cursor: Optional[str] = None
+
+
+class TechnicianMonth(BaseModel):
+    month: date
+    technician: Optional[str] = None
+    preventive: int
+    corrective: int
+    total: int
+
+
+class CorrectiveInterval(BaseModel):
+    computer_id: int
+    computer_name: str
+    patrimonio: Optional[str] = None
+    entity: Optional[str] = None
+    corrective_count: int
+    avg_days_between: Optional[float] = None
+    min_days_between: Optional[float] = None
+    last_corrective_at: Optional[datetime] = None
+
+
+class EntityCompliance(BaseModel):
+    entity: Optional[str] = None
+    total_computers: int
+    ok_computers: int
+    late_computers: int
+    pending_computers: int
+    preventive_in_period: int
+    # ok / total (status atual) e preventive_in_period / total
+    compliance_rate: float
+    preventive_coverage: float
+
+
+class MaintenanceAggregates(BaseModel):
+    from_date: date
+    to_date: date
+    technician_monthly: List[TechnicianMonth]
+    corrective_intervals: List[CorrectiveInterval]
+    entity_compliance: List[EntityCompliance]
+    # "sql" (window function no MySQL 8) ou "python" (fallback)
+    intervals_engine: str
+
+
+class ReportCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    invalidations: int
+
+
+class ReportJobCreate(BaseModel):
+    from_date: Optional[date] = Field(None, alias="from")
+    to_date: Optional[date] = Field(None, alias="to")
+    maintenance_type: Optional[str] = None
+    format: str = Field("xlsx", pattern="^(json|ndjson|csv|xlsx)$")
+
+    model_config = {"populate_by_name": True}
+
+
+class ReportJobOut(BaseModel):
+    id: int
+    status: str
+    format: str
+    params: dict
+    progress: float
+    rows_total: Optional[int] = None
+    rows_done: int = 0
+    file_size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    download_url: Optional[str] = None
@@ -1,9 +1,16 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime, timezone
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+
+def _naive_utc(v: Optional[datetime]) -> Optional[datetime]:
+    # O frontend envia ISO com "Z" (toISOString); o banco e os contadores usam UTC sem fuso.
+    if v is not None and v.tzinfo is not None:
+        return v.astimezone(timezone.utc).replace(tzinfo=None)
+    return v
 
 
 class ComputerBase(BaseModel):
@@ -74,6 +81,66 @@ class MaintenanceCreate(BaseModel):
             raise ValueError("Descrição é obrigatória")
         return v
 
+    @field_validator("performed_at")
+    @classmethod
+    def _performed_at_utc(cls, v: Optional[datetime]) -> Optional[datetime]:
+        return _naive_utc(v)
+
+
+class BulkDeviceFilter(BaseModel):
+    # Mesmos filtros da listagem de dispositivos + entidade/localização exatas.
+    tab: str = Field("all", pattern="^(all|preventiva|corretiva)$")
+    q: Optional[str] = None
+    entity: Optional[str] = None
+    location: Optional[str] = None
+
+
+class MaintenanceBulkCreate(BaseModel):
+    # Informe `computer_ids` ou `filter` (não os dois).
+    computer_ids: Optional[List[int]] = None
+    filter: Optional[BulkDeviceFilter] = None
+    maintenance_type: str = Field(..., pattern="^(Preventiva|Corretiva)$")
+    glpi_ticket_id: int = Field(..., ge=1)
+    description: str = Field(..., min_length=1)
+    performed_at: datetime
+    technician: Optional[str] = None
+    next_due_days: Optional[int] = None
+
+    @field_validator("description")
+    @classmethod
+    def _description_required(cls, v: str) -> str:
+        v = (v or "").strip()
+        if not v:
+            raise ValueError("Descrição é obrigatória")
+        return v
+
+    @field_validator("performed_at")
+    @classmethod
+    def _performed_at_utc(cls, v: Optional[datetime]) -> Optional[datetime]:
+        return _naive_utc(v)
+
+    @model_validator(mode="after")
+    def _target_required(self) -> "MaintenanceBulkCreate":
+        if (self.computer_ids is None) == (self.filter is None):
+            raise ValueError("Informe 'computer_ids' ou 'filter'")
+        if self.computer_ids is not None and not self.computer_ids:
+            raise ValueError("'computer_ids' vazio")
+        return self
+
+
+class MaintenanceBulkItem(BaseModel):
+    computer_id: int
+    # created | not_found
+    status: str
+    maintenance_id: Optional[int] = None
+
+
+class MaintenanceBulkResult(BaseModel):
+    created: int
+    not_found: int
+    items: List[MaintenanceBulkItem]
+    followup_outbox_id: Optional[int] = None
+
 
 class MaintenanceUpdate(BaseModel):
     maintenance_type: Optional[str] = Field(None, pattern="^(Preventiva|Corretiva)$")
@@ -92,6 +159,11 @@ class MaintenanceUpdate(BaseModel):
             raise ValueError("Descrição é obrigatória")
         return v
 
+    @field_validator("performed_at")
+    @classmethod
+    def _performed_at_utc(cls, v: Optional[datetime]) -> Optional[datetime]:
+        return _naive_utc(v)
+
 
 class MaintenanceOut(BaseModel):
     id: int
@@ -146,6 +218,19 @@ class DevicesPage(BaseModel):
     total: int
 
 
+class FacetCount(BaseModel):
+    value: Optional[str]
+    count: int
+
+
+class DeviceFacets(BaseModel):
+    total: int
+    entity: List[FacetCount]
+    location: List[FacetCount]
+    status: List[FacetCount]
+    maintenance_status: List[FacetCount]
+
+
 class DeviceDetail(BaseModel):
     id: int
     glpi_id: int
@@ -162,6 +247,13 @@ class DeviceDetail(BaseModel):
         from_attributes = True
 
 
+class DeviceBundle(DeviceDetail):
+    # Listas ausentes (None) quando não pedidas em `include`.
+    components: Optional[List[ComponentOut]] = None
+    maintenance: Optional[List[MaintenanceOut]] = None
+    notes: Optional[List[NoteOut]] = None
+
+
 class SyncResult(BaseModel):
     computers_synced: int
     components_synced: int
@@ -199,6 +291,45 @@ class LoginResponse(BaseModel):
     user: UserOut
 
 
+class OutboxItemOut(BaseModel):
+    id: int
+    maintenance_id: Optional[int] = None
+    ticket_id: int
+    content: str
+    status: str
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: datetime
+    next_attempt_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class OutboxDeadPage(BaseModel):
+    items: List[OutboxItemOut]
+    total: int
+
+
+class OutboxRequeueRequest(BaseModel):
+    # Sem `ids` => todos os itens dead
+    ids: Optional[List[int]] = None
+
+
+class OutboxRequeueResult(BaseModel):
+    requeued: int
+
+
+class OutboxStats(BaseModel):
+    pending: int
+    due: int
+    dead: int
+    oldest_pending_age_seconds: Optional[float] = None
+    created_last_hour: int
+    sent_last_hour: int
+    avg_delivery_seconds_last_hour: Optional[float] = None
+
+
 class UserAdminRow(BaseModel):
     username: str
     display_name: Optional[str] = None
@@ -226,3 +357,19 @@ class DashboardMetrics(BaseModel):
     status_late_computers: int
     status_pending_computers: int
     corrective_open_computers: int
+
+
+class DashboardHistoryPoint(DashboardMetrics):
+    snapshot_date: date
+
+
+class TrendSeries(BaseModel):
+    key: Optional[str]
+    counts: List[int]
+
+
+class MaintenanceTrends(BaseModel):
+    granularity: str
+    group_by: str
+    buckets: List[date]
+    series: List[TrendSeries]
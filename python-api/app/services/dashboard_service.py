@@ -1,70 +1,142 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import distinct, func, or_
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.models import Computer, MaintenanceHistory
-from app.schemas.schemas import DashboardMetrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models import MaintenanceDailyRollup
+from app.schemas.schemas import DashboardMetrics, MaintenanceTrends, TrendSeries
+from app.services.dashboard_snapshot_service import get_current_counters, to_metrics
+
+
+_METRICS_KEY = "metrics"
+
+_metrics_cache = TTLCache(
+    ttl_seconds=int(getattr(settings, "DASHBOARD_CACHE_TTL_SECONDS", 15) or 15),
+    max_entries=1,
+)
+
+
+_trends_cache = TTLCache(
+    ttl_seconds=int(getattr(settings, "DASHBOARD_TRENDS_CACHE_TTL_SECONDS", 300) or 300),
+    max_entries=128,
+)
+
+TREND_GRANULARITIES = ("month", "week")
+TREND_GROUP_BY = ("type", "entity", "technician")
+
+
+def invalidate_dashboard_cache() -> None:
+    """Chamado após escritas que mudam as métricas (manutenções e sync)."""
+    _metrics_cache.clear()
 
 
 def get_dashboard_metrics(db: Session) -> DashboardMetrics:
-    now = datetime.utcnow()
-
-    total_computers = int(db.query(func.count(Computer.id)).scalar() or 0)
-    preventive_done_computers = int(
-        db.query(func.count(Computer.id))
-        .filter(Computer.last_maintenance.isnot(None))
-        .scalar()
-        or 0
-    )
+    # Lê os contadores incrementais (dashboard_snapshot) em vez de recontar o parque.
+    cached = _metrics_cache.get(_METRICS_KEY)
+    if cached is not None:
+        return cached
+    metrics = to_metrics(get_current_counters(db))
+    _metrics_cache.set(_METRICS_KEY, metrics)
+    return metrics
 
-    status_pending = int(
-        db.query(func.count(Computer.id)).filter(Computer.next_maintenance.is_(None)).scalar() or 0
-    )
-    status_late = int(
-        db.query(func.count(Computer.id))
-        .filter(Computer.next_maintenance.isnot(None), Computer.next_maintenance < now)
-        .scalar()
-        or 0
-    )
-    status_ok = int(
-        db.query(func.count(Computer.id))
-        .filter(Computer.next_maintenance.isnot(None), Computer.next_maintenance >= now)
-        .scalar()
-        or 0
-    )
 
-    corrective_open = int(
-        db.query(func.count(Computer.id))
-        .filter(or_(Computer.next_maintenance.is_(None), Computer.next_maintenance < now))
-        .scalar()
-        or 0
-    )
+def _bucket_start(d: date, granularity: str) -> date:
+    if granularity == "week":
+        return d - timedelta(days=d.weekday())
+    return d.replace(day=1)
 
-    corrective_done_total = int(
-        db.query(func.count(MaintenanceHistory.id))
-        .filter(MaintenanceHistory.maintenance_type == "Corretiva")
-        .scalar()
-        or 0
-    )
 
-    corrective_done_computers = int(
-        db.query(func.count(distinct(MaintenanceHistory.computer_id)))
-        .filter(MaintenanceHistory.maintenance_type == "Corretiva")
-        .scalar()
-        or 0
-    )
+def _next_bucket(d: date, granularity: str) -> date:
+    if granularity == "week":
+        return d + timedelta(days=7)
+    return date(d.year + (d.month // 12), d.month % 12 + 1, 1)
+
+
+def _bucket_range(from_date: date, to_date: date, granularity: str) -> List[date]:
+    buckets = []
+    cur = _bucket_start(from_date, granularity)
+    while cur <= to_date:
+        buckets.append(cur)
+        cur = _next_bucket(cur, granularity)
+    return buckets
+
+
+def default_trends_range(granularity: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """Últimos 12 meses (ou 12 semanas) até hoje."""
+    today = today or datetime.utcnow().date()
+    start = _bucket_start(today, granularity)
+    for _ in range(11):
+        start = _bucket_start(start - timedelta(days=1), granularity)
+    return start, today
+
 
-    return DashboardMetrics(
-        total_computers=total_computers,
-        preventive_done_computers=preventive_done_computers,
-        preventive_needed_computers=total_computers,
-        corrective_done_total=corrective_done_total,
-        corrective_done_computers=corrective_done_computers,
-        status_ok_computers=status_ok,
-        status_late_computers=status_late,
-        status_pending_computers=status_pending,
-        corrective_open_computers=corrective_open,
+def get_maintenance_trends(
+    db: Session,
+    *,
+    granularity: str,
+    group_by: str,
+    from_date: date,
+    to_date: date,
+    cache_key: Optional[tuple] = None,
+) -> MaintenanceTrends:
+    """Manutenções por período (mês/semana) e por tipo, entidade ou técnico.
+
+    Lê `maintenance_daily_rollup` (uma linha por dia/tipo/entidade/técnico) em vez
+    de maintenance_history + computers; o filtro é um range na chave primária (day).
+    """
+    if cache_key is not None:
+        cached = _trends_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    day = MaintenanceDailyRollup.day
+    if granularity == "week":
+        # Segunda-feira da semana
+        bucket = func.date_format(func.subdate(day, func.weekday(day)), "%Y-%m-%d")
+    else:
+        bucket = func.date_format(day, "%Y-%m-01")
+    bucket = bucket.label("bucket")
+
+    if group_by == "entity":
+        group_col = MaintenanceDailyRollup.entity
+    elif group_by == "technician":
+        group_col = MaintenanceDailyRollup.technician
+    else:
+        group_col = MaintenanceDailyRollup.maintenance_type
+
+    rows = (
+        db.query(bucket, group_col, func.sum(MaintenanceDailyRollup.maintenance_count))
+        .filter(day >= _bucket_start(from_date, granularity), day <= to_date)
+        .group_by(bucket, group_col)
+        .all()
     )
+
+    # Preenche buckets vazios: matriz densa (séries x buckets) iniciada com zero e
+    # preenchida direto pelo índice do bucket, sem varrer buckets por linha.
+    buckets = _bucket_range(from_date, to_date, granularity)
+    position = {b: i for i, b in enumerate(buckets)}
+    matrix: Dict[Optional[str], List[int]] = {}
+    for bucket_str, key, count in rows:
+        try:
+            idx = position[date.fromisoformat(str(bucket_str)[:10])]
+        except (KeyError, ValueError):
+            continue
+        key = key or None
+        counts = matrix.get(key)
+        if counts is None:
+            counts = matrix[key] = [0] * len(buckets)
+        counts[idx] += int(count or 0)
+
+    series = [
+        TrendSeries(key=key, counts=counts)
+        for key, counts in sorted(matrix.items(), key=lambda kv: (-sum(kv[1]), kv[0] is None, kv[0] or ""))
+    ]
+    result = MaintenanceTrends(granularity=granularity, group_by=group_by, buckets=buckets, series=series)
+    if cache_key is not None:
+        _trends_cache.set(cache_key, result)
+    return result
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, distinct, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Computer, DashboardSnapshot, DashboardSnapshotHistory, MaintenanceHistory
+from app.schemas.schemas import DashboardHistoryPoint, DashboardMetrics
+
+
+SNAPSHOT_ID = 1
+
+COUNTER_FIELDS = (
+    "total_computers",
+    "preventive_done_computers",
+    "status_ok_computers",
+    "status_late_computers",
+    "status_pending_computers",
+    "corrective_done_total",
+    "corrective_done_computers",
+)
+
+# (last_maintenance, next_maintenance) de um computador; None = computador inexistente.
+ComputerDates = Optional[Tuple[Optional[datetime], Optional[datetime]]]
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def compute_counters(db: Session, *, ref: datetime) -> Dict[str, int]:
+    """Recalcula todos os contadores a partir das tabelas (2 consultas agregadas)."""
+    # Uma passada em computers (coberta por idx_computer_maint_dates).
+    total, preventive_done, pending, late, ok = db.query(
+        func.count(Computer.id),
+        _count_if(Computer.last_maintenance.isnot(None)),
+        _count_if(Computer.next_maintenance.is_(None)),
+        _count_if(Computer.next_maintenance < ref),
+        _count_if(Computer.next_maintenance >= ref),
+    ).one()
+
+    # Uma passada em maintenance_history (somente corretivas).
+    corrective_total, corrective_computers = (
+        db.query(func.count(MaintenanceHistory.id), func.count(distinct(MaintenanceHistory.computer_id)))
+        .filter(MaintenanceHistory.maintenance_type == "Corretiva")
+        .one()
+    )
+
+    return {
+        "total_computers": int(total or 0),
+        "preventive_done_computers": int(preventive_done or 0),
+        "status_ok_computers": int(ok or 0),
+        "status_late_computers": int(late or 0),
+        "status_pending_computers": int(pending or 0),
+        "corrective_done_total": int(corrective_total or 0),
+        "corrective_done_computers": int(corrective_computers or 0),
+    }
+
+
+def to_metrics(counters: Dict[str, int]) -> DashboardMetrics:
+    return DashboardMetrics(
+        **counters,
+        preventive_needed_computers=counters["total_computers"],
+        # next_maintenance nula ou vencida
+        corrective_open_computers=counters["status_pending_computers"] + counters["status_late_computers"],
+    )
+
+
+def _counters_of(row) -> Dict[str, int]:
+    return {f: int(getattr(row, f) or 0) for f in COUNTER_FIELDS}
+
+
+def _count_expired(db: Session, since: datetime, until: datetime) -> int:
+    # Range scan em idx_computer_maint_dates.
+    if until <= since:
+        return 0
+    return int(
+        db.query(func.count(Computer.id))
+        .filter(Computer.next_maintenance >= since, Computer.next_maintenance < until)
+        .scalar()
+        or 0
+    )
+
+
+def rebuild_snapshot(db: Session) -> DashboardSnapshot:
+    """Recria a linha de contadores a partir do zero (startup, tools/, divergência)."""
+    now = datetime.utcnow()
+    counters = compute_counters(db, ref=now)
+
+    row = db.query(DashboardSnapshot).filter(DashboardSnapshot.id == SNAPSHOT_ID).with_for_update().first()
+    if not row:
+        row = DashboardSnapshot(id=SNAPSHOT_ID)
+        db.add(row)
+    for field, value in counters.items():
+        setattr(row, field, value)
+    row.rolled_at = now
+    row.updated_at = now
+    try:
+        db.commit()
+    except IntegrityError:
+        # Outra requisição/worker inseriu a linha ao mesmo tempo: vale a dela.
+        db.rollback()
+        row = db.query(DashboardSnapshot).filter(DashboardSnapshot.id == SNAPSHOT_ID).first()
+        if row is None:
+            raise
+        return row
+    db.refresh(row)
+    return row
+
+
+def ensure_snapshot(db: Session) -> None:
+    """Cria a linha de contadores se ainda não existir (roda no startup)."""
+    if db.query(DashboardSnapshot.id).filter(DashboardSnapshot.id == SNAPSHOT_ID).first() is None:
+        rebuild_snapshot(db)
+
+
+def get_current_counters(db: Session) -> Dict[str, int]:
+    """Contadores válidos para agora: linha incremental + quem venceu desde `rolled_at`."""
+    row = db.query(DashboardSnapshot).filter(DashboardSnapshot.id == SNAPSHOT_ID).first()
+    if not row:
+        row = rebuild_snapshot(db)
+
+    counters = _counters_of(row)
+    expired = _count_expired(db, row.rolled_at, datetime.utcnow())
+    counters["status_ok_computers"] -= expired
+    counters["status_late_computers"] += expired
+    return counters
+
+
+def _locked_snapshot(db: Session) -> Optional[DashboardSnapshot]:
+    # FOR UPDATE: serializa com o rollover para que `rolled_at` não mude no meio da transação.
+    return db.query(DashboardSnapshot).filter(DashboardSnapshot.id == SNAPSHOT_ID).with_for_update().first()
+
+
+def _state(dates: ComputerDates, ref: datetime) -> Dict[str, int]:
+    if dates is None:
+        return {}
+    last, nxt = dates
+    state = {"total_computers": 1}
+    if last is not None:
+        state["preventive_done_computers"] = 1
+    if nxt is None:
+        state["status_pending_computers"] = 1
+    elif nxt < ref:
+        state["status_late_computers"] = 1
+    else:
+        state["status_ok_computers"] = 1
+    return state
+
+
+def apply_snapshot_delta(
+    db: Session,
+    *,
+    before: ComputerDates = None,
+    after: ComputerDates = None,
+    corrective_total: int = 0,
+    corrective_computers: int = 0,
+    new_computers: int = 0,
+    changes: Iterable[Tuple[ComputerDates, ComputerDates]] = (),
+) -> None:
+    """Ajusta os contadores na transação corrente (sem commit).
+
+    `before`/`after` são as datas de um computador antes/depois da escrita; o status
+    é avaliado em `rolled_at`, a mesma referência dos contadores armazenados.
+    `changes` recebe vários pares (before, after) de uma vez (registro em lote).
+    `new_computers` soma computadores novos (sem manutenção) de uma vez, para o sync.
+    Sem linha de snapshot não faz nada: o próximo `rebuild_snapshot` recalcula tudo.
+    """
+    row = _locked_snapshot(db)
+    if not row:
+        return
+
+    delta: Dict[str, int] = {f: 0 for f in COUNTER_FIELDS}
+    for b, a in [(before, after), *changes]:
+        if b == a:
+            continue
+        for field, value in _state(b, row.rolled_at).items():
+            delta[field] -= value
+        for field, value in _state(a, row.rolled_at).items():
+            delta[field] += value
+    if new_computers:
+        delta["total_computers"] += new_computers
+        delta["status_pending_computers"] += new_computers
+    delta["corrective_done_total"] += corrective_total
+    delta["corrective_done_computers"] += corrective_computers
+
+    changed = {f: d for f, d in delta.items() if d}
+    if not changed:
+        return
+    for field, d in changed.items():
+        setattr(row, field, getattr(DashboardSnapshot, field) + d)
+    row.updated_at = datetime.utcnow()
+
+
+def has_corrective(db: Session, computer_id: int) -> bool:
+    # Leitura com lock: com o computador já travado por quem chama, enxerga o último
+    # commit mesmo que a transação tenha aberto o snapshot (REPEATABLE READ) antes.
+    return (
+        db.query(MaintenanceHistory.id)
+        .filter(
+            MaintenanceHistory.computer_id == computer_id,
+            MaintenanceHistory.maintenance_type == "Corretiva",
+        )
+        .with_for_update()
+        .first()
+        is not None
+    )
+
+
+def roll_snapshot(db: Session, *, today: Optional[date] = None) -> Dict[str, object]:
+    """Job agendado: move Em Dia -> Atrasada e grava/atualiza a linha do dia.
+
+    Só lê os computadores cujo next_maintenance caiu em [rolled_at, agora).
+    """
+    now = datetime.utcnow()
+    today = today or now.date()
+
+    row = _locked_snapshot(db)
+    if not row:
+        db.rollback()
+        row = rebuild_snapshot(db)
+        row = _locked_snapshot(db)
+        expired = 0
+    else:
+        expired = _count_expired(db, row.rolled_at, now)
+        if expired:
+            row.status_ok_computers = int(row.status_ok_computers or 0) - expired
+            row.status_late_computers = int(row.status_late_computers or 0) + expired
+        row.rolled_at = now
+        row.updated_at = now
+
+    counters = _counters_of(row)
+    point = db.query(DashboardSnapshotHistory).filter(DashboardSnapshotHistory.snapshot_date == today).first()
+    if not point:
+        point = DashboardSnapshotHistory(snapshot_date=today, created_at=now)
+        db.add(point)
+    for field, value in counters.items():
+        setattr(point, field, value)
+    point.updated_at = now
+
+    db.commit()
+    return {"expired": expired, "snapshot_date": today.isoformat(), **counters}
+
+
+def verify_snapshot(db: Session) -> Dict[str, Dict[str, int]]:
+    """Compara a linha incremental com o recálculo; retorna só os campos divergentes."""
+    current = get_current_counters(db)
+    fresh = compute_counters(db, ref=datetime.utcnow())
+    return {
+        f: {"snapshot": current[f], "raw": fresh[f]}
+        for f in COUNTER_FIELDS
+        if current[f] != fresh[f]
+    }
+
+
+def get_history(db: Session, *, from_date: Optional[date], to_date: Optional[date]) -> List[DashboardHistoryPoint]:
+    query = db.query(DashboardSnapshotHistory)
+    if from_date is not None:
+        query = query.filter(DashboardSnapshotHistory.snapshot_date >= from_date)
+    if to_date is not None:
+        query = query.filter(DashboardSnapshotHistory.snapshot_date <= to_date)
+    rows = query.order_by(DashboardSnapshotHistory.snapshot_date.asc()).all()
+    return [
+        DashboardHistoryPoint(snapshot_date=r.snapshot_date, **to_metrics(_counters_of(r)).model_dump())
+        for r in rows
+    ]
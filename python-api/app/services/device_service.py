@@ -1,13 +1,33 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 
-from sqlalchemy import desc, exists, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import case, desc, exists, func, or_
+from sqlalchemy.orm import Session, selectinload
 
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.models import Computer, ComputerComponent, MaintenanceHistory
-from app.schemas.schemas import DeviceDetail, DeviceRow, DevicesPage
+from app.schemas.schemas import (
+    ComponentOut,
+    DeviceBundle,
+    DeviceDetail,
+    DeviceFacets,
+    DeviceRow,
+    DevicesPage,
+    FacetCount,
+    MaintenanceOut,
+    NoteOut,
+)
+
+
+BUNDLE_INCLUDES = ("components", "maintenance", "notes")
+
+_facets_cache = TTLCache(
+    ttl_seconds=int(getattr(settings, "DEVICE_FACETS_CACHE_TTL_SECONDS", 60) or 60),
+    max_entries=512,
+)
 
 
 def calculate_maintenance_status(
@@ -24,15 +44,7 @@ def calculate_maintenance_status(
     return "Em Dia"
 
 
-def list_devices(
-    db: Session,
-    tab: str,
-    page: int,
-    page_size: int,
-    q: Optional[str],
-) -> DevicesPage:
-    query = db.query(Computer)
-
+def apply_device_filters(query, *, tab: str, q: Optional[str]):
     if q:
         query = query.filter(
             or_(
@@ -51,6 +63,17 @@ def list_devices(
             .where(MaintenanceHistory.computer_id == Computer.id)
             .where(MaintenanceHistory.maintenance_type == "Corretiva")
         )
+    return query
+
+
+def list_devices(
+    db: Session,
+    tab: str,
+    page: int,
+    page_size: int,
+    q: Optional[str],
+) -> DevicesPage:
+    query = apply_device_filters(db.query(Computer), tab=tab, q=q)
 
     total = query.count()
     offset = (page - 1) * page_size
@@ -92,3 +115,118 @@ def get_device_components(db: Session, device_id: int):
         .filter(ComputerComponent.computer_id == device_id)
         .all()
     )
+
+
+def parse_bundle_include(raw: Optional[str]) -> Optional[set]:
+    """Converte `include=components,notes` em set; retorna None se houver item inválido."""
+    if raw is None:
+        return set(BUNDLE_INCLUDES)
+    parts = {p.strip().lower() for p in raw.split(",") if p.strip()}
+    if not parts.issubset(BUNDLE_INCLUDES):
+        return None
+    return parts
+
+
+def get_device_bundle(db: Session, device_id: int, include: Iterable[str]) -> Optional[DeviceBundle]:
+    """Detalhe do dispositivo + sub-recursos em uma única ida ao banco por tabela.
+
+    Usa `selectinload`: 1 SELECT em computers e 1 SELECT por relação pedida,
+    no lugar de re-consultar `Computer` em cada endpoint separado.
+    """
+    include = set(include)
+
+    query = db.query(Computer).filter(Computer.id == device_id)
+    if "components" in include:
+        query = query.options(selectinload(Computer.components))
+    if "maintenance" in include:
+        query = query.options(selectinload(Computer.maintenance_history))
+    if "notes" in include:
+        query = query.options(selectinload(Computer.notes))
+
+    computer = query.first()
+    if not computer:
+        return None
+
+    data = DeviceDetail.model_validate(computer).model_dump()
+    if "components" in include:
+        data["components"] = [ComponentOut.model_validate(c) for c in computer.components]
+    if "maintenance" in include:
+        # Mesma ordem de /maintenance: mais recente primeiro.
+        history = sorted(
+            computer.maintenance_history,
+            key=lambda m: m.performed_at or datetime.min,
+            reverse=True,
+        )
+        data["maintenance"] = [MaintenanceOut.model_validate(m) for m in history]
+    if "notes" in include:
+        notes = sorted(computer.notes, key=lambda n: n.created_at or datetime.min, reverse=True)
+        data["notes"] = [NoteOut.model_validate(n) for n in notes]
+    return DeviceBundle(**data)
+
+
+def maintenance_status_expr(now: datetime):
+    """Mesma regra de `calculate_maintenance_status`, em SQL."""
+    return case(
+        (Computer.next_maintenance.is_(None), "Pendente"),
+        (Computer.next_maintenance < now, "Atrasada"),
+        else_="Em Dia",
+    )
+
+
+def _facet_list(counts: Dict[Optional[str], int]) -> List[FacetCount]:
+    # Mais frequentes primeiro; empate por nome para resposta estável.
+    ordered = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0] is None, kv[0] or ""))
+    return [FacetCount(value=value, count=count) for value, count in ordered]
+
+
+def get_device_facets(
+    db: Session,
+    *,
+    tab: str,
+    q: Optional[str],
+    cache_key: Optional[tuple] = None,
+) -> DeviceFacets:
+    """Contagens por entidade, localização, status GLPI e status de manutenção.
+
+    Um único GROUP BY sobre as quatro dimensões (coberto por `idx_computer_facets`);
+    a soma por faceta é feita em memória sobre as combinações retornadas, que são
+    poucas mesmo com muitos computadores.
+    """
+    if cache_key is not None:
+        cached = _facets_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    status_expr = maintenance_status_expr(datetime.utcnow()).label("maintenance_status")
+    query = db.query(
+        Computer.entity,
+        Computer.location,
+        Computer.status,
+        status_expr,
+        func.count(Computer.id),
+    )
+    query = apply_device_filters(query, tab=tab, q=q)
+    rows = query.group_by(Computer.entity, Computer.location, Computer.status, status_expr).all()
+
+    facets: Dict[str, Dict[Optional[str], int]] = {
+        "entity": {},
+        "location": {},
+        "status": {},
+        "maintenance_status": {},
+    }
+    total = 0
+    for entity, location, status, maint_status, count in rows:
+        count = int(count or 0)
+        total += count
+        for name, value in (
+            ("entity", entity or None),
+            ("location", location or None),
+            ("status", status or None),
+            ("maintenance_status", maint_status),
+        ):
+            facets[name][value] = facets[name].get(value, 0) + count
+
+    result = DeviceFacets(total=total, **{name: _facet_list(c) for name, c in facets.items()})
+    if cache_key is not None:
+        _facets_cache.set(cache_key, result)
+    return result
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from app.core.database import SessionLocal
+from app.models import Computer, ComputerComponent
+from app.services.device_service import apply_device_filters, calculate_maintenance_status
+
+
+EXPORT_FORMATS = ("csv", "xlsx", "ndjson")
+
+# Tipos gravados pelo sync (`Item_DeviceX` -> `X`); cada um vira uma coluna.
+COMPONENT_TYPES = (
+    "Processor",
+    "Memory",
+    "HardDrive",
+    "NetworkCard",
+    "GraphicCard",
+    "Motherboard",
+    "PowerSupply",
+)
+
+BASE_COLUMNS = (
+    "id",
+    "glpi_id",
+    "name",
+    "entity",
+    "patrimonio",
+    "serial",
+    "location",
+    "status",
+    "maintenance_status",
+    "last_maintenance",
+    "next_maintenance",
+)
+
+COLUMNS = BASE_COLUMNS + COMPONENT_TYPES
+
+_STREAM_BATCH = 1000
+_CHUNK_BYTES = 64 * 1024
+
+
+def _fmt_date(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime("%Y-%m-%d") if value else None
+
+
+def _component_label(name: Optional[str], capacity: Optional[str]) -> str:
+    name = (name or "").strip()
+    capacity = (capacity or "").strip()
+    if name and capacity:
+        return f"{name} ({capacity})"
+    return name or capacity
+
+
+def iter_device_rows(*, tab: str = "all", q: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Uma linha por computador, com componentes achatados em colunas.
+
+    Lê computers LEFT JOIN computer_components em ordem de id com cursor no servidor
+    (`stream_results` + `yield_per`), agrupando as linhas consecutivas do mesmo
+    computador. Memória constante independente do tamanho do parque.
+
+    Abre a própria sessão: o gerador roda depois que o endpoint retorna, quando a
+    sessão de `get_db` já foi fechada.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(
+            Computer.id,
+            Computer.glpi_id,
+            Computer.name,
+            Computer.entity,
+            Computer.patrimonio,
+            Computer.serial,
+            Computer.location,
+            Computer.status,
+            Computer.last_maintenance,
+            Computer.next_maintenance,
+            ComputerComponent.component_type,
+            ComputerComponent.name,
+            ComputerComponent.capacity,
+        ).outerjoin(ComputerComponent, ComputerComponent.computer_id == Computer.id)
+        query = apply_device_filters(query, tab=tab, q=q)
+        query = (
+            query.order_by(Computer.id.asc(), ComputerComponent.id.asc())
+            .execution_options(stream_results=True)
+            .yield_per(_STREAM_BATCH)
+        )
+
+        current: Optional[Dict[str, Any]] = None
+        parts: Dict[str, List[str]] = {}
+        for r in query:
+            if current is None or current["id"] != r[0]:
+                if current is not None:
+                    current.update({t: "; ".join(parts.get(t) or []) for t in COMPONENT_TYPES})
+                    yield current
+                current = {
+                    "id": r[0],
+                    "glpi_id": r[1],
+                    "name": r[2],
+                    "entity": r[3],
+                    "patrimonio": r[4],
+                    "serial": r[5],
+                    "location": r[6],
+                    "status": r[7],
+                    "maintenance_status": calculate_maintenance_status(r[8], r[9]),
+                    "last_maintenance": _fmt_date(r[8]),
+                    "next_maintenance": _fmt_date(r[9]),
+                }
+                parts = {}
+            comp_type = r[10]
+            if comp_type:
+                label = _component_label(r[11], r[12])
+                if label:
+                    parts.setdefault(comp_type, []).append(label)
+
+        if current is not None:
+            current.update({t: "; ".join(parts.get(t) or []) for t in COMPONENT_TYPES})
+            yield current
+    finally:
+        db.close()
+
+
+def stream_csv(rows: Iterator[Dict[str, Any]], columns: Sequence[str] = COLUMNS) -> Iterator[bytes]:
+    # BOM + ';' para o Excel (pt-BR) abrir com acentos e colunas corretas.
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=";")
+    buf.write("\ufeff")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(["" if row.get(c) is None else row.get(c) for c in columns])
+        if buf.tell() >= _CHUNK_BYTES:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate(0)
+    yield buf.getvalue().encode("utf-8")
+
+
+def stream_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    chunk: List[str] = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+        chunk.append(line)
+        size += len(line)
+        if size >= _CHUNK_BYTES:
+            yield "".join(chunk).encode("utf-8")
+            chunk = []
+            size = 0
+    if chunk:
+        yield "".join(chunk).encode("utf-8")
+
+
+def stream_xlsx(
+    rows: Iterator[Dict[str, Any]],
+    columns: Sequence[str] = COLUMNS,
+    sheet_name: str = "Dispositivos",
+) -> Iterator[bytes]:
+    """XLSX em modo `constant_memory` num arquivo temporário, depois enviado em blocos.
+
+    O formato é um ZIP e só fica válido ao final, então o download começa quando a
+    planilha termina de ser gerada; a memória continua constante.
+    """
+    import xlsxwriter
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+        sheet = workbook.add_worksheet(sheet_name)
+        bold = workbook.add_format({"bold": True})
+        sheet.write_row(0, 0, columns, bold)
+        for i, row in enumerate(rows, start=1):
+            sheet.write_row(i, 0, [row.get(c) for c in columns])
+        workbook.close()
+
+        with open(path, "rb") as fh:
+            while True:
+                data = fh.read(_CHUNK_BYTES)
+                if not data:
+                    break
+                yield data
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def stream_device_export(fmt: str, *, tab: str = "all", q: Optional[str] = None) -> Iterator[bytes]:
+    rows = iter_device_rows(tab=tab, q=q)
+    if fmt == "xlsx":
+        return stream_xlsx(rows)
+    if fmt == "ndjson":
+        return stream_ndjson(rows)
+    return stream_csv(rows)
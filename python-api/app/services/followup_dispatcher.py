@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.glpi_outbox_service import try_send_followup
+
+
+logger = logging.getLogger(__name__)
+
+
+# Fila em memória de ids do outbox; os workers enviam ao GLPI fora da requisição.
+# O que não couber na fila (ou se perder num restart) continua `pending` no
+# outbox e é enviado por process_pending.
+_queue: Optional["asyncio.Queue[int]"] = None
+_workers: List["asyncio.Task"] = []
+
+
+async def _worker(name: str, queue: "asyncio.Queue[int]") -> None:
+    while True:
+        outbox_id = await queue.get()
+        db = SessionLocal()
+        try:
+            ok, err = await try_send_followup(db, outbox_id)
+            if not ok:
+                logger.info("Follow-up %s não enviado (%s); fica pendente no outbox", outbox_id, err)
+        except Exception:
+            logger.exception("Falha no envio do follow-up %s (%s)", outbox_id, name)
+        finally:
+            db.close()
+            queue.task_done()
+
+
+def start_dispatcher() -> None:
+    """Cria a fila e os workers no event loop corrente (startup da API)."""
+    global _queue
+    if _queue is not None:
+        return
+    workers = max(1, int(getattr(settings, "GLPI_FOLLOWUP_DISPATCH_WORKERS", 2) or 2))
+    maxsize = max(1, int(getattr(settings, "GLPI_FOLLOWUP_DISPATCH_QUEUE_SIZE", 1000) or 1000))
+    _queue = asyncio.Queue(maxsize=maxsize)
+    for i in range(workers):
+        _workers.append(asyncio.create_task(_worker(f"followup-{i}", _queue)))
+
+
+async def stop_dispatcher(timeout: float = 10.0) -> None:
+    """Espera a fila esvaziar (até `timeout`) e encerra os workers."""
+    global _queue
+    if _queue is None:
+        return
+    try:
+        await asyncio.wait_for(_queue.join(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Encerrando com %s follow-ups na fila (seguem pendentes no outbox)", _queue.qsize())
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
+
+
+def dispatch_followup(outbox_id: int) -> bool:
+    """Agenda o envio sem esperar o GLPI. False = não enfileirado (fica para o outbox)."""
+    if _queue is None:
+        return False
+    try:
+        _queue.put_nowait(int(outbox_id))
+        return True
+    except asyncio.QueueFull:
+        logger.warning("Fila de follow-ups cheia; %s fica para o processamento do outbox", outbox_id)
+        return False
@@ -1,16 +1,26 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Optional, Tuple
+import asyncio
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
+from sqlalchemy import bindparam, func, insert, literal, or_, select, update
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.integrations.glpi_capabilities import BulkFollowupUnsupported
 from app.integrations.glpi_client import GlpiClient
-from app.models import GlpiFollowupOutbox
+from app.models import GlpiFollowupOutbox, GlpiFollowupOutboxArchive
 
 
 STATUS_PENDING = "pending"
 STATUS_SENT = "sent"
+# Excedeu GLPI_OUTBOX_MAX_ATTEMPTS; só volta à fila por requeue manual.
+STATUS_DEAD = "dead"
 
 
 def enqueue_followup(
@@ -22,6 +32,9 @@ def enqueue_followup(
 ) -> GlpiFollowupOutbox:
     ticket_id = int(ticket_id)
     content = (content or "").strip()
+    now = datetime.utcnow()
+    # Recém-criado fica com o dispatcher da API; o processador só pega depois do prazo.
+    min_age = int(getattr(settings, "GLPI_OUTBOX_MIN_AGE_SECONDS", 30) or 0)
 
     record = GlpiFollowupOutbox(
         maintenance_id=maintenance_id,
@@ -30,7 +43,8 @@ def enqueue_followup(
         status=STATUS_PENDING,
         attempts=0,
         last_error=None,
-        created_at=datetime.utcnow(),
+        created_at=now,
+        next_attempt_at=now + timedelta(seconds=min_age),
         sent_at=None,
     )
     db.add(record)
@@ -39,50 +53,401 @@ def enqueue_followup(
     return record
 
 
-async def try_send_followup(db: Session, outbox_id: int) -> Tuple[bool, Optional[str]]:
-    record = db.query(GlpiFollowupOutbox).filter(GlpiFollowupOutbox.id == int(outbox_id)).first()
-    if not record:
-        return False, "outbox_not_found"
+def _lease_seconds() -> int:
+    return int(getattr(settings, "GLPI_OUTBOX_LEASE_SECONDS", 120) or 120)
 
-    if record.status == STATUS_SENT:
-        return True, None
 
-    record.attempts = int(record.attempts or 0) + 1
+def retry_delay(attempts: int) -> float:
+    """Backoff exponencial com jitter: metade fixa + metade aleatória do intervalo."""
+    base = float(getattr(settings, "GLPI_OUTBOX_RETRY_BASE_SECONDS", 60) or 60)
+    cap = float(getattr(settings, "GLPI_OUTBOX_RETRY_MAX_SECONDS", 6 * 3600) or 6 * 3600)
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _claimable(now: datetime):
+    return (
+        GlpiFollowupOutbox.status == STATUS_PENDING,
+        or_(GlpiFollowupOutbox.locked_until.is_(None), GlpiFollowupOutbox.locked_until < now),
+    )
+
+
+# (id, ticket_id, content, attempts)
+OutboxItem = Tuple[int, int, str, int]
+
+_ITEM_COLUMNS = (
+    GlpiFollowupOutbox.id,
+    GlpiFollowupOutbox.ticket_id,
+    GlpiFollowupOutbox.content,
+    GlpiFollowupOutbox.attempts,
+)
+
+
+def _item(row) -> OutboxItem:
+    return int(row[0]), int(row[1]), row[2], int(row[3] or 0)
+
+
+def claim_batch(db: Session, *, worker: str, limit: int) -> List[OutboxItem]:
+    """Reserva até `limit` itens vencidos (next_attempt_at <= agora) para este worker.
+
+    FOR UPDATE SKIP LOCKED faz processos concorrentes pegarem linhas diferentes;
+    o lease (locked_by/locked_until) mantém a reserva durante o envio, fora da
+    transação. Lease vencido (worker morreu) volta a ser elegível. O range em
+    (status, next_attempt_at) usa idx_outbox_status_next.
+    """
+    now = datetime.utcnow()
+    rows = (
+        db.query(*_ITEM_COLUMNS)
+        .filter(*_claimable(now), GlpiFollowupOutbox.next_attempt_at <= now)
+        .order_by(GlpiFollowupOutbox.next_attempt_at.asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not rows:
+        db.commit()
+        return []
+    db.query(GlpiFollowupOutbox).filter(GlpiFollowupOutbox.id.in_([r[0] for r in rows])).update(
+        {
+            GlpiFollowupOutbox.locked_by: worker,
+            GlpiFollowupOutbox.locked_until: now + timedelta(seconds=_lease_seconds()),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return [_item(r) for r in rows]
+
+
+def _claim_one(db: Session, outbox_id: int, *, worker: str) -> Optional[OutboxItem]:
+    now = datetime.utcnow()
+    claimed = (
+        db.query(GlpiFollowupOutbox)
+        .filter(GlpiFollowupOutbox.id == int(outbox_id), *_claimable(now))
+        .update(
+            {
+                GlpiFollowupOutbox.locked_by: worker,
+                GlpiFollowupOutbox.locked_until: now + timedelta(seconds=_lease_seconds()),
+            },
+            synchronize_session=False,
+        )
+    )
     db.commit()
+    if not claimed:
+        return None
+    row = db.query(*_ITEM_COLUMNS).filter(GlpiFollowupOutbox.id == int(outbox_id)).first()
+    return _item(row) if row else None
+
+
+def record_results(
+    db: Session, items: List[OutboxItem], results: Dict[int, Optional[str]], *, worker: str
+) -> None:
+    """Grava o resultado de um lote: {id: None (enviado) | erro}.
+
+    Um UPDATE para todos os enviados e um executemany para as falhas (próxima
+    tentativa com backoff, ou `dead` ao atingir o limite), em uma única
+    transação, liberando os leases. Só toca nas linhas ainda reservadas por
+    `worker`: se o envio passou do lease e outro worker pegou o item, o
+    resultado dele é que vale (uma falha atrasada daqui não volta o item para
+    pending depois de enviado).
+    """
+    if not results:
+        return
+    now = datetime.utcnow()
+    max_attempts = int(getattr(settings, "GLPI_OUTBOX_MAX_ATTEMPTS", 8) or 8)
+    attempts = {item[0]: item[3] + 1 for item in items}
+    sent_ids = [i for i, err in results.items() if err is None]
+    failed = []
+    for i, err in results.items():
+        if err is None:
+            continue
+        n = attempts.get(i, 1)
+        failed.append(
+            {
+                "_id": i,
+                "_err": err,
+                "_status": STATUS_DEAD if n >= max_attempts else STATUS_PENDING,
+                "_next": now + timedelta(seconds=retry_delay(n)),
+            }
+        )
+
+    if sent_ids:
+        db.query(GlpiFollowupOutbox).filter(
+            GlpiFollowupOutbox.id.in_(sent_ids), GlpiFollowupOutbox.locked_by == worker
+        ).update(
+            {
+                GlpiFollowupOutbox.status: STATUS_SENT,
+                GlpiFollowupOutbox.sent_at: now,
+                GlpiFollowupOutbox.last_error: None,
+                GlpiFollowupOutbox.attempts: GlpiFollowupOutbox.attempts + 1,
+                GlpiFollowupOutbox.locked_by: None,
+                GlpiFollowupOutbox.locked_until: None,
+            },
+            synchronize_session=False,
+        )
+    if failed:
+        table = GlpiFollowupOutbox.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("_id"), table.c.locked_by == worker)
+            .values(
+                attempts=table.c.attempts + 1,
+                last_error=bindparam("_err"),
+                status=bindparam("_status"),
+                next_attempt_at=bindparam("_next"),
+                locked_by=None,
+                locked_until=None,
+            ),
+            failed,
+        )
+    db.commit()
+
 
+async def _send(glpi: GlpiClient, ticket_id: int, content: str) -> Optional[str]:
     try:
-        glpi = GlpiClient()
-        await glpi.add_ticket_followup(int(record.ticket_id), record.content)
+        await glpi.add_ticket_followup(int(ticket_id), content)
+        return None
     except Exception as e:
-        record.last_error = str(e)
-        db.commit()
-        return False, str(e)
+        return str(e) or e.__class__.__name__
+
+
+async def try_send_followup(db: Session, outbox_id: int, *, worker: str = "api") -> Tuple[bool, Optional[str]]:
+    """Envia um item (dispatcher da API). Se outro worker já o reservou, não faz nada."""
+    item = _claim_one(db, outbox_id, worker=worker)
+    if item is None:
+        return False, "not_claimed"
+
+    err = await _send(GlpiClient(), item[1], item[2])
+    record_results(db, [item], {item[0]: err}, worker=worker)
+    return err is None, err
+
+
+_COALESCE_SEPARATOR = "\n\n"
+
+
+def coalesce_by_ticket(items: List[OutboxItem]) -> List[Tuple[int, str, List[int]]]:
+    """Agrupa os itens do lote por chamado: [(ticket_id, conteúdo combinado, ids)]."""
+    groups: Dict[int, List[OutboxItem]] = {}
+    for item in sorted(items, key=lambda i: i[0]):
+        groups.setdefault(item[1], []).append(item)
+    return [
+        (ticket_id, _COALESCE_SEPARATOR.join(i[2] for i in group), [i[0] for i in group])
+        for ticket_id, group in groups.items()
+    ]
 
-    record.status = STATUS_SENT
-    record.sent_at = datetime.utcnow()
-    record.last_error = None
-    db.commit()
-    return True, None
 
+async def _send_chunk(glpi: GlpiClient, chunk: List[Tuple[int, str, List[int]]]) -> Dict[int, Optional[str]]:
+    """Um POST com `input` em lista; se o GLPI recusar o formato, envia um a um.
 
-async def process_pending(db: Session, *, limit: int = 25) -> dict:
+    Só recusa explícita cai no envio individual. Falha ambígua (timeout, resposta
+    inesperada após 2xx, 5xx) pode ter criado os followups: o chunk fica como
+    falho nesta tentativa e volta pelo backoff, sem reenviar na mesma passada.
+    Um 400/422 no lote vira erro de cada item que também falhar sozinho; só se
+    todos passarem um a um a recusa foi da lista, e o lote deixa de ser usado.
+    """
+    try:
+        errors = await glpi.add_ticket_followups([(ticket_id, content) for ticket_id, content, _ids in chunk])
+    except BulkFollowupUnsupported as e:
+        errors = [await _send(glpi, ticket_id, content) for ticket_id, content, _ids in chunk]
+        if not e.confirmed and all(err is None for err in errors):
+            glpi.capabilities.followup_bulk = False
+    except Exception as e:
+        errors = [str(e) or e.__class__.__name__] * len(chunk)
+    results: Dict[int, Optional[str]] = {}
+    for (_ticket_id, _content, ids), err in zip(chunk, errors):
+        for i in ids:
+            results[i] = err
+    return results
+
+
+async def process_pending(db: Session, *, limit: int = 25, worker: Optional[str] = None) -> dict:
+    """Processa um lote do outbox (seguro com vários workers).
+
+    Mensagens do mesmo chamado viram um único followup, e os followups são
+    criados em lotes de GLPI_OUTBOX_BULK_SIZE por POST, com até
+    GLPI_OUTBOX_CONCURRENCY POSTs simultâneos.
+    """
     limit = max(1, min(int(limit), 200))
+    concurrency = max(1, int(getattr(settings, "GLPI_OUTBOX_CONCURRENCY", 5) or 5))
+    bulk_size = max(1, int(getattr(settings, "GLPI_OUTBOX_BULK_SIZE", 20) or 20))
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
 
-    pending = (
-        db.query(GlpiFollowupOutbox)
-        .filter(GlpiFollowupOutbox.status == STATUS_PENDING)
-        .order_by(GlpiFollowupOutbox.created_at.asc())
-        .limit(limit)
+    batch = claim_batch(db, worker=worker, limit=limit)
+    if not batch:
+        return {"processed": 0, "sent": 0, "failed": 0, "posts": 0, "seconds": 0.0}
+    started = time.monotonic()
+
+    combined = coalesce_by_ticket(batch)
+    chunks = [combined[i:i + bulk_size] for i in range(0, len(combined), bulk_size)]
+
+    # Uma sessão GLPI para o lote inteiro, compartilhada pelos envios concorrentes.
+    glpi = GlpiClient()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _bounded(chunk: List[Tuple[int, str, List[int]]]) -> Dict[int, Optional[str]]:
+        async with semaphore:
+            return await _send_chunk(glpi, chunk)
+
+    results: Dict[int, Optional[str]] = {}
+    try:
+        await glpi.init_session()
+        for part in await asyncio.gather(*(_bounded(chunk) for chunk in chunks)):
+            results.update(part)
+    except Exception as e:
+        results = {item[0]: str(e) or e.__class__.__name__ for item in batch}
+    finally:
+        try:
+            await glpi.kill_session()
+        except Exception:
+            pass
+
+    record_results(db, batch, results, worker=worker)
+    sent = sum(1 for err in results.values() if err is None)
+    return {
+        "processed": len(batch),
+        "sent": sent,
+        "failed": len(batch) - sent,
+        "posts": len(chunks),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def list_dead_letters(db: Session, *, limit: int, offset: int) -> Tuple[List[GlpiFollowupOutbox], int]:
+    query = db.query(GlpiFollowupOutbox).filter(GlpiFollowupOutbox.status == STATUS_DEAD)
+    total = query.count()
+    items = query.order_by(GlpiFollowupOutbox.id.desc()).offset(offset).limit(limit).all()
+    return items, int(total)
+
+
+def requeue_dead_letters(db: Session, *, ids: Optional[List[int]] = None) -> int:
+    """Volta itens `dead` para a fila (todos, ou só `ids`), com tentativas zeradas."""
+    query = db.query(GlpiFollowupOutbox).filter(GlpiFollowupOutbox.status == STATUS_DEAD)
+    if ids is not None:
+        if not ids:
+            return 0
+        query = query.filter(GlpiFollowupOutbox.id.in_([int(i) for i in ids]))
+    count = query.update(
+        {
+            GlpiFollowupOutbox.status: STATUS_PENDING,
+            GlpiFollowupOutbox.attempts: 0,
+            GlpiFollowupOutbox.next_attempt_at: datetime.utcnow(),
+            GlpiFollowupOutbox.locked_by: None,
+            GlpiFollowupOutbox.locked_until: None,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return int(count or 0)
+
+
+def outbox_stats(db: Session) -> Dict[str, object]:
+    """Situação da fila a partir do banco (vale para todos os workers)."""
+    now = datetime.utcnow()
+    counts = dict(
+        db.query(GlpiFollowupOutbox.status, func.count(GlpiFollowupOutbox.id))
+        .filter(GlpiFollowupOutbox.status.in_([STATUS_PENDING, STATUS_DEAD]))
+        .group_by(GlpiFollowupOutbox.status)
         .all()
     )
+    due = (
+        db.query(func.count(GlpiFollowupOutbox.id))
+        .filter(GlpiFollowupOutbox.status == STATUS_PENDING, GlpiFollowupOutbox.next_attempt_at <= now)
+        .scalar()
+    )
+    oldest = (
+        db.query(func.min(GlpiFollowupOutbox.created_at))
+        .filter(GlpiFollowupOutbox.status == STATUS_PENDING)
+        .scalar()
+    )
+
+    # Mensagens criadas na última hora: quantas já foram entregues e em quanto tempo.
+    since = now - timedelta(hours=1)
+    created_last_hour, sent_last_hour, avg_delivery = (
+        db.query(
+            func.count(GlpiFollowupOutbox.id),
+            func.count(GlpiFollowupOutbox.sent_at),
+            func.avg(func.unix_timestamp(GlpiFollowupOutbox.sent_at) - func.unix_timestamp(GlpiFollowupOutbox.created_at)),
+        )
+        .filter(GlpiFollowupOutbox.created_at >= since)
+        .one()
+    )
+    return {
+        "pending": int(counts.get(STATUS_PENDING, 0)),
+        "due": int(due or 0),
+        "dead": int(counts.get(STATUS_DEAD, 0)),
+        "oldest_pending_age_seconds": round((now - oldest).total_seconds(), 1) if oldest else None,
+        "created_last_hour": int(created_last_hour or 0),
+        "sent_last_hour": int(sent_last_hour or 0),
+        "avg_delivery_seconds_last_hour": round(float(avg_delivery), 1) if avg_delivery is not None else None,
+    }
+
+
+RETENTION_MODES = ("archive", "delete")
 
-    sent = 0
-    failed = 0
-    for r in pending:
-        ok, _err = await try_send_followup(db, r.id)
-        if ok:
-            sent += 1
-        else:
-            failed += 1
 
-    return {"processed": len(pending), "sent": sent, "failed": failed}
+def purge_sent(
+    db: Session,
+    *,
+    older_than_days: Optional[int] = None,
+    mode: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None,
+    max_batches: Optional[int] = None,
+) -> Dict[str, int]:
+    """Tira da outbox os itens enviados há mais de N dias, em lotes curtos.
+
+    A idade conta a partir de `sent_at`: um item que ficou semanas pendente e
+    saiu ontem continua na outbox. Cada lote é uma transação própria (SELECT dos
+    ids pelo range em idx_outbox_status_sent + INSERT...SELECT no arquivo +
+    DELETE por PK), então os locks duram só o lote e a tabela quente fica com
+    pendentes e envios recentes.
+    """
+    days = int(older_than_days if older_than_days is not None else getattr(settings, "GLPI_OUTBOX_RETENTION_DAYS", 30))
+    mode = (mode or getattr(settings, "GLPI_OUTBOX_RETENTION_MODE", "archive") or "archive").lower()
+    if mode not in RETENTION_MODES:
+        raise ValueError(f"Modo de retenção inválido: {mode}")
+    size = int(batch_size or getattr(settings, "GLPI_OUTBOX_RETENTION_BATCH_SIZE", 500) or 500)
+    pause = float(
+        pause_seconds if pause_seconds is not None else getattr(settings, "GLPI_OUTBOX_RETENTION_PAUSE_SECONDS", 0.2)
+    )
+
+    cutoff = datetime.utcnow() - timedelta(days=max(0, days))
+    outbox = GlpiFollowupOutbox.__table__
+    archive = GlpiFollowupOutboxArchive.__table__
+    removed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = [
+            r[0]
+            for r in db.query(GlpiFollowupOutbox.id)
+            .filter(GlpiFollowupOutbox.status == STATUS_SENT, GlpiFollowupOutbox.sent_at < cutoff)
+            .order_by(GlpiFollowupOutbox.sent_at.asc())
+            .limit(size)
+            .all()
+        ]
+        if not ids:
+            break
+        if mode == "archive":
+            db.execute(
+                insert(archive).from_select(
+                    ["id", "maintenance_id", "ticket_id", "content", "attempts", "created_at", "sent_at", "archived_at"],
+                    select(
+                        outbox.c.id,
+                        outbox.c.maintenance_id,
+                        outbox.c.ticket_id,
+                        outbox.c.content,
+                        outbox.c.attempts,
+                        outbox.c.created_at,
+                        outbox.c.sent_at,
+                        literal(datetime.utcnow()),
+                    ).where(outbox.c.id.in_(ids), outbox.c.status == STATUS_SENT),
+                )
+            )
+        db.execute(outbox.delete().where(outbox.c.id.in_(ids), outbox.c.status == STATUS_SENT))
+        db.commit()
+        removed += len(ids)
+        batches += 1
+        if len(ids) < size:
+            break
+        if pause > 0:
+            time.sleep(pause)
+    return {"mode": mode, "removed": removed, "batches": batches}
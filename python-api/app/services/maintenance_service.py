@@ -2,17 +2,35 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta
 
-from sqlalchemy import desc
+from sqlalchemy import desc, distinct
 from sqlalchemy.orm import Session
 
 from app.models import Computer, MaintenanceHistory
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
-from app.schemas.schemas import MaintenanceCreate, MaintenanceUpdate
+from app.schemas.schemas import (
+    MaintenanceBulkCreate,
+    MaintenanceBulkItem,
+    MaintenanceCreate,
+    MaintenanceUpdate,
+)
+from app.services.device_service import apply_device_filters
+from app.services.dashboard_service import invalidate_dashboard_cache
+from app.services.dashboard_snapshot_service import apply_snapshot_delta, has_corrective
+from app.services.report_cache_service import invalidate_report_cache, report_scopes
+from app.services.rollup_service import apply_rollup_delta, record_delta, rollup_key
+from app.services.version_service import SCOPE_COMPUTERS, SCOPE_MAINTENANCE, bump_versions
+
+
+def _locked_computer(db: Session, computer_id: int) -> Optional[Computer]:
+    # FOR UPDATE antes de ler as datas (`before`) e has_corrective(): duas escritas no
+    # mesmo computador ficam em fila e cada uma calcula o delta do snapshot a partir
+    # do estado que a anterior deixou.
+    return db.query(Computer).filter(Computer.id == computer_id).with_for_update().first()
 
 
 def create_maintenance(db: Session, maintenance: MaintenanceCreate) -> Optional[MaintenanceHistory]:
-    computer = db.query(Computer).filter(Computer.id == maintenance.computer_id).first()
+    computer = _locked_computer(db, maintenance.computer_id)
     if not computer:
         return None
 
@@ -20,6 +38,10 @@ def create_maintenance(db: Session, maintenance: MaintenanceCreate) -> Optional[
     if maintenance.maintenance_type == "Preventiva" and maintenance.next_due_days:
         next_due = maintenance.performed_at + timedelta(days=maintenance.next_due_days)
 
+    before = (computer.last_maintenance, computer.next_maintenance)
+    is_corrective = maintenance.maintenance_type == "Corretiva"
+    first_corrective = is_corrective and not has_corrective(db, computer.id)
+
     maintenance_record = MaintenanceHistory(
         computer_id=maintenance.computer_id,
         maintenance_type=maintenance.maintenance_type,
@@ -30,15 +52,165 @@ def create_maintenance(db: Session, maintenance: MaintenanceCreate) -> Optional[
         next_due=next_due,
     )
     db.add(maintenance_record)
+    rollup: dict = {}
+    record_delta(rollup, maintenance_record, computer.entity, +1)
+    apply_rollup_delta(db, rollup)
 
     computer.last_maintenance = maintenance.performed_at
     computer.next_maintenance = next_due
+    apply_snapshot_delta(
+        db,
+        before=before,
+        after=(computer.last_maintenance, computer.next_maintenance),
+        corrective_total=int(is_corrective),
+        corrective_computers=int(first_corrective),
+    )
+    point = (maintenance_record.performed_at, maintenance_record.maintenance_type)
+    bump_versions(db, SCOPE_MAINTENANCE, SCOPE_COMPUTERS, *report_scopes(point))
 
     db.commit()
+    invalidate_dashboard_cache()
+    invalidate_report_cache(point)
     db.refresh(maintenance_record)
     return maintenance_record
 
 
+# Limite por requisição do registro em lote (o IN (...) é quebrado em blocos).
+MAX_BULK_COMPUTERS = 2000
+_IN_CHUNK = 500
+
+
+class BulkTooLarge(ValueError):
+    pass
+
+
+def _chunks(values: List[int], size: int = _IN_CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _bulk_targets(db: Session, payload: MaintenanceBulkCreate) -> Tuple[List[int], List[tuple]]:
+    """(ids pedidos, linhas encontradas) — linhas = (id, name, patrimonio, entity, last, next)."""
+    columns = (
+        Computer.id,
+        Computer.name,
+        Computer.patrimonio,
+        Computer.entity,
+        Computer.last_maintenance,
+        Computer.next_maintenance,
+    )
+    # Linhas travadas (FOR UPDATE) antes de ler as datas, como em _locked_computer;
+    # sempre em ordem de id para dois lotes não travarem um ao outro.
+    if payload.computer_ids is not None:
+        requested = list(dict.fromkeys(int(i) for i in payload.computer_ids))
+        if len(requested) > MAX_BULK_COMPUTERS:
+            raise BulkTooLarge(f"Máximo de {MAX_BULK_COMPUTERS} computadores por lote")
+        found = []
+        for chunk in _chunks(sorted(requested)):
+            found.extend(
+                db.query(*columns).filter(Computer.id.in_(chunk)).order_by(Computer.id.asc()).with_for_update().all()
+            )
+        return requested, found
+
+    f = payload.filter
+    query = apply_device_filters(db.query(*columns), tab=f.tab, q=f.q)
+    if f.entity is not None:
+        query = query.filter(Computer.entity == f.entity)
+    if f.location is not None:
+        query = query.filter(Computer.location == f.location)
+    found = query.order_by(Computer.id.asc()).limit(MAX_BULK_COMPUTERS + 1).with_for_update().all()
+    if len(found) > MAX_BULK_COMPUTERS:
+        raise BulkTooLarge(f"Filtro seleciona mais de {MAX_BULK_COMPUTERS} computadores")
+    return [r[0] for r in found], found
+
+
+def create_maintenance_bulk(db: Session, payload: MaintenanceBulkCreate) -> Tuple[List[MaintenanceBulkItem], List[tuple]]:
+    """Registra a mesma manutenção em vários computadores numa única transação.
+
+    Um flush dos registros em maintenance_history, um UPDATE em computers por bloco
+    de ids e um único ajuste de contadores/rollup, em vez de uma transação por
+    computador. Retorna (resultado por item, computadores atualizados).
+    Levanta BulkTooLarge acima de MAX_BULK_COMPUTERS.
+    """
+    requested, found = _bulk_targets(db, payload)
+    by_id = {r[0]: r for r in found}
+    ids = [i for i in requested if i in by_id]
+    if not ids:
+        return [MaintenanceBulkItem(computer_id=i, status="not_found") for i in requested], []
+
+    performed_at = payload.performed_at
+    next_due = None
+    if payload.maintenance_type == "Preventiva" and payload.next_due_days:
+        next_due = performed_at + timedelta(days=payload.next_due_days)
+    is_corrective = payload.maintenance_type == "Corretiva"
+
+    already_corrective = set()
+    if is_corrective:
+        for chunk in _chunks(ids):
+            already_corrective.update(
+                cid
+                for (cid,) in db.query(distinct(MaintenanceHistory.computer_id)).filter(
+                    MaintenanceHistory.computer_id.in_(chunk),
+                    MaintenanceHistory.maintenance_type == "Corretiva",
+                ).with_for_update()
+            )
+
+    batch_at = datetime.utcnow()
+    records = [
+        MaintenanceHistory(
+            computer_id=cid,
+            maintenance_type=payload.maintenance_type,
+            glpi_ticket_id=payload.glpi_ticket_id,
+            description=payload.description,
+            performed_at=performed_at,
+            technician=payload.technician,
+            next_due=next_due,
+            created_at=batch_at,
+            updated_at=batch_at,
+        )
+        for cid in ids
+    ]
+    db.add_all(records)
+    # O flush traz as PKs geradas; nada de reconsultar por created_at (DATETIME(0) no MySQL).
+    db.flush()
+    created_ids = {r.computer_id: r.id for r in records}
+    for chunk in _chunks(ids):
+        db.query(Computer).filter(Computer.id.in_(chunk)).update(
+            {
+                Computer.last_maintenance: performed_at,
+                Computer.next_maintenance: next_due,
+                Computer.updated_at: batch_at,
+            },
+            synchronize_session=False,
+        )
+
+    apply_snapshot_delta(
+        db,
+        changes=[((by_id[i][4], by_id[i][5]), (performed_at, next_due)) for i in ids],
+        corrective_total=len(ids) if is_corrective else 0,
+        corrective_computers=len(set(ids) - already_corrective) if is_corrective else 0,
+    )
+    rollup: Dict[tuple, int] = {}
+    for i in ids:
+        key = rollup_key(performed_at, payload.maintenance_type, by_id[i][3], payload.technician)
+        rollup[key] = rollup.get(key, 0) + 1
+    apply_rollup_delta(db, rollup)
+    point = (performed_at, payload.maintenance_type)
+    bump_versions(db, SCOPE_MAINTENANCE, SCOPE_COMPUTERS, *report_scopes(point))
+
+    db.commit()
+    invalidate_dashboard_cache()
+    invalidate_report_cache(point)
+
+    items = [
+        MaintenanceBulkItem(computer_id=i, status="created", maintenance_id=created_ids.get(i))
+        if i in by_id
+        else MaintenanceBulkItem(computer_id=i, status="not_found")
+        for i in requested
+    ]
+    return items, [by_id[i] for i in ids]
+
+
 def get_device_maintenance_history(db: Session, device_id: int):
     return (
         db.query(MaintenanceHistory)
@@ -49,10 +221,18 @@ def get_device_maintenance_history(db: Session, device_id: int):
 
 
 def update_maintenance(db: Session, maintenance_id: int, payload: MaintenanceUpdate) -> Optional[MaintenanceHistory]:
-    record = db.query(MaintenanceHistory).filter(MaintenanceHistory.id == maintenance_id).first()
+    record = db.query(MaintenanceHistory).filter(MaintenanceHistory.id == maintenance_id).with_for_update().first()
     if not record:
         return None
 
+    computer = _locked_computer(db, record.computer_id)
+    was_corrective = record.maintenance_type == "Corretiva"
+    had_corrective = has_corrective(db, record.computer_id)
+    entity = computer.entity if computer else None
+    rollup: dict = {}
+    record_delta(rollup, record, entity, -1)
+    old_point = (record.performed_at, record.maintenance_type)
+
     if payload.maintenance_type is not None:
         record.maintenance_type = payload.maintenance_type
     if payload.description is not None:
@@ -69,33 +249,64 @@ def update_maintenance(db: Session, maintenance_id: int, payload: MaintenanceUpd
         next_due = None
     record.next_due = next_due
     record.updated_at = datetime.utcnow()
+    record_delta(rollup, record, entity, +1)
+    apply_rollup_delta(db, rollup)
 
-    computer = db.query(Computer).filter(Computer.id == record.computer_id).first()
+    before = after = None
     if computer:
+        before = (computer.last_maintenance, computer.next_maintenance)
         computer.last_maintenance = record.performed_at
         computer.next_maintenance = next_due
         computer.updated_at = datetime.utcnow()
+        after = (computer.last_maintenance, computer.next_maintenance)
+
+    is_corrective = record.maintenance_type == "Corretiva"
+    corrective_computers = 0
+    if is_corrective != was_corrective:
+        db.flush()
+        corrective_computers = int(has_corrective(db, record.computer_id)) - int(had_corrective)
+    apply_snapshot_delta(
+        db,
+        before=before,
+        after=after,
+        corrective_total=int(is_corrective) - int(was_corrective),
+        corrective_computers=corrective_computers,
+    )
+    new_point = (record.performed_at, record.maintenance_type)
+    bump_versions(db, SCOPE_MAINTENANCE, SCOPE_COMPUTERS, *report_scopes(old_point, new_point))
 
     db.commit()
+    invalidate_dashboard_cache()
+    invalidate_report_cache(old_point, new_point)
     db.refresh(record)
     return record
 
 
 def delete_maintenance(db: Session, maintenance_id: int) -> Optional[int]:
-    record = db.query(MaintenanceHistory).filter(MaintenanceHistory.id == maintenance_id).first()
+    record = db.query(MaintenanceHistory).filter(MaintenanceHistory.id == maintenance_id).with_for_update().first()
     if not record:
         return None
 
     computer_id = record.computer_id
+    was_corrective = record.maintenance_type == "Corretiva"
+    computer = _locked_computer(db, computer_id)
+    rollup: dict = {}
+    record_delta(rollup, record, computer.entity if computer else None, -1)
+    apply_rollup_delta(db, rollup)
+    old_point = (record.performed_at, record.maintenance_type)
     db.delete(record)
-    db.commit()
+    # Mesma transação para remover o registro e recalcular as datas do computador,
+    # assim os contadores do dashboard nunca enxergam um estado intermediário.
+    db.flush()
 
-    computer = db.query(Computer).filter(Computer.id == computer_id).first()
+    before = after = None
     if computer:
+        before = (computer.last_maintenance, computer.next_maintenance)
         latest = (
             db.query(MaintenanceHistory)
             .filter(MaintenanceHistory.computer_id == computer_id)
             .order_by(desc(MaintenanceHistory.performed_at))
+            .with_for_update()
             .first()
         )
         if latest:
@@ -105,6 +316,19 @@ def delete_maintenance(db: Session, maintenance_id: int) -> Optional[int]:
             computer.last_maintenance = None
             computer.next_maintenance = None
         computer.updated_at = datetime.utcnow()
-        db.commit()
+        after = (computer.last_maintenance, computer.next_maintenance)
+
+    last_corrective_gone = was_corrective and not has_corrective(db, computer_id)
+    apply_snapshot_delta(
+        db,
+        before=before,
+        after=after,
+        corrective_total=-int(was_corrective),
+        corrective_computers=-int(last_corrective_gone),
+    )
+    bump_versions(db, SCOPE_MAINTENANCE, SCOPE_COMPUTERS, *report_scopes(old_point))
+    db.commit()
 
+    invalidate_dashboard_cache()
+    invalidate_report_cache(old_point)
     return computer_id
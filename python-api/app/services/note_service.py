@@ -9,6 +9,7 @@ from typing import Optional
 
 from app.models import Computer, ComputerNote
 from app.schemas.schemas import NoteCreate, NoteUpdate
+from app.services.version_service import SCOPE_NOTES, bump_versions
 
 
 def get_device_notes(db: Session, device_id: int):
@@ -33,6 +34,7 @@ def create_device_note(
 
     note_record = ComputerNote(computer_id=device_id, author=author or "Sistema", content=note.content)
     db.add(note_record)
+    bump_versions(db, SCOPE_NOTES)
     db.commit()
     db.refresh(note_record)
     return note_record
@@ -55,6 +57,7 @@ def update_device_note(
     if payload.content is not None:
         note.content = payload.content
     note.updated_at = datetime.utcnow()
+    bump_versions(db, SCOPE_NOTES)
 
     db.commit()
     db.refresh(note)
@@ -71,5 +74,6 @@ def delete_device_note(db: Session, device_id: int, note_id: int) -> bool:
         return False
 
     db.delete(note)
+    bump_versions(db, SCOPE_NOTES)
     db.commit()
     return True
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, distinct, func
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models import Computer, MaintenanceDailyRollup, MaintenanceHistory
+from app.schemas.report_schemas import (
+    CorrectiveInterval,
+    EntityCompliance,
+    MaintenanceAggregates,
+    TechnicianMonth,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+_aggregates_cache = TTLCache(
+    ttl_seconds=int(getattr(settings, "REPORT_AGGREGATES_CACHE_TTL_SECONDS", 300) or 300),
+    max_entries=64,
+)
+
+# None = ainda não testado; False = servidor sem window functions (MySQL < 8).
+_window_supported: Optional[bool] = None
+
+# Erros do MySQL que indicam falta de window functions: 1064 (ER_PARSE_ERROR, o
+# 5.7 não reconhece OVER) e 1235 (ER_NOT_SUPPORTED_YET). Qualquer outro erro
+# (lock wait, conexão perdida, timeout) é passageiro e não muda o caminho.
+_WINDOW_UNSUPPORTED_ERRORS = (1064, 1235)
+
+_SECONDS_PER_DAY = 86400.0
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _sum_if(condition, column):
+    return func.coalesce(func.sum(case((condition, column), else_=0)), 0)
+
+
+def _period_filters(from_date: date, to_date: date):
+    return (
+        MaintenanceHistory.performed_at >= datetime.combine(from_date, time.min),
+        MaintenanceHistory.performed_at < datetime.combine(to_date + timedelta(days=1), time.min),
+    )
+
+
+def _days(seconds) -> Optional[float]:
+    return None if seconds is None else round(float(seconds) / _SECONDS_PER_DAY, 2)
+
+
+def _technician_monthly(db: Session, from_date: date, to_date: date) -> List[TechnicianMonth]:
+    # Lê o rollup diário (range na chave primária) em vez de maintenance_history.
+    rollup = MaintenanceDailyRollup
+    month = func.date_format(rollup.day, "%Y-%m-01").label("month")
+    rows = (
+        db.query(
+            month,
+            rollup.technician,
+            _sum_if(rollup.maintenance_type == "Preventiva", rollup.maintenance_count),
+            _sum_if(rollup.maintenance_type == "Corretiva", rollup.maintenance_count),
+        )
+        .filter(rollup.day >= from_date, rollup.day <= to_date)
+        .group_by(month, rollup.technician)
+        .all()
+    )
+    result = [
+        TechnicianMonth(
+            month=date.fromisoformat(str(m)[:10]),
+            technician=tech or None,
+            preventive=int(prev or 0),
+            corrective=int(corr or 0),
+            total=int(prev or 0) + int(corr or 0),
+        )
+        for m, tech, prev, corr in rows
+    ]
+    result.sort(key=lambda r: (r.month, -r.total, r.technician is None, r.technician or ""))
+    return result
+
+
+def _corrective_intervals_sql(db: Session, from_date: date, to_date: date, limit: int) -> List[CorrectiveInterval]:
+    """Intervalo entre corretivas com LAG(performed_at) por computador (MySQL 8).
+
+    A partição/ordem (computer_id, performed_at) vem pronta de
+    idx_maintenance_computer_type_date, sem filesort.
+    """
+    ordered = (
+        db.query(
+            MaintenanceHistory.computer_id.label("computer_id"),
+            MaintenanceHistory.performed_at.label("performed_at"),
+            func.lag(MaintenanceHistory.performed_at)
+            .over(partition_by=MaintenanceHistory.computer_id, order_by=MaintenanceHistory.performed_at)
+            .label("prev_at"),
+        )
+        .filter(MaintenanceHistory.maintenance_type == "Corretiva", *_period_filters(from_date, to_date))
+        .subquery()
+    )
+    gap = func.unix_timestamp(ordered.c.performed_at) - func.unix_timestamp(ordered.c.prev_at)
+    count = func.count(ordered.c.performed_at)
+    avg_gap = func.avg(gap)
+
+    rows = (
+        db.query(
+            Computer.id,
+            Computer.name,
+            Computer.patrimonio,
+            Computer.entity,
+            count,
+            avg_gap,
+            func.min(gap),
+            func.max(ordered.c.performed_at),
+        )
+        .join(ordered, ordered.c.computer_id == Computer.id)
+        .group_by(Computer.id, Computer.name, Computer.patrimonio, Computer.entity)
+        .having(count >= 2)
+        .order_by(count.desc(), avg_gap.asc(), Computer.id.asc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        CorrectiveInterval(
+            computer_id=r[0],
+            computer_name=r[1],
+            patrimonio=r[2],
+            entity=r[3],
+            corrective_count=int(r[4] or 0),
+            avg_days_between=_days(r[5]),
+            min_days_between=_days(r[6]),
+            last_corrective_at=r[7],
+        )
+        for r in rows
+    ]
+
+
+def _corrective_intervals_python(
+    db: Session, from_date: date, to_date: date, limit: int
+) -> List[CorrectiveInterval]:
+    """Fallback sem window functions.
+
+    Lê só (computer_id, performed_at) já ordenados pelo índice e calcula os
+    intervalos em colunas (listas paralelas + zip), sem consulta por linha.
+    """
+    rows = (
+        db.query(MaintenanceHistory.computer_id, MaintenanceHistory.performed_at)
+        .filter(MaintenanceHistory.maintenance_type == "Corretiva", *_period_filters(from_date, to_date))
+        .order_by(MaintenanceHistory.computer_id.asc(), MaintenanceHistory.performed_at.asc())
+        .all()
+    )
+    if not rows:
+        return []
+
+    ids = [r[0] for r in rows]
+    times = [r[1] for r in rows]
+    # gaps[i] = intervalo entre a linha i e a i+1 (None quando muda de computador)
+    gaps = [
+        (b - a).total_seconds() if same else None
+        for a, b, same in zip(times, times[1:], (x == y for x, y in zip(ids, ids[1:])))
+    ]
+
+    stats: List[Tuple[int, int, float, float, datetime]] = []
+    start = 0
+    for computer_id, group in groupby(ids):
+        n = sum(1 for _ in group)
+        if n >= 2:
+            own = gaps[start:start + n - 1]
+            stats.append((computer_id, n, sum(own) / len(own), min(own), times[start + n - 1]))
+        start += n
+
+    stats.sort(key=lambda s: (-s[1], s[2], s[0]))
+    stats = stats[:limit]
+    if not stats:
+        return []
+
+    info = {
+        c.id: c
+        for c in db.query(Computer.id, Computer.name, Computer.patrimonio, Computer.entity)
+        .filter(Computer.id.in_([s[0] for s in stats]))
+        .all()
+    }
+    result = []
+    for computer_id, n, avg_gap, min_gap, last_at in stats:
+        c = info.get(computer_id)
+        if c is None:
+            continue
+        result.append(
+            CorrectiveInterval(
+                computer_id=computer_id,
+                computer_name=c.name,
+                patrimonio=c.patrimonio,
+                entity=c.entity,
+                corrective_count=n,
+                avg_days_between=_days(avg_gap),
+                min_days_between=_days(min_gap),
+                last_corrective_at=last_at,
+            )
+        )
+    return result
+
+
+def _mysql_error_code(exc: Exception) -> Optional[int]:
+    args = getattr(getattr(exc, "orig", None), "args", None) or ()
+    return args[0] if args and isinstance(args[0], int) else None
+
+
+def _corrective_intervals(db: Session, from_date: date, to_date: date, limit: int) -> Tuple[List[CorrectiveInterval], str]:
+    global _window_supported
+    if _window_supported is not False:
+        try:
+            rows = _corrective_intervals_sql(db, from_date, to_date, limit)
+            _window_supported = True
+            return rows, "sql"
+        except (OperationalError, ProgrammingError) as e:
+            db.rollback()
+            if _window_supported is None and _mysql_error_code(e) in _WINDOW_UNSUPPORTED_ERRORS:
+                logger.warning("Banco sem window functions; usando cálculo em Python para intervalos")
+                _window_supported = False
+            else:
+                raise
+    return _corrective_intervals_python(db, from_date, to_date, limit), "python"
+
+
+def _entity_compliance(db: Session, from_date: date, to_date: date) -> List[EntityCompliance]:
+    now = datetime.utcnow()
+    # Uma passada em computers por entidade (idx_computer_facets começa por entity).
+    status_rows = (
+        db.query(
+            Computer.entity,
+            func.count(Computer.id),
+            _count_if(Computer.next_maintenance >= now),
+            _count_if(Computer.next_maintenance < now),
+            _count_if(Computer.next_maintenance.is_(None)),
+        )
+        .group_by(Computer.entity)
+        .all()
+    )
+    # Computadores com ao menos uma preventiva no período, por entidade.
+    done_rows = (
+        db.query(Computer.entity, func.count(distinct(MaintenanceHistory.computer_id)))
+        .join(Computer, Computer.id == MaintenanceHistory.computer_id)
+        .filter(MaintenanceHistory.maintenance_type == "Preventiva", *_period_filters(from_date, to_date))
+        .group_by(Computer.entity)
+        .all()
+    )
+    done: Dict[Optional[str], int] = {(e or None): int(n or 0) for e, n in done_rows}
+
+    result = []
+    for entity, total, ok, late, pending in status_rows:
+        total = int(total or 0)
+        entity = entity or None
+        preventive = done.get(entity, 0)
+        result.append(
+            EntityCompliance(
+                entity=entity,
+                total_computers=total,
+                ok_computers=int(ok or 0),
+                late_computers=int(late or 0),
+                pending_computers=int(pending or 0),
+                preventive_in_period=preventive,
+                compliance_rate=round(int(ok or 0) / total, 4) if total else 0.0,
+                preventive_coverage=round(preventive / total, 4) if total else 0.0,
+            )
+        )
+    result.sort(key=lambda r: (-r.total_computers, r.entity is None, r.entity or ""))
+    return result
+
+
+def get_maintenance_aggregates(
+    db: Session,
+    *,
+    from_date: date,
+    to_date: date,
+    limit: int,
+    cache_key: Optional[tuple] = None,
+) -> MaintenanceAggregates:
+    """Produtividade por técnico/mês, intervalo entre corretivas e conformidade por entidade."""
+    if cache_key is not None:
+        cached = _aggregates_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    intervals, engine = _corrective_intervals(db, from_date, to_date, limit)
+    result = MaintenanceAggregates(
+        from_date=from_date,
+        to_date=to_date,
+        technician_monthly=_technician_monthly(db, from_date, to_date),
+        corrective_intervals=intervals,
+        entity_compliance=_entity_compliance(db, from_date, to_date),
+        intervals_engine=engine,
+    )
+    if cache_key is not None:
+        _aggregates_cache.set(cache_key, result)
+    return result
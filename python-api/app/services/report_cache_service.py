@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import ByteLRUCache
+from app.core.config import settings
+from app.services.version_service import REPORT_SCOPE_PREFIX, SCOPE_REPORT_NAMES, get_versions_with_prefix
+
+
+_MB = 1024 * 1024
+
+_report_cache = ByteLRUCache(
+    max_bytes=int(getattr(settings, "REPORT_CACHE_MAX_MB", 64) or 64) * _MB,
+    max_entry_bytes=int(getattr(settings, "REPORT_CACHE_MAX_ENTRY_MB", 16) or 16) * _MB,
+    ttl_seconds=int(getattr(settings, "REPORT_CACHE_TTL_SECONDS", 600) or 600),
+)
+
+# (formato, from, to, tipo, carimbo do período) — tipo None = ambas
+ReportCacheKey = Tuple[str, Optional[date], Optional[date], Optional[str], Tuple[int, int]]
+
+
+def _report_type(maintenance_type: Optional[str]) -> Optional[str]:
+    # Mesma regra do relatório: tipo desconhecido => ambas.
+    return maintenance_type if maintenance_type in {"Preventiva", "Corretiva"} else None
+
+
+def report_month_scope(day: date, maintenance_type: str) -> str:
+    return f"{REPORT_SCOPE_PREFIX}{day:%Y-%m}:{maintenance_type}"
+
+
+def report_scopes(*changes: Tuple[Optional[datetime], str]) -> List[str]:
+    """Escopos de data_versions (mês/tipo) atingidos pelas manutenções alteradas.
+
+    Incrementados na transação da escrita, valem como sinal entre workers.
+    """
+    return sorted(
+        {report_month_scope(performed_at.date(), mtype) for performed_at, mtype in changes if performed_at is not None}
+    )
+
+
+def report_stamp(
+    db: Session,
+    *,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    maintenance_type: Optional[str],
+) -> Tuple[int, int]:
+    """(soma das versões dos meses/tipo do período, versão de nome/patrimônio).
+
+    As versões só crescem, então o carimbo muda exatamente quando alguma escrita
+    (em qualquer worker) cai num mês coberto pelo relatório. Uma consulta pela
+    PK de data_versions (uma linha por mês/tipo com escrita).
+    """
+    maintenance_type = _report_type(maintenance_type)
+    first = f"{from_date:%Y-%m}" if from_date is not None else None
+    last = f"{to_date:%Y-%m}" if to_date is not None else None
+    period = names = 0
+    for scope, version in get_versions_with_prefix(db, REPORT_SCOPE_PREFIX).items():
+        if scope == SCOPE_REPORT_NAMES:
+            names = version
+            continue
+        month, _, mtype = scope[len(REPORT_SCOPE_PREFIX):].partition(":")
+        if maintenance_type is not None and mtype != maintenance_type:
+            continue
+        if (first is not None and month < first) or (last is not None and month > last):
+            continue
+        period += version
+    return (period, names)
+
+
+def report_cache_key(
+    fmt: str,
+    *,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    maintenance_type: Optional[str],
+    stamp: Tuple[int, int] = (0, 0),
+) -> ReportCacheKey:
+    # O carimbo (report_stamp) na chave faz escritas de outros workers no período
+    # virarem MISS aqui também; a invalidação local abaixo só libera memória antes.
+    return (fmt, from_date, to_date, _report_type(maintenance_type), stamp)
+
+
+def get_cached_report(key: ReportCacheKey) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+    return _report_cache.get(key)
+
+
+def cache_report_stream(key: ReportCacheKey, chunks: Iterable[bytes], meta: Dict[str, Any]) -> Iterator[bytes]:
+    """Repassa os blocos do streaming e guarda o corpo completo ao final.
+
+    Para de acumular ao passar do limite por entrada. Se houve invalidação
+    durante o streaming (`generation` mudou), o resultado não é gravado.
+    """
+    generation = _report_cache.generation
+    limit = _report_cache.max_entry_bytes
+    parts = []
+    size = 0
+    for chunk in chunks:
+        if parts is not None:
+            size += len(chunk)
+            if size > limit:
+                parts = None
+            else:
+                parts.append(chunk)
+        yield chunk
+    if parts is not None:
+        _report_cache.set(key, b"".join(parts), meta, generation=generation)
+
+
+def _covers(key: ReportCacheKey, day: date, maintenance_type: str) -> bool:
+    _fmt, from_date, to_date, cached_type, _stamp = key
+    if cached_type is not None and cached_type != maintenance_type:
+        return False
+    if from_date is not None and day < from_date:
+        return False
+    if to_date is not None and day > to_date:
+        return False
+    return True
+
+
+def invalidate_report_cache(*changes: Tuple[datetime, str]) -> int:
+    """Remove só os relatórios cujo período/tipo contém alguma das manutenções alteradas.
+
+    `changes` são pares (performed_at, maintenance_type) — na edição, passe o
+    estado antes e depois.
+    """
+    points = [(performed_at.date(), mtype) for performed_at, mtype in changes if performed_at is not None]
+    if not points:
+        return 0
+    return _report_cache.invalidate(lambda key: any(_covers(key, day, mtype) for day, mtype in points))
+
+
+def clear_report_cache() -> None:
+    # Mudanças em computers (nome/patrimônio) afetam linhas de qualquer período.
+    _report_cache.clear()
+
+
+def report_cache_stats() -> Dict[str, Any]:
+    return _report_cache.stats()
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import socket
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import ReportJob
+from app.services.report_service import (
+    count_maintenance_report,
+    encode_report_rows,
+    iter_maintenance_report_rows,
+)
+from app.services.version_service import SCOPE_COMPUTERS, SCOPE_MAINTENANCE, get_versions
+
+
+logger = logging.getLogger(__name__)
+
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_EXPIRED = "expired"
+
+REPORT_MAINTENANCE = "maintenance"
+
+_PROGRESS_EVERY = 1000
+
+
+def _normalize_params(
+    *,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    maintenance_type: Optional[str],
+) -> Dict[str, Any]:
+    # Mesma regra de get_maintenance_report: tipo desconhecido => ambas.
+    if maintenance_type not in {"Preventiva", "Corretiva"}:
+        maintenance_type = None
+    return {
+        "from": from_date.isoformat() if from_date else None,
+        "to": to_date.isoformat() if to_date else None,
+        "maintenance_type": maintenance_type,
+    }
+
+
+def _params_hash(report_type: str, params: Dict[str, Any], fmt: str, versions: Dict[str, int]) -> str:
+    # Inclui as versões dos dados: mesmo pedido após uma escrita gera job novo.
+    raw = json.dumps(
+        {"report": report_type, "params": params, "format": fmt, "versions": versions},
+        sort_keys=True,
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def enqueue_report_job(
+    db: Session,
+    *,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    maintenance_type: Optional[str],
+    fmt: str,
+    requested_by: Optional[str] = None,
+) -> ReportJob:
+    """Cria o job ou devolve um existente com os mesmos parâmetros (dedup)."""
+    params = _normalize_params(from_date=from_date, to_date=to_date, maintenance_type=maintenance_type)
+    versions = get_versions(db, SCOPE_MAINTENANCE, SCOPE_COMPUTERS)
+    params_hash = _params_hash(REPORT_MAINTENANCE, params, fmt, versions)
+
+    existing = (
+        db.query(ReportJob)
+        .filter(
+            ReportJob.params_hash == params_hash,
+            ReportJob.status.in_([STATUS_PENDING, STATUS_RUNNING, STATUS_DONE]),
+        )
+        .order_by(ReportJob.created_at.desc())
+        .first()
+    )
+    if existing and (existing.status != STATUS_DONE or _artifact_exists(existing)):
+        return existing
+
+    job = ReportJob(
+        params_hash=params_hash,
+        report_type=REPORT_MAINTENANCE,
+        params=params,
+        format=fmt,
+        status=STATUS_PENDING,
+        rows_done=0,
+        requested_by=requested_by,
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_report_job(db: Session, job_id: int) -> Optional[ReportJob]:
+    return db.query(ReportJob).filter(ReportJob.id == int(job_id)).first()
+
+
+def _artifact_exists(job: ReportJob) -> bool:
+    return bool(job.file_path) and os.path.isfile(job.file_path)
+
+
+def job_progress(job: ReportJob) -> float:
+    if job.status == STATUS_DONE:
+        return 1.0
+    total = int(job.rows_total or 0)
+    if total <= 0:
+        return 0.0
+    return min(1.0, int(job.rows_done or 0) / total)
+
+
+def _artifacts_dir() -> Path:
+    path = Path(getattr(settings, "REPORT_JOBS_DIR", "") or "report_artifacts")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next_job(db: Session, *, worker: str) -> Optional[ReportJob]:
+    """Pega o job pendente mais antigo.
+
+    O UPDATE condicional (status ainda 'pending') garante que só um worker fica
+    com o job, mesmo com vários processos consultando a fila ao mesmo tempo.
+    """
+    candidates = (
+        db.query(ReportJob.id)
+        .filter(ReportJob.status == STATUS_PENDING)
+        .order_by(ReportJob.created_at.asc())
+        .limit(5)
+        .all()
+    )
+    now = datetime.utcnow()
+    for (job_id,) in candidates:
+        claimed = (
+            db.query(ReportJob)
+            .filter(ReportJob.id == job_id, ReportJob.status == STATUS_PENDING)
+            .update(
+                {
+                    ReportJob.status: STATUS_RUNNING,
+                    ReportJob.worker: worker,
+                    ReportJob.started_at: now,
+                    ReportJob.updated_at: now,
+                    ReportJob.rows_done: 0,
+                    ReportJob.error: None,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed:
+            return get_report_job(db, job_id)
+    return None
+
+
+def _with_progress(db: Session, job: ReportJob, rows: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % _PROGRESS_EVERY == 0:
+            job.rows_done = done
+            job.updated_at = datetime.utcnow()
+            db.commit()
+    job.rows_done = done
+
+
+def run_report_job(db: Session, job: ReportJob) -> None:
+    """Gera o arquivo do job (chamado pelo worker, fora do processo da API)."""
+    params = dict(job.params or {})
+    filters = {
+        "from_date": date.fromisoformat(params["from"]) if params.get("from") else None,
+        "to_date": date.fromisoformat(params["to"]) if params.get("to") else None,
+        "maintenance_type": params.get("maintenance_type"),
+    }
+
+    path = _artifacts_dir() / f"report_{job.id}.{job.format}"
+    tmp_path = path.with_suffix(path.suffix + ".part")
+    try:
+        job.rows_total = count_maintenance_report(db, **filters)
+        db.commit()
+
+        rows = _with_progress(db, job, iter_maintenance_report_rows(**filters))
+        with open(tmp_path, "wb") as fh:
+            for chunk in encode_report_rows(job.format, rows):
+                fh.write(chunk)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.exception("Relatório %s falhou", job.id)
+        db.rollback()
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        job.status = STATUS_FAILED
+        job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        return
+
+    job.status = STATUS_DONE
+    job.file_path = str(path)
+    job.file_size = path.stat().st_size
+    job.finished_at = datetime.utcnow()
+    db.commit()
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """Volta para a fila jobs 'running' cujo worker parou de dar sinal."""
+    stale_minutes = int(getattr(settings, "REPORT_JOBS_STALE_MINUTES", 30) or 30)
+    cutoff = datetime.utcnow() - timedelta(minutes=stale_minutes)
+    count = (
+        db.query(ReportJob)
+        .filter(ReportJob.status == STATUS_RUNNING, ReportJob.updated_at < cutoff)
+        .update({ReportJob.status: STATUS_PENDING, ReportJob.worker: None}, synchronize_session=False)
+    )
+    db.commit()
+    return int(count or 0)
+
+
+def _expire(job: ReportJob) -> None:
+    if job.file_path:
+        try:
+            os.remove(job.file_path)
+        except OSError:
+            pass
+    job.status = STATUS_EXPIRED
+    job.file_path = None
+
+
+def evict_report_artifacts(db: Session) -> int:
+    """Remove arquivos antigos (idade) e, se passar do limite, os mais antigos (tamanho)."""
+    max_age = timedelta(hours=int(getattr(settings, "REPORT_JOBS_MAX_AGE_HOURS", 24) or 24))
+    max_bytes = int(getattr(settings, "REPORT_JOBS_MAX_TOTAL_MB", 1024) or 1024) * 1024 * 1024
+    cutoff = datetime.utcnow() - max_age
+
+    done = (
+        db.query(ReportJob)
+        .filter(ReportJob.status == STATUS_DONE)
+        .order_by(ReportJob.finished_at.desc())
+        .all()
+    )
+
+    evicted = 0
+    total = 0
+    for job in done:
+        size = int(job.file_size or 0)
+        too_old = job.finished_at is not None and job.finished_at < cutoff
+        if too_old or total + size > max_bytes or not _artifact_exists(job):
+            _expire(job)
+            evicted += 1
+            continue
+        total += size
+
+    if evicted:
+        db.commit()
+    return evicted
@@ -1,13 +1,32 @@
 from __future__ import annotations
 
+import base64
+import json
 from datetime import date, datetime, time
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional, Tuple
 
-from sqlalchemy import desc
+from sqlalchemy import and_, desc, func, or_
 from sqlalchemy.orm import Session
 
+from app.core.database import SessionLocal
 from app.models import Computer, MaintenanceHistory
-from app.schemas.report_schemas import MaintenanceReportResponse, MaintenanceReportRow
+from app.schemas.report_schemas import MaintenanceReportPage, MaintenanceReportResponse, MaintenanceReportRow
+from app.services.export_service import stream_csv, stream_ndjson, stream_xlsx
+
+
+REPORT_FORMATS = ("json", "ndjson", "csv")
+
+REPORT_COLUMNS = (
+    "computer_id",
+    "computer_name",
+    "patrimonio",
+    "technician",
+    "maintenance_type",
+    "performed_at",
+)
+
+_STREAM_BATCH = 1000
+_CHUNK_BYTES = 64 * 1024
 
 
 def _dt_start(d: date) -> datetime:
@@ -19,18 +38,13 @@ def _dt_end(d: date) -> datetime:
     return datetime.combine(d, time.max)
 
 
-def get_maintenance_report(
-    db: Session,
+def _apply_report_filters(
+    query,
     *,
     from_date: Optional[date],
     to_date: Optional[date],
     maintenance_type: Optional[str],
-) -> MaintenanceReportResponse:
-    query = (
-        db.query(MaintenanceHistory, Computer)
-        .join(Computer, Computer.id == MaintenanceHistory.computer_id)
-    )
-
+):
     if from_date is not None:
         query = query.filter(MaintenanceHistory.performed_at >= _dt_start(from_date))
 
@@ -40,20 +54,223 @@ def get_maintenance_report(
     if maintenance_type and maintenance_type in {"Preventiva", "Corretiva"}:
         query = query.filter(MaintenanceHistory.maintenance_type == maintenance_type)
 
-    query = query.order_by(desc(MaintenanceHistory.performed_at))
+    return query
 
-    rows = query.all()
+
+def _report_rows_query(db: Session, **filters):
+    # Só as colunas do relatório: evita carregar computers.glpi_data (JSON grande) por linha.
+    query = db.query(
+        Computer.id,
+        Computer.name,
+        Computer.patrimonio,
+        MaintenanceHistory.technician,
+        MaintenanceHistory.maintenance_type,
+        MaintenanceHistory.performed_at,
+        MaintenanceHistory.id,
+    ).join(Computer, Computer.id == MaintenanceHistory.computer_id)
+    query = _apply_report_filters(query, **filters)
+    # id desempata manutenções no mesmo instante (ordem estável para o cursor).
+    return query.order_by(desc(MaintenanceHistory.performed_at), desc(MaintenanceHistory.id))
+
+
+def _row_dict(r) -> Dict[str, Any]:
+    return {
+        "computer_id": r[0],
+        "computer_name": r[1],
+        "patrimonio": r[2],
+        "technician": r[3],
+        "maintenance_type": r[4],
+        "performed_at": r[5].isoformat() if r[5] else None,
+    }
+
+
+def get_maintenance_report(
+    db: Session,
+    *,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    maintenance_type: Optional[str],
+) -> MaintenanceReportResponse:
+    rows = _report_rows_query(
+        db,
+        from_date=from_date,
+        to_date=to_date,
+        maintenance_type=maintenance_type,
+    ).all()
 
     items = [
         MaintenanceReportRow(
-            computer_id=computer.id,
-            computer_name=computer.name,
-            patrimonio=computer.patrimonio,
-            technician=mh.technician,
-            maintenance_type=mh.maintenance_type,
-            performed_at=mh.performed_at,
+            computer_id=r[0],
+            computer_name=r[1],
+            patrimonio=r[2],
+            technician=r[3],
+            maintenance_type=r[4],
+            performed_at=r[5],
         )
-        for (mh, computer) in rows
+        for r in rows
     ]
 
     return MaintenanceReportResponse(items=items, total=len(items))
+
+
+def encode_cursor(performed_at: datetime, maintenance_id: int) -> str:
+    raw = json.dumps({"p": performed_at.isoformat(), "i": int(maintenance_id)})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(cursor + pad).decode("utf-8"))
+        return datetime.fromisoformat(data["p"]), int(data["i"])
+    except Exception as e:
+        raise ValueError("cursor inválido") from e
+
+
+def get_maintenance_report_page(
+    db: Session,
+    *,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    maintenance_type: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+) -> MaintenanceReportPage:
+    """Uma página do relatório por keyset em (performed_at DESC, id DESC).
+
+    O custo por página é constante: a consulta começa direto no ponto do cursor
+    (range em idx_maintenance_type_date_id, ou idx_maintenance_date_id quando o
+    tipo é "ambas") em vez de pular OFFSET linhas.
+    Levanta ValueError para cursor inválido.
+    """
+    query = _report_rows_query(
+        db,
+        from_date=from_date,
+        to_date=to_date,
+        maintenance_type=maintenance_type,
+    )
+    if cursor:
+        after_at, after_id = decode_cursor(cursor)
+        query = query.filter(
+            MaintenanceHistory.performed_at <= after_at,
+            or_(
+                MaintenanceHistory.performed_at < after_at,
+                and_(MaintenanceHistory.performed_at == after_at, MaintenanceHistory.id < after_id),
+            ),
+        )
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [
+        MaintenanceReportRow(
+            computer_id=r[0],
+            computer_name=r[1],
+            patrimonio=r[2],
+            technician=r[3],
+            maintenance_type=r[4],
+            performed_at=r[5],
+        )
+        for r in rows
+    ]
+    next_cursor = encode_cursor(rows[-1][5], rows[-1][6]) if has_more and rows else None
+    return MaintenanceReportPage(items=items, limit=limit, next_cursor=next_cursor)
+
+
+def count_maintenance_report(
+    db: Session,
+    *,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    maintenance_type: Optional[str],
+) -> int:
+    query = db.query(func.count(MaintenanceHistory.id)).join(
+        Computer, Computer.id == MaintenanceHistory.computer_id
+    )
+    query = _apply_report_filters(
+        query,
+        from_date=from_date,
+        to_date=to_date,
+        maintenance_type=maintenance_type,
+    )
+    return int(query.scalar() or 0)
+
+
+def iter_maintenance_report_rows(
+    *,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    maintenance_type: Optional[str],
+) -> Iterator[Dict[str, Any]]:
+    """Linhas do relatório lidas com cursor no servidor (`stream_results` + `yield_per`).
+
+    Abre a própria sessão: o gerador é consumido pelo StreamingResponse depois que
+    a sessão de `get_db` já foi fechada.
+    """
+    db = SessionLocal()
+    try:
+        query = _report_rows_query(
+            db,
+            from_date=from_date,
+            to_date=to_date,
+            maintenance_type=maintenance_type,
+        ).execution_options(stream_results=True).yield_per(_STREAM_BATCH)
+        for r in query:
+            yield _row_dict(r)
+    finally:
+        db.close()
+
+
+def stream_report_json(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    """Mesmo formato de MaintenanceReportResponse, gerado aos poucos.
+
+    `total` vai no final (trailer), então não precisa de um COUNT antes.
+    """
+    total = 0
+    parts = ['{"items":[']
+    size = 0
+    for row in rows:
+        line = ("," if total else "") + json.dumps(row, ensure_ascii=False)
+        parts.append(line)
+        size += len(line)
+        total += 1
+        if size >= _CHUNK_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+            size = 0
+    parts.append(f'],"total":{total}}}')
+    yield "".join(parts).encode("utf-8")
+
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def encode_report_rows(fmt: str, rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    if fmt == "csv":
+        return stream_csv(rows, REPORT_COLUMNS)
+    if fmt == "ndjson":
+        return stream_ndjson(rows)
+    if fmt == "xlsx":
+        return stream_xlsx(rows, REPORT_COLUMNS, sheet_name="Manutenções")
+    return stream_report_json(rows)
+
+
+def stream_maintenance_report(
+    fmt: str,
+    *,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    maintenance_type: Optional[str],
+) -> Iterator[bytes]:
+    rows = iter_maintenance_report_rows(
+        from_date=from_date,
+        to_date=to_date,
+        maintenance_type=maintenance_type,
+    )
+    return encode_report_rows(fmt, rows)
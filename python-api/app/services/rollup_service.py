@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Computer, MaintenanceDailyRollup, MaintenanceHistory
+
+
+# (dia, tipo, entidade, técnico) — entidade/técnico vazios viram "".
+RollupKey = Tuple[date, str, str, str]
+
+
+def rollup_key(
+    performed_at: datetime,
+    maintenance_type: str,
+    entity: Optional[str],
+    technician: Optional[str],
+) -> RollupKey:
+    return (performed_at.date(), maintenance_type, entity or "", technician or "")
+
+
+def _key_filter(key: RollupKey):
+    day, mtype, entity, technician = key
+    return (
+        MaintenanceDailyRollup.day == day,
+        MaintenanceDailyRollup.maintenance_type == mtype,
+        MaintenanceDailyRollup.entity == entity,
+        MaintenanceDailyRollup.technician == technician,
+    )
+
+
+def apply_rollup_delta(db: Session, deltas: Dict[RollupKey, int]) -> None:
+    """Soma `deltas` nas linhas do rollup, na transação corrente (sem commit).
+
+    UPDATE relativo primeiro; se a linha não existe, INSERT num savepoint (outro
+    processo pode ter criado a mesma chave no meio tempo, aí repete o UPDATE).
+    Linhas que chegam a zero são removidas.
+    """
+    now = datetime.utcnow()
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        updated = (
+            db.query(MaintenanceDailyRollup)
+            .filter(*_key_filter(key))
+            .update(
+                {
+                    MaintenanceDailyRollup.maintenance_count: MaintenanceDailyRollup.maintenance_count + delta,
+                    MaintenanceDailyRollup.updated_at: now,
+                },
+                synchronize_session=False,
+            )
+        )
+        if updated:
+            if delta < 0:
+                db.query(MaintenanceDailyRollup).filter(
+                    *_key_filter(key), MaintenanceDailyRollup.maintenance_count <= 0
+                ).delete(synchronize_session=False)
+            continue
+        if delta < 0:
+            # Rollup já divergente (ex.: antes do rebuild); o verificador aponta.
+            continue
+
+        day, mtype, entity, technician = key
+        try:
+            with db.begin_nested():
+                db.execute(
+                    insert(MaintenanceDailyRollup).values(
+                        day=day,
+                        maintenance_type=mtype,
+                        entity=entity,
+                        technician=technician,
+                        maintenance_count=delta,
+                        updated_at=now,
+                    )
+                )
+        except IntegrityError:
+            db.query(MaintenanceDailyRollup).filter(*_key_filter(key)).update(
+                {MaintenanceDailyRollup.maintenance_count: MaintenanceDailyRollup.maintenance_count + delta},
+                synchronize_session=False,
+            )
+
+
+def record_delta(
+    deltas: Dict[RollupKey, int],
+    record: MaintenanceHistory,
+    entity: Optional[str],
+    sign: int,
+) -> None:
+    key = rollup_key(record.performed_at, record.maintenance_type, entity, record.technician)
+    deltas[key] = deltas.get(key, 0) + sign
+
+
+def move_computer_entity(db: Session, computer_id: int, old_entity: Optional[str], new_entity: Optional[str]) -> None:
+    """O sync trocou a entidade de um computador: move as contagens dele (sem commit)."""
+    if (old_entity or "") == (new_entity or ""):
+        return
+    rows = (
+        db.query(MaintenanceHistory.performed_at, MaintenanceHistory.maintenance_type, MaintenanceHistory.technician)
+        .filter(MaintenanceHistory.computer_id == computer_id)
+        .all()
+    )
+    if not rows:
+        return
+    deltas: Dict[RollupKey, int] = Counter()
+    for performed_at, mtype, technician in rows:
+        deltas[rollup_key(performed_at, mtype, old_entity, technician)] -= 1
+        deltas[rollup_key(performed_at, mtype, new_entity, technician)] += 1
+    apply_rollup_delta(db, deltas)
+
+
+def _raw_grouped_query(db: Session):
+    day = func.date(MaintenanceHistory.performed_at)
+    entity = func.coalesce(Computer.entity, "")
+    technician = func.coalesce(MaintenanceHistory.technician, "")
+    return (
+        db.query(day, MaintenanceHistory.maintenance_type, entity, technician, func.count(MaintenanceHistory.id))
+        .join(Computer, Computer.id == MaintenanceHistory.computer_id)
+        .group_by(day, MaintenanceHistory.maintenance_type, entity, technician)
+    )
+
+
+def rebuild_rollup(db: Session) -> int:
+    """Recria o rollup inteiro a partir de maintenance_history (um INSERT ... SELECT)."""
+    db.query(MaintenanceDailyRollup).delete(synchronize_session=False)
+    select_stmt = _raw_grouped_query(db).add_columns(func.now()).statement
+    db.execute(
+        insert(MaintenanceDailyRollup).from_select(
+            ["day", "maintenance_type", "entity", "technician", "maintenance_count", "updated_at"],
+            select_stmt,
+        )
+    )
+    db.commit()
+    return int(db.query(func.count()).select_from(MaintenanceDailyRollup).scalar() or 0)
+
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def verify_rollup(db: Session, *, max_diffs: int = 50) -> List[Dict[str, object]]:
+    """Compara o rollup com a contagem direta; retorna as chaves divergentes."""
+    raw = {
+        (_as_date(d), t, e, tech): int(n)
+        for d, t, e, tech, n in _raw_grouped_query(db).all()
+    }
+    stored = {
+        (r.day, r.maintenance_type, r.entity or "", r.technician or ""): int(r.maintenance_count or 0)
+        for r in db.query(MaintenanceDailyRollup).all()
+    }
+    diffs = []
+    for key in sorted(set(raw) | set(stored)):
+        if raw.get(key, 0) != stored.get(key, 0):
+            day, mtype, entity, technician = key
+            diffs.append(
+                {
+                    "day": day.isoformat(),
+                    "maintenance_type": mtype,
+                    "entity": entity,
+                    "technician": technician,
+                    "rollup": stored.get(key, 0),
+                    "raw": raw.get(key, 0),
+                }
+            )
+            if len(diffs) >= max_diffs:
+                break
+    return diffs
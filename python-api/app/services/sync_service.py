@@ -12,6 +12,11 @@ from app.core.database import SessionLocal
 from app.integrations.glpi_client import GlpiClient
 from app.models import Computer, ComputerComponent
 from app.schemas.schemas import SyncResult, SyncStatus
+from app.services.dashboard_service import invalidate_dashboard_cache
+from app.services.dashboard_snapshot_service import apply_snapshot_delta
+from app.services.report_cache_service import clear_report_cache
+from app.services.rollup_service import move_computer_entity
+from app.services.version_service import SCOPE_COMPONENTS, SCOPE_COMPUTERS, SCOPE_REPORT_NAMES, bump_versions
 
 
 logger = logging.getLogger(__name__)
@@ -100,6 +105,11 @@ async def sync_glpi_computers_impl(db: Session) -> SyncResult:
             if not computers_data:
                 break
 
+            # Computadores novos nesta página (entram como Pendente no dashboard).
+            new_in_page = 0
+            # Nome/patrimônio aparecem no relatório de manutenções (cache de resultados).
+            report_fields_changed = False
+
             for comp_data in computers_data:
                 glpi_id_raw = comp_data.get("id")
                 if glpi_id_raw is None:
@@ -117,9 +127,16 @@ async def sync_glpi_computers_impl(db: Session) -> SyncResult:
                     computer = Computer(glpi_id=glpi_id)
                     db.add(computer)
 
+                old_entity = computer.entity
+                old_report_fields = (computer.name, computer.patrimonio)
                 computer.name = (comp_data.get("name") or f"Computer-{glpi_id}")
                 computer.entity = _dropdown_str(comp_data.get("entities_id"))
+                if computer.id is not None:
+                    # Rollup agrupa pela entidade atual: move as contagens junto.
+                    move_computer_entity(db, computer.id, old_entity, computer.entity)
                 computer.patrimonio = _dropdown_str(comp_data.get("otherserial"))
+                if computer.id is not None and old_report_fields != (computer.name, computer.patrimonio):
+                    report_fields_changed = True
                 computer.serial = _dropdown_str(comp_data.get("serial"))
                 computer.location = _dropdown_str(comp_data.get("locations_id"))
                 computer.status = _dropdown_str(comp_data.get("states_id"))
@@ -129,9 +146,12 @@ async def sync_glpi_computers_impl(db: Session) -> SyncResult:
                 if computer.id is None:
                     try:
                         db.flush()
+                        new_in_page += 1
                     except IntegrityError:
                         # Another process/thread may have inserted the same glpi_id concurrently.
+                        # O rollback desfaz também os inserts anteriores desta página.
                         db.rollback()
+                        new_in_page = 0
                         computer = (
                             db.query(Computer)
                             .filter(Computer.glpi_id == glpi_id)
@@ -169,7 +189,18 @@ async def sync_glpi_computers_impl(db: Session) -> SyncResult:
                 except Exception as e:
                     logger.error(f"Erro ao sincronizar componentes do computer {glpi_id}: {e}")
 
+            if new_in_page:
+                apply_snapshot_delta(db, new_computers=new_in_page)
+            # report:names só quando nome/patrimônio mudou: o cache de relatórios dos
+            # outros workers não perde nada em sync que não altera o que ele mostra.
+            scopes = [SCOPE_COMPUTERS, SCOPE_COMPONENTS]
+            if report_fields_changed:
+                scopes.append(SCOPE_REPORT_NAMES)
+            bump_versions(db, *scopes)
             db.commit()
+            invalidate_dashboard_cache()
+            if report_fields_changed:
+                clear_report_cache()
 
             if len(computers_data) < limit:
                 break
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import threading
+import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
-from app.core.passwords import hash_password, verify_password
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.passwords import hash_password, verify_password_async
+from app.core.rate_limit import SlidingWindowCounter
 from app.models import User
+from app.services.version_service import SCOPE_USERS, bump_versions, get_versions
 
 
 ROLE_ADMIN = "admin"
@@ -15,6 +21,25 @@ ROLE_AUDITOR = "auditor"
 ROLE_USER = "user"
 
 
+# username -> (principal, users.version). Por worker; ver get_principal().
+_principal_cache = TTLCache(
+    ttl_seconds=int(getattr(settings, "USER_PRINCIPAL_CACHE_TTL_SECONDS", 300) or 300),
+    max_entries=int(getattr(settings, "USER_PRINCIPAL_CACHE_MAX_ENTRIES", 1024) or 1024),
+)
+_users_version: Dict[str, Any] = {"value": None, "checked_at": None}
+_users_version_lock = threading.Lock()
+# username -> menor token_version aceito (só usuários com token_version > 0).
+_token_floor: Dict[str, int] = {}
+
+_login_window = int(getattr(settings, "LOGIN_FAILURE_WINDOW_SECONDS", 300) or 300)
+_failures_by_user = SlidingWindowCounter(
+    limit=int(getattr(settings, "LOGIN_MAX_FAILURES_PER_USER", 5) or 5), window_seconds=_login_window
+)
+_failures_by_ip = SlidingWindowCounter(
+    limit=int(getattr(settings, "LOGIN_MAX_FAILURES_PER_IP", 30) or 30), window_seconds=_login_window
+)
+
+
 def role_defaults(role: str) -> Dict[str, bool]:
     if role == ROLE_ADMIN:
         return {
@@ -54,6 +79,7 @@ def ensure_default_admin(db: Session) -> User:
         **defaults,
     )
     db.add(u)
+    bump_versions(db, SCOPE_USERS)
     db.commit()
     db.refresh(u)
     return u
@@ -63,12 +89,27 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
 
-def authenticate_local(db: Session, username: str, password: str) -> User:
+def login_retry_after(username: str, ip: str) -> float:
+    """Segundos até liberar novas tentativas para o usuário/IP (0 = liberado)."""
+    return max(_failures_by_user.retry_after(username.lower()), _failures_by_ip.retry_after(ip))
+
+
+def record_login_failure(username: str, ip: str) -> None:
+    _failures_by_user.hit(username.lower())
+    _failures_by_ip.hit(ip)
+
+
+def record_login_success(username: str) -> None:
+    _failures_by_user.reset(username.lower())
+
+
+async def authenticate_local(db: Session, username: str, password: str) -> User:
     user = get_user_by_username(db, username)
     if not user or not user.password_hash:
         raise HTTPException(status_code=401, detail="Usuário ou senha inválidos")
 
-    if not verify_password(password, user.password_hash):
+    # PBKDF2 no pool de hash (app.core.passwords); pode levantar PasswordHashBusy.
+    if not await verify_password_async(password, user.password_hash):
         raise HTTPException(status_code=401, detail="Usuário ou senha inválidos")
 
     user.updated_at = datetime.utcnow()
@@ -98,16 +139,23 @@ def upsert_ldap_user(
             **defaults,
         )
         db.add(user)
+        bump_versions(db, SCOPE_USERS)
         db.commit()
         db.refresh(user)
+        invalidate_principal(username)
         return user
 
+    changed = (user.display_name, user.email, list(user.groups or [])) != (display_name, email, groups or [])
     user.display_name = display_name
     user.email = email
     user.groups = groups or []
     user.updated_at = datetime.utcnow()
+    if changed:
+        _bump_user(db, user)
     db.commit()
     db.refresh(user)
+    if changed:
+        invalidate_principal(username)
     return user
 
 
@@ -132,15 +180,25 @@ def update_user_access(
     if username == "admin" and role != ROLE_ADMIN:
         raise HTTPException(status_code=400, detail="O usuário admin não pode perder o papel de administrador")
 
+    before = (user.role, user.can_add_note, user.can_add_maintenance, user.can_generate_report, user.can_manage_permissions)
     user.role = role
     user.can_add_note = bool(can_add_note)
     user.can_add_maintenance = bool(can_add_maintenance)
     user.can_generate_report = bool(can_generate_report)
     user.can_manage_permissions = bool(can_manage_permissions)
     user.updated_at = datetime.utcnow()
+    _bump_user(db, user)
+    after = (user.role, user.can_add_note, user.can_add_maintenance, user.can_generate_report, user.can_manage_permissions)
+    # Tokens sem estado carregam as permissões antigas: obriga novo login.
+    revoke = bool(settings.AUTH_STATELESS_TOKENS) and before != after
+    if revoke:
+        user.token_version = int(user.token_version or 0) + 1
 
     db.commit()
     db.refresh(user)
+    invalidate_principal(username)
+    if revoke:
+        _token_floor[username] = int(user.token_version)
     return user
 
 
@@ -158,3 +216,102 @@ def to_user_dict(user: User) -> Dict[str, Any]:
             "manage_permissions": bool(user.can_manage_permissions),
         },
     }
+
+
+def _bump_user(db: Session, user: User) -> None:
+    # Versão do usuário + escopo `users`: os outros workers notam na próxima conferência.
+    user.version = int(user.version or 0) + 1
+    bump_versions(db, SCOPE_USERS)
+
+
+def _principal(user: User) -> Dict[str, Any]:
+    principal = to_user_dict(user)
+    principal["sub"] = principal.pop("username")
+    return principal
+
+
+def invalidate_principal(username: Optional[str] = None) -> None:
+    """Remove o principal do cache deste worker (todos quando username=None)."""
+    if username is None:
+        _principal_cache.clear()
+    else:
+        _principal_cache.pop(username)
+
+
+def _check_users_version(db: Session) -> None:
+    """Descarta principals alterados por outros workers.
+
+    Só consulta o banco a cada USER_PRINCIPAL_VERSION_CHECK_SECONDS (uma linha de
+    data_versions). Se a versão de `users` mudou, compara users.version dos
+    usuários em cache e remove só os que mudaram.
+
+    A leitura da versão e a recarga do mapa de revogação acontecem sob o lock:
+    quem chega durante a conferência espera por ela (inclusive a primeira após o
+    startup), em vez de seguir com `_token_floor` ainda vazio ou antigo.
+    """
+    global _token_floor
+    interval = float(getattr(settings, "USER_PRINCIPAL_VERSION_CHECK_SECONDS", 5) or 5)
+    with _users_version_lock:
+        now = time.monotonic()
+        checked_at = _users_version["checked_at"]
+        if checked_at is not None and now - checked_at < interval:
+            return
+        current = get_versions(db, SCOPE_USERS)[SCOPE_USERS]
+        previous = _users_version["value"]
+        if previous != current:
+            # Mapa de revogação: poucas linhas (só quem já fez logout ou perdeu permissões).
+            # Dict novo trocado de uma vez: quem lê sem o lock vê o antigo ou o novo.
+            _token_floor = {
+                u: int(v) for u, v in db.query(User.username, User.token_version).filter(User.token_version > 0).all()
+            }
+        _users_version["value"] = current
+        # Só depois da recarga: se a consulta falhar, a próxima requisição tenta de novo.
+        _users_version["checked_at"] = now
+
+    if previous is None or previous == current:
+        return
+
+    cached = {}
+    for username in _principal_cache.keys():
+        entry = _principal_cache.get(username)
+        if entry is not None:
+            cached[username] = entry[1]
+    if not cached:
+        return
+    fresh = dict(db.query(User.username, User.version).filter(User.username.in_(list(cached))).all())
+    for username, version in cached.items():
+        if fresh.get(username) != version:
+            _principal_cache.pop(username)
+
+
+def get_principal(db: Session, username: str) -> Optional[Dict[str, Any]]:
+    """Usuário resolvido para get_current_user, servido do cache na maioria das requisições."""
+    _check_users_version(db)
+    entry = _principal_cache.get(username)
+    if entry is None:
+        user = get_user_by_username(db, username)
+        if not user:
+            return None
+        entry = (_principal(user), int(user.version or 0))
+        _principal_cache.set(username, entry)
+    principal = entry[0]
+    # Cópia: quem recebe pode alterar o dict sem afetar o cache.
+    return {**principal, "groups": list(principal["groups"]), "permissions": dict(principal["permissions"])}
+
+
+def token_is_current(db: Session, username: str, token_version: int) -> bool:
+    """Token ainda válido? Lê só o mapa em memória (atualizado junto com a versão de `users`)."""
+    _check_users_version(db)
+    return int(token_version or 0) >= _token_floor.get(username, 0)
+
+
+def revoke_tokens(db: Session, username: str) -> int:
+    """Invalida todos os tokens já emitidos para o usuário (logout). Retorna a nova versão."""
+    user = get_user_by_username(db, username)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    user.token_version = int(user.token_version or 0) + 1
+    bump_versions(db, SCOPE_USERS)
+    db.commit()
+    _token_floor[username] = int(user.token_version)
+    return int(user.token_version)
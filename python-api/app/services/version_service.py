@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import DataVersion
+
+
+SCOPE_COMPUTERS = "computers"
+SCOPE_COMPONENTS = "components"
+SCOPE_MAINTENANCE = "maintenance"
+SCOPE_NOTES = "notes"
+# Qualquer mudança em users (sinal entre workers para o cache de principals).
+SCOPE_USERS = "users"
+
+ALL_SCOPES = (SCOPE_COMPUTERS, SCOPE_COMPONENTS, SCOPE_MAINTENANCE, SCOPE_NOTES, SCOPE_USERS)
+
+# Cache de relatórios: um escopo por mês/tipo ("report:2026-10:Corretiva"), criado
+# na primeira escrita do mês, e um para nome/patrimônio dos computadores.
+REPORT_SCOPE_PREFIX = "report:"
+SCOPE_REPORT_NAMES = "report:names"
+
+
+def ensure_data_versions(db: Session) -> None:
+    """Cria as linhas de versão que ainda não existem (roda no startup)."""
+    existing = {s for (s,) in db.query(DataVersion.scope).all()}
+    missing = [s for s in ALL_SCOPES if s not in existing]
+    if not missing:
+        return
+    now = datetime.utcnow()
+    for scope in missing:
+        db.add(DataVersion(scope=scope, version=0, updated_at=now))
+    db.commit()
+
+
+def bump_versions(db: Session, *scopes: str) -> None:
+    """Incrementa a versão dos escopos na transação corrente (sem commit).
+
+    O commit fica a cargo de quem fez a escrita, assim a versão só muda
+    junto com os dados.
+    """
+    now = datetime.utcnow()
+    for scope in scopes:
+        updated = (
+            db.query(DataVersion)
+            .filter(DataVersion.scope == scope)
+            .update(
+                {DataVersion.version: DataVersion.version + 1, DataVersion.updated_at: now},
+                synchronize_session=False,
+            )
+        )
+        if not updated:
+            # Escopo novo (ex.: primeiro registro do mês). INSERT IGNORE + UPDATE em vez
+            # de add(): dois workers criando a mesma linha não derrubam a escrita.
+            db.execute(
+                insert(DataVersion)
+                .values(scope=scope, version=0, updated_at=now)
+                .prefix_with("IGNORE", dialect="mysql")
+                .prefix_with("OR IGNORE", dialect="sqlite")
+            )
+            db.query(DataVersion).filter(DataVersion.scope == scope).update(
+                {DataVersion.version: DataVersion.version + 1, DataVersion.updated_at: now},
+                synchronize_session=False,
+            )
+
+
+def get_versions(db: Session, *scopes: str) -> Dict[str, int]:
+    rows = db.query(DataVersion.scope, DataVersion.version).filter(DataVersion.scope.in_(scopes)).all()
+    versions = {s: 0 for s in scopes}
+    for scope, version in rows:
+        versions[scope] = int(version or 0)
+    return versions
+
+
+def get_versions_with_prefix(db: Session, prefix: str) -> Dict[str, int]:
+    # Range scan na PK (scope).
+    rows = db.query(DataVersion.scope, DataVersion.version).filter(DataVersion.scope.startswith(prefix)).all()
+    return {scope: int(version or 0) for scope, version in rows}
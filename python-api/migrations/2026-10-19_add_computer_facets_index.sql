@@ -0,0 +1,3 @@
+-- Índice para /api/devices/facets: o GROUP BY (entity, location, status, next_maintenance)
+-- é resolvido só pelo índice, sem ler as linhas (glpi_data JSON) da tabela.
+CREATE INDEX idx_computer_facets ON computers (entity, location, status, next_maintenance);
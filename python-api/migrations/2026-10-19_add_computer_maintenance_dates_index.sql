@@ -0,0 +1,2 @@
+-- Dashboard: as contagens por next_maintenance/last_maintenance passam a ler só o índice.
+CREATE INDEX idx_computer_maint_dates ON computers (next_maintenance, last_maintenance);
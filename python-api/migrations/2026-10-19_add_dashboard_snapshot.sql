@@ -0,0 +1,28 @@
+-- Contadores do dashboard mantidos incrementalmente + série diária.
+-- A linha id=1 é criada/recalculada pela aplicação na primeira leitura
+-- (ou via: python python-api/tools/roll_dashboard_snapshot.py --rebuild).
+CREATE TABLE IF NOT EXISTS dashboard_snapshot (
+  id INT NOT NULL PRIMARY KEY,
+  total_computers INT NOT NULL DEFAULT 0,
+  preventive_done_computers INT NOT NULL DEFAULT 0,
+  status_ok_computers INT NOT NULL DEFAULT 0,
+  status_late_computers INT NOT NULL DEFAULT 0,
+  status_pending_computers INT NOT NULL DEFAULT 0,
+  corrective_done_total INT NOT NULL DEFAULT 0,
+  corrective_done_computers INT NOT NULL DEFAULT 0,
+  rolled_at DATETIME NOT NULL,
+  updated_at DATETIME NULL
+);
+
+CREATE TABLE IF NOT EXISTS dashboard_snapshot_history (
+  snapshot_date DATE NOT NULL PRIMARY KEY,
+  total_computers INT NOT NULL DEFAULT 0,
+  preventive_done_computers INT NOT NULL DEFAULT 0,
+  status_ok_computers INT NOT NULL DEFAULT 0,
+  status_late_computers INT NOT NULL DEFAULT 0,
+  status_pending_computers INT NOT NULL DEFAULT 0,
+  corrective_done_total INT NOT NULL DEFAULT 0,
+  corrective_done_computers INT NOT NULL DEFAULT 0,
+  created_at DATETIME NULL,
+  updated_at DATETIME NULL
+);
@@ -0,0 +1,13 @@
+-- Contadores de versão por escopo (ETag/304 nos endpoints de leitura).
+-- Incrementados pela aplicação na mesma transação das escritas (sync, manutenção, notas).
+CREATE TABLE IF NOT EXISTS data_versions (
+  scope VARCHAR(50) NOT NULL PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO data_versions (scope, version) VALUES
+  ('computers', 0),
+  ('components', 0),
+  ('maintenance', 0),
+  ('notes', 0);
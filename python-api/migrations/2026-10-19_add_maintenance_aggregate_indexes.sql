@@ -0,0 +1,6 @@
+-- /api/reports/aggregates
+-- Produtividade por técnico/mês: range em performed_at coberto (substitui idx_maintenance_performed_type).
+CREATE INDEX idx_maintenance_performed_type_tech ON maintenance_history (performed_at, maintenance_type, technician);
+DROP INDEX idx_maintenance_performed_type ON maintenance_history;
+-- Intervalo entre corretivas: LAG(performed_at) OVER (PARTITION BY computer_id ORDER BY performed_at).
+CREATE INDEX idx_maintenance_computer_type_date ON maintenance_history (computer_id, maintenance_type, performed_at);
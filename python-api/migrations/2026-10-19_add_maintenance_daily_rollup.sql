@@ -0,0 +1,19 @@
+-- Contagem de manutenções por dia/tipo/entidade/técnico, mantida pelas escritas de manutenção
+-- e pelo sync (troca de entidade). Lida por /api/dashboard/trends e /api/reports/aggregates.
+-- Recriar/verificar: python python-api/tools/rebuild_maintenance_rollup.py [--verify]
+CREATE TABLE IF NOT EXISTS maintenance_daily_rollup (
+  day DATE NOT NULL,
+  maintenance_type VARCHAR(20) NOT NULL,
+  entity VARCHAR(255) NOT NULL DEFAULT '',
+  technician VARCHAR(255) NOT NULL DEFAULT '',
+  maintenance_count INT NOT NULL DEFAULT 0,
+  updated_at DATETIME NULL,
+  PRIMARY KEY (day, maintenance_type, entity, technician)
+);
+
+-- Carga inicial
+INSERT INTO maintenance_daily_rollup (day, maintenance_type, entity, technician, maintenance_count, updated_at)
+SELECT DATE(m.performed_at), m.maintenance_type, COALESCE(c.entity, ''), COALESCE(m.technician, ''), COUNT(*), NOW()
+FROM maintenance_history m
+JOIN computers c ON c.id = m.computer_id
+GROUP BY DATE(m.performed_at), m.maintenance_type, COALESCE(c.entity, ''), COALESCE(m.technician, '');
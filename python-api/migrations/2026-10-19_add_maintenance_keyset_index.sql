@@ -0,0 +1,5 @@
+-- Paginação por cursor do relatório: (maintenance_type, performed_at, id) + computer_id para o join.
+-- idx_maintenance_type_date (maintenance_type, performed_at) fica redundante e pode ser removido.
+CREATE INDEX idx_maintenance_type_date_id ON maintenance_history (maintenance_type, performed_at, id, computer_id);
+-- Mesma paginação sem filtro de tipo (ambas): sem este índice o MySQL faz filesort do resto do período.
+CREATE INDEX idx_maintenance_date_id ON maintenance_history (performed_at, id, computer_id);
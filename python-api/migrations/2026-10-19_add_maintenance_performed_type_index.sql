@@ -0,0 +1,2 @@
+-- /api/dashboard/trends: range em performed_at sem filtro de tipo.
+CREATE INDEX idx_maintenance_performed_type ON maintenance_history (performed_at, maintenance_type);
@@ -0,0 +1,16 @@
+-- Arquivo dos acompanhamentos enviados (retenção da outbox: tools/purge_glpi_outbox.py)
+CREATE TABLE IF NOT EXISTS glpi_followup_outbox_archive (
+  id INT NOT NULL PRIMARY KEY,
+  maintenance_id INT NULL,
+  ticket_id INT NOT NULL,
+  content TEXT NOT NULL,
+  attempts INT NOT NULL DEFAULT 0,
+  created_at DATETIME NOT NULL,
+  sent_at DATETIME NULL,
+  archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  INDEX ix_glpi_followup_outbox_archive_maintenance_id (maintenance_id),
+  INDEX ix_glpi_followup_outbox_archive_ticket_id (ticket_id)
+);
+
+-- Corte da retenção por data de envio (status = 'sent' AND sent_at < ?).
+CREATE INDEX idx_outbox_status_sent ON glpi_followup_outbox (status, sent_at);
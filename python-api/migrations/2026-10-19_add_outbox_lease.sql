@@ -0,0 +1,4 @@
+-- Reserva de itens do outbox por worker (SELECT ... FOR UPDATE SKIP LOCKED + lease).
+ALTER TABLE glpi_followup_outbox
+  ADD COLUMN locked_by VARCHAR(100) NULL,
+  ADD COLUMN locked_until DATETIME NULL;
@@ -0,0 +1,4 @@
+-- Retentativas do outbox com backoff (next_attempt_at) e status `dead` após N falhas.
+ALTER TABLE glpi_followup_outbox ADD COLUMN next_attempt_at DATETIME NULL;
+UPDATE glpi_followup_outbox SET next_attempt_at = created_at WHERE next_attempt_at IS NULL;
+CREATE INDEX idx_outbox_status_next ON glpi_followup_outbox (status, next_attempt_at);
@@ -0,0 +1,22 @@
+-- Fila de relatórios em background (processada por python-api/tools/report_worker.py)
+CREATE TABLE IF NOT EXISTS report_jobs (
+  id INT AUTO_INCREMENT PRIMARY KEY,
+  params_hash VARCHAR(64) NOT NULL,
+  report_type VARCHAR(50) NOT NULL DEFAULT 'maintenance',
+  params JSON NOT NULL,
+  format VARCHAR(10) NOT NULL,
+  status VARCHAR(20) NOT NULL DEFAULT 'pending',
+  rows_total INT NULL,
+  rows_done INT NOT NULL DEFAULT 0,
+  file_path VARCHAR(500) NULL,
+  file_size BIGINT NULL,
+  error TEXT NULL,
+  requested_by VARCHAR(255) NULL,
+  worker VARCHAR(100) NULL,
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  started_at DATETIME NULL,
+  finished_at DATETIME NULL,
+  updated_at DATETIME NULL,
+  INDEX ix_report_jobs_params_hash (params_hash),
+  INDEX idx_report_jobs_status_created (status, created_at)
+);
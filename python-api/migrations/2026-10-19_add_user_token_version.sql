@@ -0,0 +1,2 @@
+-- Revogação de tokens (logout / mudança de permissões com AUTH_STATELESS_TOKENS=true).
+ALTER TABLE users ADD COLUMN token_version INT NOT NULL DEFAULT 0;
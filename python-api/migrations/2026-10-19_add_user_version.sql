@@ -0,0 +1,4 @@
+-- Versão por usuário + escopo `users` em data_versions (cache de principals em get_current_user).
+ALTER TABLE users ADD COLUMN version BIGINT NOT NULL DEFAULT 0;
+
+INSERT IGNORE INTO data_versions (scope, version) VALUES ('users', 0);
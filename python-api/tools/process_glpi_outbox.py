@@ -1,24 +1,159 @@
+"""Envio da outbox de acompanhamentos do GLPI.
+
+Sem argumentos processa um lote e sai (cron). Com --daemon fica em loop:
+consulta a fila de novo imediatamente enquanto houver trabalho e vai espaçando
+o polling até GLPI_OUTBOX_DAEMON_MAX_INTERVAL_SECONDS quando ela está vazia.
+SIGTERM/SIGINT terminam o lote em andamento antes de sair.
+
+Uso:
+  python python-api/tools/process_glpi_outbox.py                # um lote e sai
+  python python-api/tools/process_glpi_outbox.py --daemon
+  python python-api/tools/process_glpi_outbox.py --daemon --batch 50 --max-interval 60
+"""
+
+import argparse
 import asyncio
-import os
+import logging
+import signal
 import sys
+import time
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+from app.core.config import settings  # noqa: E402
 from app.core.database import SessionLocal  # noqa: E402
-from app.services.glpi_outbox_service import process_pending  # noqa: E402
+from app.services.glpi_outbox_service import outbox_stats, process_pending  # noqa: E402
+
+
+logger = logging.getLogger("outbox_daemon")
+
+
+class _Metrics:
+    """Contadores da janela atual (zerados a cada linha de métricas)."""
 
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.batches = 0
+        self.processed = 0
+        self.sent = 0
+        self.failed = 0
+        self.posts = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.errors = 0
+
+    def add(self, result: dict) -> None:
+        self.batches += 1
+        self.processed += result["processed"]
+        self.sent += result["sent"]
+        self.failed += result["failed"]
+        self.posts += result["posts"]
+        self.seconds += result["seconds"]
+        self.max_seconds = max(self.max_seconds, result["seconds"])
+
+    def line(self, stats: dict) -> str:
+        error_rate = self.failed / self.processed if self.processed else 0.0
+        avg_batch = self.seconds / self.batches if self.batches else 0.0
+        return (
+            f"pending={stats['pending']} due={stats['due']} dead={stats['dead']} "
+            f"oldest_pending_age={stats['oldest_pending_age_seconds']}s "
+            f"sent={self.sent} failed={self.failed} error_rate={error_rate:.1%} posts={self.posts} "
+            f"batch_latency_avg={avg_batch:.2f}s batch_latency_max={self.max_seconds:.2f}s "
+            f"delivery_avg_1h={stats['avg_delivery_seconds_last_hour']}s loop_errors={self.errors}"
+        )
+
+
+async def _run_batch(limit: int) -> dict:
+    db = SessionLocal()
+    try:
+        return await process_pending(db, limit=limit)
+    finally:
+        db.close()
 
-async def main() -> None:
-    limit = int(os.getenv("GLPI_OUTBOX_PROCESS_BATCH_SIZE", "25"))
 
+def _queue_stats() -> dict:
     db = SessionLocal()
     try:
-        res = await process_pending(db, limit=limit)
-        print(res)
+        return outbox_stats(db)
     finally:
         db.close()
 
 
+async def _daemon(limit: int, min_interval: float, max_interval: float, metrics_every: float) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    metrics = _Metrics()
+    last_metrics = time.monotonic()
+    idle_wait = min_interval
+    logger.info("Daemon da outbox iniciado (lote=%s, intervalo %ss..%ss)", limit, min_interval, max_interval)
+
+    while not stop.is_set():
+        # O lote em andamento não é interrompido pelo sinal: os envios terminam e
+        # os resultados são gravados antes de sair (drain).
+        try:
+            result = await _run_batch(limit)
+            metrics.add(result)
+        except Exception:
+            logger.exception("Falha ao processar a outbox do GLPI")
+            metrics.errors += 1
+            result = None
+
+        if time.monotonic() - last_metrics >= metrics_every:
+            try:
+                logger.info(metrics.line(_queue_stats()))
+            except Exception:
+                logger.exception("Falha ao ler as métricas da outbox")
+            metrics.reset()
+            last_metrics = time.monotonic()
+
+        if result is not None and result["processed"] >= limit:
+            # Lote cheio: ainda há trabalho vencido, busca o próximo sem esperar.
+            idle_wait = min_interval
+            continue
+        if result is not None and result["processed"] > 0:
+            idle_wait = min_interval
+        else:
+            idle_wait = min(max_interval, idle_wait * 2)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=idle_wait)
+        except asyncio.TimeoutError:
+            pass
+
+    logger.info("Daemon da outbox encerrado")
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--daemon", action="store_true", help="fica em loop até SIGTERM/SIGINT")
+    parser.add_argument("--batch", type=int, default=int(settings.GLPI_OUTBOX_PROCESS_BATCH_SIZE or 25))
+    parser.add_argument(
+        "--min-interval", type=float, default=float(settings.GLPI_OUTBOX_DAEMON_MIN_INTERVAL_SECONDS or 1)
+    )
+    parser.add_argument(
+        "--max-interval", type=float, default=float(settings.GLPI_OUTBOX_DAEMON_MAX_INTERVAL_SECONDS or 30)
+    )
+    parser.add_argument(
+        "--metrics-every", type=float, default=float(settings.GLPI_OUTBOX_METRICS_LOG_SECONDS or 60)
+    )
+    args = parser.parse_args()
+
+    limit = max(1, args.batch)
+    if not args.daemon:
+        print(asyncio.run(_run_batch(limit)))
+        return 0
+
+    min_interval = max(0.1, args.min_interval)
+    asyncio.run(_daemon(limit, min_interval, max(min_interval, args.max_interval), max(1.0, args.metrics_every)))
+    return 0
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""Retenção da outbox de acompanhamentos do GLPI.
+
+Move (ou apaga) os itens enviados há mais de GLPI_OUTBOX_RETENTION_DAYS dias em
+lotes curtos, para a tabela quente guardar só pendentes e envios recentes.
+Agende 1x por dia (ex.: `30 2 * * *`).
+
+Uso:
+  python python-api/tools/purge_glpi_outbox.py                   # modo/dias do .env
+  python python-api/tools/purge_glpi_outbox.py --days 90 --mode delete
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.services.glpi_outbox_service import RETENTION_MODES, purge_sent  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=None, help="idade mínima (padrão: GLPI_OUTBOX_RETENTION_DAYS)")
+    parser.add_argument("--mode", choices=RETENTION_MODES, default=None, help="archive | delete")
+    parser.add_argument("--batch", type=int, default=None, help="linhas por lote/transação")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(purge_sent(db, older_than_days=args.days, mode=args.mode, batch_size=args.batch))
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
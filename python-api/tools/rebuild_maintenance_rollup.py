@@ -0,0 +1,42 @@
+"""Rollup diário de manutenções (maintenance_daily_rollup).
+
+As escritas de manutenção mantêm o rollup; use este script após importações
+diretas no banco ou se o verificador apontar divergência.
+
+Uso:
+  python python-api/tools/rebuild_maintenance_rollup.py           # recria a partir de maintenance_history
+  python python-api/tools/rebuild_maintenance_rollup.py --verify  # só compara rollup x tabela (sai 1 se divergir)
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.services.rollup_service import rebuild_rollup, verify_rollup  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verify", action="store_true", help="compara o rollup com maintenance_history e sai")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.verify:
+            diffs = verify_rollup(db)
+            for diff in diffs:
+                print(diff)
+            print("DIVERGENTE" if diffs else "OK: rollup consistente")
+            return 1 if diffs else 0
+        rows = rebuild_rollup(db)
+        print(f"Rollup recriado: {rows} linhas")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,111 @@
+"""Worker de relatórios em background (fila `report_jobs`).
+
+Roda fora do processo da API; cada processo do pool pega um job por vez.
+
+Uso:
+  python python-api/tools/report_worker.py               # REPORT_JOBS_WORKERS processos, contínuo
+  python python-api/tools/report_worker.py --workers 4
+  python python-api/tools/report_worker.py --once        # processa o que houver e sai
+"""
+
+import argparse
+import logging
+import multiprocessing
+import signal
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.services.report_job_service import (  # noqa: E402
+    claim_next_job,
+    evict_report_artifacts,
+    requeue_stale_jobs,
+    run_report_job,
+    worker_name,
+)
+
+
+logger = logging.getLogger("report_worker")
+
+_EVICT_EVERY_SECONDS = 300
+
+
+def _worker_loop(poll_seconds: int, once: bool) -> None:
+    # Conexões do pool não podem ser herdadas do processo pai.
+    engine.dispose()
+
+    stopping = {"flag": False}
+
+    def _stop(_signum, _frame):
+        stopping["flag"] = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    name = worker_name()
+    last_evict = 0.0
+    while not stopping["flag"]:
+        db = SessionLocal()
+        try:
+            if time.monotonic() - last_evict >= _EVICT_EVERY_SECONDS:
+                requeue_stale_jobs(db)
+                evicted = evict_report_artifacts(db)
+                if evicted:
+                    logger.info("%s: %s artefatos removidos", name, evicted)
+                last_evict = time.monotonic()
+
+            job = claim_next_job(db, worker=name)
+            if job:
+                logger.info("%s: gerando relatório %s (%s)", name, job.id, job.format)
+                run_report_job(db, job)
+                continue
+        except Exception:
+            logger.exception("%s: erro no loop do worker", name)
+        finally:
+            db.close()
+
+        if once:
+            break
+        time.sleep(max(1, poll_seconds))
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=int(settings.REPORT_JOBS_WORKERS or 1))
+    parser.add_argument("--poll", type=int, default=int(settings.REPORT_JOBS_POLL_SECONDS or 5))
+    parser.add_argument("--once", action="store_true", help="processa a fila atual e sai")
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    if workers == 1:
+        _worker_loop(args.poll, args.once)
+        return 0
+
+    procs = [
+        multiprocessing.Process(target=_worker_loop, args=(args.poll, args.once), daemon=False)
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+
+    def _forward(signum, _frame):
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, _forward)
+    signal.signal(signal.SIGINT, _forward)
+
+    for p in procs:
+        p.join()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
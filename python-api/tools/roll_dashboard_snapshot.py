@@ -0,0 +1,47 @@
+"""Job diário do dashboard.
+
+- Move para "Atrasada" os computadores cujo next_maintenance venceu desde a última execução.
+- Grava/atualiza a linha do dia em dashboard_snapshot_history (usada por /api/dashboard/history).
+
+Uso:
+  python python-api/tools/roll_dashboard_snapshot.py            # rollover + linha do dia
+  python python-api/tools/roll_dashboard_snapshot.py --rebuild  # recalcula os contadores do zero antes
+  python python-api/tools/roll_dashboard_snapshot.py --verify   # só compara contadores x tabelas
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.services.dashboard_snapshot_service import (  # noqa: E402
+    rebuild_snapshot,
+    roll_snapshot,
+    verify_snapshot,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="recalcula os contadores a partir das tabelas")
+    parser.add_argument("--verify", action="store_true", help="compara os contadores com as tabelas e sai")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.verify:
+            diff = verify_snapshot(db)
+            print(diff or "OK: contadores consistentes")
+            return 1 if diff else 0
+        if args.rebuild:
+            rebuild_snapshot(db)
+        print(roll_snapshot(db))
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+"""Checagem de regressão: manutenção (individual e em lote) com horário ISO em UTC ("...Z").
+
+O frontend manda `performed_at` com `toISOString()`. Com a linha de
+dashboard_snapshot já criada, isso não pode quebrar a comparação com
+`rolled_at` (datetime sem fuso). Roda num SQLite em memória, sem tocar no
+banco configurado.
+
+Uso:
+  python python-api/tools/test_maintenance_timezone.py
+"""
+
+import os
+import sys
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.controllers.maintenance_controller import router as maintenance_router  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import Base, get_db  # noqa: E402
+from app.models import Computer, MaintenanceHistory  # noqa: E402
+from app.services.dashboard_snapshot_service import rebuild_snapshot  # noqa: E402
+
+
+def main() -> int:
+    settings.AUTH_ENABLED = False
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = Session()
+    db.add_all([Computer(glpi_id=i, name=f"PC{i}", entity="Teste") for i in (1, 2, 3)])
+    db.commit()
+    rebuild_snapshot(db)
+
+    def _get_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = FastAPI()
+    app.include_router(maintenance_router)
+    app.dependency_overrides[get_db] = _get_db
+    client = TestClient(app)
+
+    body = {
+        "maintenance_type": "Preventiva",
+        "glpi_ticket_id": 1,
+        "description": "Checagem de fuso",
+        "performed_at": "2026-10-19T12:00:00.000Z",
+        "next_due_days": 180,
+    }
+    r = client.post("/api/maintenance", json={**body, "computer_id": 1})
+    print("POST /api/maintenance:", r.status_code)
+    if r.status_code != 200:
+        print(r.text)
+        return 1
+
+    record = db.query(MaintenanceHistory).filter(MaintenanceHistory.computer_id == 1).one()
+    if record.performed_at != datetime(2026, 10, 19, 12, 0):
+        print("performed_at não normalizado para UTC:", record.performed_at)
+        return 1
+
+    r = client.post("/api/maintenance/bulk", json={**body, "computer_ids": [2, 3, 99]})
+    print("POST /api/maintenance/bulk:", r.status_code)
+    if r.status_code != 200:
+        print(r.text)
+        return 1
+    items = {i["computer_id"]: i for i in r.json()["items"]}
+    expected = {
+        m.computer_id: m.id
+        for m in db.query(MaintenanceHistory).filter(MaintenanceHistory.computer_id.in_([2, 3]))
+    }
+    got = {cid: items[cid]["maintenance_id"] for cid in (2, 3)}
+    if got != expected or items[99]["status"] != "not_found":
+        print("ids do lote divergentes:", got, expected)
+        return 1
+
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())